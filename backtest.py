@@ -0,0 +1,35 @@
+import argparse
+from functions.backtest import BacktestParams, load_bars, load_ticks, run_backtest, TICK_DIR
+from functions.bars import BAR_DIR
+from functions.configs import read_config_file
+
+def main():
+    config = read_config_file('config/config.json')
+
+    parser = argparse.ArgumentParser(description="Backtest the previous-day / Asia-session bracket strategy on stored bars.")
+    parser.add_argument("--symbols", default=",".join(config.get("currency_pairs", [])), help="Comma-separated symbols")
+    parser.add_argument("--timeframe", help="Timeframe to replay (default: H1 from the bar store, M1 from ticks)")
+    parser.add_argument("--directory", default=BAR_DIR, help="Directory holding the bar store files")
+    parser.add_argument("--ticks", metavar="DIRECTORY", help=f"Build the bars from the tick files in this directory (e.g. {TICK_DIR}) instead")
+    parser.add_argument("--trades", help="Write the trade list to this CSV file")
+    args = parser.parse_args()
+
+    params = BacktestParams(
+        day_high_low_time=config.get("day_high_low_time", BacktestParams.day_high_low_time),
+        asia_high_low_time=config.get("asia_high_low_time", BacktestParams.asia_high_low_time),
+        delete_orders_time=config.get("delete_orders_time", BacktestParams.delete_orders_time),
+    )
+    symbols = [symbol for symbol in args.symbols.split(",") if symbol]
+    if args.ticks:
+        bars = {symbol: load_ticks(symbol, args.timeframe or "M1", args.ticks) for symbol in symbols}
+    else:
+        bars = {symbol: load_bars(symbol, args.timeframe or "H1", args.directory) for symbol in symbols}
+    result = run_backtest(bars, params)
+
+    for key, value in result.summary().items():
+        print(f"{key}: {value}")
+    if args.trades:
+        result.trades.to_csv(args.trades, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmarks of the m2.py / m3.py OCO bookkeeping with many candles' worth of groups in the book."""
+import contextlib
+import io
+from benchmarks.harness import measure, use_terminal
+from functions.oco import OcoBook, HIGH, LOW
+
+GROUP_COUNTS = [10, 100, 1000, 5000]
+SYMBOL = "EURUSD"
+
+# Function to add the [sell limit, buy stop] / [buy limit, sell stop] bracket m2/m3 place per candle
+def add_bracket(book: OcoBook, ticket: int):
+    book.add_group(SYMBOL, {
+        HIGH: [(ticket, 3), (ticket + 1, 4)],
+        LOW: [(ticket + 2, 2), (ticket + 3, 5)],
+    })
+
+# Function to build a book holding count candles' brackets
+def make_book(count: int) -> OcoBook:
+    book = OcoBook()
+    for index in range(count):
+        add_bracket(book, 7000000 + 4 * index)
+    return book
+
+def run() -> list:
+    use_terminal()
+    import m2
+    import m3
+
+    results = []
+    for module in (m2, m3):
+        for count in GROUP_COUNTS:
+            # A ticket from the middle of the book, as a fill on a candle a few hours old would be
+            ticket = 7000000 + 4 * (count // 2)
+
+            module.oco_book = make_book(count)
+
+            # Put the measured bracket back so every call sees the same book
+            def reset_book():
+                for offset in range(4):
+                    module.oco_book.discard(ticket + offset)
+                add_bracket(module.oco_book, ticket)
+
+            results.append(measure(f"{module.__name__}.oco_book.discard", count,
+                                   lambda: module.oco_book.discard(ticket), reset_book))
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.append(measure(f"{module.__name__}.remove_opposite_trades", count,
+                                       lambda: module.remove_opposite_trades(SYMBOL, ticket), reset_book))
+    return results
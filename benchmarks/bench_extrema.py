@@ -0,0 +1,45 @@
+"""Compare the pandas high/low path with the NumPy-only range_extrema path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extrema
+"""
+import numpy as np
+import pandas as pd
+from benchmarks.harness import measure
+from functions.bars import RATE_DTYPE, range_extrema
+
+SIZES = [24, 1000, 100000]
+
+# Function to build a synthetic H1 rates array shaped like mt5.copy_rates_range output
+def make_rates(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rates = np.zeros(count, dtype=RATE_DTYPE)
+    rates["time"] = 1700000000 + np.arange(count) * 3600
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, count))
+    rates["open"] = close
+    rates["close"] = close
+    rates["high"] = close + rng.uniform(0, 0.001, count)
+    rates["low"] = close - rng.uniform(0, 0.001, count)
+    return rates
+
+# The pandas path get_previous_day_high_low used before range_extrema
+def pandas_high_low(rates: np.ndarray):
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df['high'].max(), df['low'].min()
+
+def run() -> list:
+    results = []
+    for size in SIZES:
+        rates = make_rates(size)
+        assert pandas_high_low(rates) == range_extrema(rates)[:2]
+        results.append(measure("range_extrema[pandas]", size, lambda: pandas_high_low(rates)))
+        results.append(measure("range_extrema[numpy]", size, lambda: range_extrema(rates)))
+    return results
+
+if __name__ == "__main__":
+    results = run()
+    for pandas_result, numpy_result in zip(results[::2], results[1::2]):
+        speedup = pandas_result["best_us"] / numpy_result["best_us"]
+        print(f"{pandas_result['size']:>7} bars: pandas {pandas_result['best_us']:9.1f} us, numpy {numpy_result['best_us']:7.1f} us, {speedup:6.1f}x faster")
@@ -0,0 +1,32 @@
+"""Overhead of the terminal call instrumentation: symbol_info_tick and order_send against the simulated
+terminal, bare and wrapped by instrument_terminal."""
+from benchmarks.harness import measure, use_terminal
+from functions import mt5sim
+
+CALLS = ("symbol_info_tick", "order_send")
+
+def run() -> list:
+    terminal = use_terminal()
+    # Imported once the simulator stands in for MetaTrader5
+    from functions.metrics import Metrics, instrument_terminal
+    tick = terminal.current_tick("EURUSD")
+    # A far-away limit order the simulator accepts without filling it
+    request = {"action": mt5sim.TRADE_ACTION_PENDING, "symbol": "EURUSD", "volume": 0.1, "type": mt5sim.ORDER_TYPE_BUY_LIMIT,
+               "price": round(tick.bid - 0.05, 5), "magic": 234000, "comment": "CXC Buy Limit"}
+    bare = {name: getattr(mt5sim, name) for name in CALLS}
+
+    results = []
+    for label in ("bare", "metered"):
+        if label == "metered":
+            instrument_terminal(Metrics(), CALLS)
+        results.append(measure(f"symbol_info_tick[{label}]", 1, lambda: mt5sim.symbol_info_tick("EURUSD")))
+        results.append(measure(f"order_send[{label}]", 1, lambda: mt5sim.order_send(request), max_iterations=2000))
+
+    # Leave the module as the other benchmarks expect it
+    for name, func in bare.items():
+        setattr(mt5sim, name, func)
+    return results
+
+if __name__ == "__main__":
+    for result in run():
+        print(result)
@@ -0,0 +1,79 @@
+"""Benchmarks of the main.py hot paths: adjust_sl_tp, delete_pending_orders_at_1am and
+get_previous_day_high_low."""
+import numpy as np
+from benchmarks.harness import SYMBOLS, measure, use_terminal
+from benchmarks.bench_extrema import make_rates
+from functions import mt5sim
+
+POSITION_COUNTS = [1, 10, 100, 1000]
+ORDER_COUNTS = [10, 100, 1000]
+BAR_COUNTS = [24, 1000, 100000]
+
+# Function to build positions spread over every trailing tier, as they would be after a busy session
+def make_positions(terminal: mt5sim.SimTerminal, count: int) -> dict:
+    rng = np.random.default_rng(count)
+    positions = {}
+    for index in range(count):
+        symbol = SYMBOLS[index % len(SYMBOLS)]
+        tick = terminal.current_tick(symbol)
+        side = index % 2
+        profit = rng.uniform(-0.002, 0.007)
+        open_price = tick.bid - profit if side == mt5sim.ORDER_TYPE_BUY else tick.ask + profit
+        sl = open_price - 0.001 if side == mt5sim.ORDER_TYPE_BUY else open_price + 0.001
+        tp = open_price + 0.006 if side == mt5sim.ORDER_TYPE_BUY else open_price - 0.006
+        ticket = 5000000 + index
+        positions[ticket] = mt5sim.TradePosition(
+            ticket=ticket, time=tick.time, time_msc=tick.time_msc, time_update=tick.time, time_update_msc=tick.time_msc,
+            type=side, magic=234000, identifier=ticket, reason=0, volume=0.1, price_open=open_price, sl=sl, tp=tp,
+            price_current=tick.bid, swap=0.0, profit=0.0, symbol=symbol, comment="CXC Buy Limit", external_id="")
+    return positions
+
+# Function to build pending orders far enough from the market that they stay pending
+def make_orders(terminal: mt5sim.SimTerminal, count: int) -> dict:
+    orders = {}
+    for index in range(count):
+        symbol = SYMBOLS[index % len(SYMBOLS)]
+        tick = terminal.current_tick(symbol)
+        ticket = 6000000 + index
+        orders[ticket] = mt5sim.TradeOrder(
+            ticket=ticket, time_setup=tick.time, time_setup_msc=tick.time_msc, time_done=0, time_done_msc=0, time_expiration=0,
+            type=mt5sim.ORDER_TYPE_SELL_LIMIT, type_time=0, type_filling=2, state=1, magic=234000, position_id=0,
+            position_by_id=0, reason=3, volume_initial=0.1, volume_current=0.1, price_open=tick.bid + 0.01, sl=tick.bid + 0.011,
+            tp=tick.bid + 0.004, price_current=tick.bid, price_stoplimit=0.0, symbol=symbol, comment="CXC Sell Limit", external_id="")
+    return orders
+
+def run() -> list:
+    terminal = use_terminal()
+    from functions.session import adjust_sl_tp, delete_pending_orders_at_1am
+    from functions.trading import get_previous_day_high_low
+    from functions.ticks import reset_tick_snapshot
+
+    results = []
+    for count in POSITION_COUNTS:
+        positions = make_positions(terminal, count)
+
+        def reset_positions():
+            terminal.positions = dict(positions)
+            reset_tick_snapshot()
+
+        results.append(measure("adjust_sl_tp", count, adjust_sl_tp, reset_positions))
+
+    for count in ORDER_COUNTS:
+        orders = make_orders(terminal, count)
+
+        def reset_orders():
+            terminal.orders = dict(orders)
+            terminal.positions = {}
+
+        results.append(measure("delete_pending_orders_at_1am", count, delete_pending_orders_at_1am, reset_orders))
+
+    # Symbols without a tick skip the bar store, so this times the window computation itself
+    copy_rates_range = mt5sim.copy_rates_range
+    try:
+        for count in BAR_COUNTS:
+            rates = make_rates(count)
+            mt5sim.copy_rates_range = lambda symbol, timeframe, date_from, date_to: rates
+            results.append(measure("get_previous_day_high_low", count, lambda: get_previous_day_high_low("BENCH")))
+    finally:
+        mt5sim.copy_rates_range = copy_rates_range
+    return results
@@ -0,0 +1,39 @@
+"""Shared timing helpers and the simulated terminal the benchmarks run against."""
+import calendar
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from functions import mt5sim
+
+SYMBOLS = ["EURUSD", "GBPUSD", "AUDUSD"]
+PRICES = {"EURUSD": 1.1, "GBPUSD": 1.3, "AUDUSD": 0.67}
+
+# Function to install a fresh simulated terminal with a short tick history per symbol, ending now
+def use_terminal(**options) -> mt5sim.SimTerminal:
+    now = calendar.timegm(datetime.now().timetuple())
+    feeds = {symbol: mt5sim.make_random_ticks(20000, start=now - 3600, price=price, seed=index)
+             for index, (symbol, price) in enumerate(PRICES.items())}
+    terminal = mt5sim.SimTerminal(feeds, **options)
+    terminal.advance(3600)
+    mt5sim.install(terminal)
+    return terminal
+
+# Function to time func, calling setup (untimed) before every call, until min_time has been spent
+def measure(name: str, size: int, func: Callable[[], object], setup: Optional[Callable[[], object]] = None,
+            min_time: float = 0.2, max_iterations: int = 10000) -> Dict[str, float]:
+    timings = []
+    while sum(timings) < min_time and len(timings) < max_iterations:
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "name": name,
+        "size": size,
+        "iterations": len(timings),
+        "best_us": timings[0] * 1e6,
+        "median_us": timings[len(timings) // 2] * 1e6,
+        "mean_us": sum(timings) / len(timings) * 1e6,
+    }
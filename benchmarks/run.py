@@ -0,0 +1,66 @@
+"""Run the benchmark suite against the simulated terminal and write the results as JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output bench_results.json
+    python -m benchmarks.run --baseline bench_results.json  # exit 1 on a regression
+"""
+import argparse
+import importlib
+import json
+import logging
+import platform
+import sys
+from datetime import datetime
+
+MODULES = ["benchmarks.bench_extrema", "benchmarks.bench_session", "benchmarks.bench_candles", "benchmarks.bench_metrics"]
+
+# Function to list the benchmarks whose median got slower than the baseline by more than threshold
+def find_regressions(results: list, baseline: list, threshold: float) -> list:
+    previous = {(result["name"], result["size"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if before and result["median_us"] > before["median_us"] * (1 + threshold):
+            regressions.append((result, before))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths against a simulated terminal.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before a result counts as a regression")
+    parser.add_argument("--only", help="Comma-separated module names to run, e.g. bench_session")
+    args = parser.parse_args()
+
+    # The bot logs on every call; keep log I/O out of the timings
+    logging.disable(logging.CRITICAL)
+
+    selected = [name for name in MODULES if not args.only or name.split(".")[-1] in args.only.split(",")]
+    results = []
+    for name in selected:
+        module = importlib.import_module(name)
+        for result in module.run():
+            results.append(result)
+            print(f"{result['name']:<40} {result['size']:>7}  median {result['median_us']:12.1f} us  best {result['best_us']:12.1f} us")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        for result, before in regressions:
+            print(f"REGRESSION {result['name']} [{result['size']}]: {before['median_us']:.1f} us -> {result['median_us']:.1f} us")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
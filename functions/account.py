@@ -0,0 +1,120 @@
+import MetaTrader5 as mt5
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+# Pending orders placed through AccountSnapshot.send, kept until the next refresh replaces them with the terminal's own
+OrderRecord = namedtuple("OrderRecord", ["ticket", "symbol", "type", "volume_current", "price_open", "sl", "tp", "magic", "comment"])
+
+# Positions and pending orders fetched at most once per loop pass and indexed by ticket, symbol and comment.
+# invalidate() marks the start of a pass; the first read after it refreshes. Trade requests sent through
+# send() update the snapshot in place, so later steps of the same pass see their effect without asking
+# the terminal again. One snapshot can be shared by per-symbol worker threads; pass max_age to invalidate()
+# so that they refresh it at most that often between them.
+class AccountSnapshot:
+    def __init__(self):
+        self.items: Dict[str, Dict[int, tuple]] = {"positions": {}, "orders": {}}
+        self.by_symbol: Dict[str, Dict[str, Dict[int, tuple]]] = {"positions": {}, "orders": {}}
+        self.by_comment: Dict[str, Dict[str, Dict[int, tuple]]] = {"positions": {}, "orders": {}}
+        self.refreshes = 0
+        self.refreshed_at = 0.0
+        self.stale = True
+        self.lock = threading.RLock()
+
+    def invalidate(self, max_age: float = 0.0):
+        with self.lock:
+            if time.monotonic() - self.refreshed_at >= max_age:
+                self.stale = True
+
+    # Function to replace the snapshot with the terminal's current positions and orders (two terminal calls)
+    def refresh(self):
+        with self.lock:
+            for kind, fetch in (("positions", mt5.positions_get), ("orders", mt5.orders_get)):
+                self.items[kind] = {}
+                self.by_symbol[kind] = {}
+                self.by_comment[kind] = {}
+                for item in fetch() or ():
+                    self._add(kind, item)
+            self.refreshes += 1
+            self.refreshed_at = time.monotonic()
+            self.stale = False
+
+    def _ensure(self):
+        with self.lock:
+            if self.stale:
+                self.refresh()
+
+    def _add(self, kind: str, item: tuple):
+        self._remove(kind, item.ticket)
+        self.items[kind][item.ticket] = item
+        self.by_symbol[kind].setdefault(item.symbol, {})[item.ticket] = item
+        self.by_comment[kind].setdefault(item.comment, {})[item.ticket] = item
+
+    def _remove(self, kind: str, ticket: int) -> Optional[tuple]:
+        item = self.items[kind].pop(ticket, None)
+        if item is not None:
+            del self.by_symbol[kind][item.symbol][ticket]
+            del self.by_comment[kind][item.comment][ticket]
+        return item
+
+    def _select(self, kind: str, symbol: Optional[str], comment: Optional[str]) -> List[tuple]:
+        with self.lock:
+            self._ensure()
+            if symbol is not None:
+                items = self.by_symbol[kind].get(symbol, {})
+            elif comment is not None:
+                items = self.by_comment[kind].get(comment, {})
+            else:
+                items = self.items[kind]
+            # A list copy, so callers can send requests (and so change the snapshot) while iterating
+            return [item for item in items.values() if comment is None or item.comment == comment]
+
+    def positions(self, symbol: Optional[str] = None, comment: Optional[str] = None) -> List[tuple]:
+        return self._select("positions", symbol, comment)
+
+    def orders(self, symbol: Optional[str] = None, comment: Optional[str] = None) -> List[tuple]:
+        return self._select("orders", symbol, comment)
+
+    def position(self, ticket: int) -> Optional[tuple]:
+        with self.lock:
+            self._ensure()
+            return self.items["positions"].get(ticket)
+
+    def order(self, ticket: int) -> Optional[tuple]:
+        with self.lock:
+            self._ensure()
+            return self.items["orders"].get(ticket)
+
+    # Function to apply a completed trade request to the snapshot
+    def apply(self, request: dict, result):
+        if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+            return
+
+        with self.lock:
+            action = request.get("action")
+            if action == mt5.TRADE_ACTION_PENDING:
+                self._add("orders", OrderRecord(
+                    ticket=result.order, symbol=request["symbol"], type=request["type"], volume_current=request["volume"],
+                    price_open=request["price"], sl=request.get("sl", 0.0), tp=request.get("tp", 0.0),
+                    magic=request.get("magic", 0), comment=request.get("comment", "")))
+            elif action == mt5.TRADE_ACTION_REMOVE:
+                self._remove("orders", request["order"])
+            elif action == mt5.TRADE_ACTION_SLTP:
+                position = self.position(request["position"])
+                if position is not None:
+                    self._add("positions", position._replace(sl=request["sl"], tp=request["tp"]))
+            elif action == mt5.TRADE_ACTION_DEAL and "position" in request:
+                # Closing deal; a new market position shows up on the next refresh
+                position = self.position(request["position"])
+                if position is not None and request.get("volume", position.volume) < position.volume:
+                    self._add("positions", position._replace(volume=position.volume - request["volume"]))
+                else:
+                    self._remove("positions", request["position"])
+
+    # Function to send a trade request and keep the snapshot in step with its result. The terminal call
+    # itself runs outside the lock, so one worker's slow order_send does not hold up the others.
+    def send(self, request: dict):
+        result = mt5.order_send(request)
+        self.apply(request, result)
+        return result
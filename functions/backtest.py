@@ -0,0 +1,321 @@
+"""Offline backtest of the main.py strategy: brackets at the previous-day and Asia-session
+high/low, managed by the adjust_sl_tp trailing tiers.
+
+Only NumPy and pandas are needed, so this runs on Linux without the MetaTrader5 package.
+Bars are structured arrays in the copy_rates layout (functions.bars.RATE_DTYPE) with bid
+prices and the spread in points: the H1 files kept by functions.bars.BarStore, or bars of
+any timeframe built from saved ticks with load_ticks.
+"""
+import os
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from functions.bars import BarStore, TIMEFRAME_SECONDS, range_extrema, ticks_to_bars
+from functions.trailing import BUY, SELL, PIP_SIZE, SESSION_TIERS, tier_arrays
+
+DAY = 86400
+HOUR = 3600
+
+TICK_DIR = os.path.join("data", "ticks")
+
+# Pending order types, matching mt5.ORDER_TYPE_*
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+
+ORDER_TYPE_NAMES = {
+    ORDER_TYPE_BUY_LIMIT: "buy_limit",
+    ORDER_TYPE_SELL_LIMIT: "sell_limit",
+    ORDER_TYPE_BUY_STOP: "buy_stop",
+    ORDER_TYPE_SELL_STOP: "sell_stop",
+}
+
+EXIT_REASONS = np.array(["sl", "tp", "tier_close", "end"])
+EXIT_CHUNK = 256  # Positions simulated together, bounding the size of the bar matrices
+
+@dataclass
+class BacktestParams:
+    sl_pips: float = 10  # Initial SL distance from the order price (SL_PIPS in functions/orders.py)
+    tp_pips: float = 60  # Initial TP distance from the order price (TP_PIPS in functions/orders.py)
+    tiers: Sequence[Tuple[float, Optional[float]]] = field(default_factory=lambda: list(SESSION_TIERS))
+    pip_size: float = PIP_SIZE
+    point: float = 0.00001  # Price of one spread point
+    day_high_low_time: str = "03:00"
+    asia_high_low_time: str = "10:30"
+    delete_orders_time: str = "02:00"
+    day_window_hour: int = 5  # Previous-day window runs from this hour to the same hour a day later
+    asia_window: Tuple[int, int] = (5, 13)
+    exit_horizon: int = 240  # Bars looked at per pass when searching for a position's exit
+
+@dataclass
+class BacktestResult:
+    trades: pd.DataFrame
+
+    def summary(self) -> Dict[str, float]:
+        return summarize_trades(self.trades)
+
+# Function to turn an "HH:MM" config time into seconds after midnight
+def time_of_day(value: str) -> int:
+    hour, minute = value.split(":")
+    return int(hour) * HOUR + int(minute) * 60
+
+# Function to get the weekday (0 = Monday) of an epoch day number
+def weekday(day: int) -> int:
+    return (day + 3) % 7
+
+# Function to step a day back off the weekend, like get_previous_day_high_low does
+def skip_weekend(day: int) -> int:
+    if weekday(day) == 5:
+        return day - 1
+    if weekday(day) == 6:
+        return day - 2
+    return day
+
+# Function to get the (start, end) bar open times a level is computed over on a given day
+def level_window(day: int, session: str, params: BacktestParams) -> Tuple[int, int]:
+    if session == "day":
+        end_day = skip_weekend(day)
+        start_day = skip_weekend(end_day - 1)
+        return start_day * DAY + params.day_window_hour * HOUR, end_day * DAY + params.day_window_hour * HOUR
+    start_hour, end_hour = params.asia_window
+    return day * DAY + start_hour * HOUR, day * DAY + end_hour * HOUR
+
+# Function to load bars kept by the live bot's bar store; the bot only stores H1 bars
+def load_bars(symbol: str, timeframe: str = "H1", directory: Optional[str] = None) -> np.ndarray:
+    store = BarStore(symbol, timeframe) if directory is None else BarStore(symbol, timeframe, directory)
+    return np.array(store.bars())
+
+# Function to load a symbol's saved ticks and turn them into bars. The ticks are <SYMBOL>.npy, the array
+# mt5.copy_ticks_range returns saved with np.save, or <SYMBOL>.csv with time_msc, bid and ask columns.
+def load_ticks(symbol: str, timeframe: str = "M1", directory: str = TICK_DIR, point: float = BacktestParams.point) -> np.ndarray:
+    path = os.path.join(directory, symbol)
+    if os.path.exists(path + ".npy"):
+        ticks = np.load(path + ".npy")
+    else:
+        ticks = pd.read_csv(path + ".csv", usecols=["time_msc", "bid", "ask"]).to_records(index=False)
+    ticks = ticks[np.argsort(ticks["time_msc"], kind="stable")]
+    return ticks_to_bars(ticks, TIMEFRAME_SECONDS[timeframe], point)
+
+# Function to find, for every order in a group, the first bar index at which it fills (-1 if never)
+def find_fills(high: np.ndarray, low: np.ndarray, ask_offset: np.ndarray, levels: np.ndarray, order_types: np.ndarray) -> np.ndarray:
+    ask_high = high + ask_offset
+    ask_low = low + ask_offset
+    hits = np.empty((len(levels), len(high)), dtype=bool)
+    for row, (level, order_type) in enumerate(zip(levels, order_types)):
+        if order_type == ORDER_TYPE_SELL_LIMIT:
+            hits[row] = high >= level  # Bid rises to the level
+        elif order_type == ORDER_TYPE_BUY_STOP:
+            hits[row] = ask_high >= level  # Ask rises to the level
+        elif order_type == ORDER_TYPE_BUY_LIMIT:
+            hits[row] = ask_low <= level  # Ask drops to the level
+        else:
+            hits[row] = low <= level  # Bid drops to the level
+    filled = hits.any(axis=1)
+    return np.where(filled, hits.argmax(axis=1), -1)
+
+# Function to simulate the SL/TP and trailing tiers of a batch of positions bar by bar, vectorized
+# across positions and bars. Within a bar the stop is checked first, using the SL set by the bars
+# before it, which keeps the simulation on the conservative side.
+def simulate_exits(side: np.ndarray, entry: np.ndarray, fill_index: np.ndarray, bars: Dict[str, np.ndarray],
+                   params: BacktestParams) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    count = len(side)
+    if count > EXIT_CHUNK:
+        parts = [simulate_exits(side[chunk:chunk + EXIT_CHUNK], entry[chunk:chunk + EXIT_CHUNK], fill_index[chunk:chunk + EXIT_CHUNK], bars, params)
+                 for chunk in range(0, count, EXIT_CHUNK)]
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    bar_count = len(bars["high"])
+    exit_index = np.full(count, bar_count - 1, dtype=np.int64)
+    exit_price = np.zeros(count)
+    reason = np.full(count, 3, dtype=np.int8)
+    if count == 0:
+        return exit_index, exit_price, reason
+
+    triggers, sl_pips, closes = tier_arrays(params.tiers)
+    close_trigger = triggers[closes].min() if closes.any() else np.inf
+    direction = np.where(side == BUY, 1.0, -1.0)
+    initial_sl = entry - direction * params.sl_pips * params.pip_size
+    take_profit = entry + direction * params.tp_pips * params.pip_size
+
+    # Best excursion and stop carried over between passes for positions that are still open
+    carried_best = np.full(count, -np.inf)
+    carried_stop = initial_sl.copy()
+    start_index = fill_index.copy()
+
+    pending = np.arange(count)
+    horizon = params.exit_horizon
+    while len(pending):
+        rows = pending
+        index = start_index[rows, None] + np.arange(1, horizon + 1)[None, :]
+        valid = index < bar_count
+        index = np.minimum(index, bar_count - 1)
+
+        is_buy = (side[rows] == BUY)[:, None]
+        dir_col = direction[rows, None]
+        high = bars["high"][index]
+        low = bars["low"][index]
+        ask_offset = bars["ask_offset"][index]
+        favourable = np.where(is_buy, high, low + ask_offset)
+        adverse = np.where(is_buy, low, high + ask_offset)
+
+        excursion = dir_col * (favourable - entry[rows, None]) / params.pip_size
+        best_pips = np.maximum.accumulate(np.maximum(excursion, carried_best[rows, None]), axis=1)
+        previous_best = np.concatenate([carried_best[rows, None], best_pips[:, :-1]], axis=1)
+        previous_tier = np.searchsorted(triggers, previous_best, side="right") - 1
+        tier_sl_pips = np.where(previous_tier >= 0, sl_pips[np.maximum(previous_tier, 0)], np.nan)
+        tier_sl = entry[rows, None] + dir_col * tier_sl_pips * params.pip_size
+        stop = np.where(np.isnan(tier_sl), carried_stop[rows, None], tier_sl)
+        # Stops only ever move in the position's favour
+        stop = np.where(is_buy, np.maximum.accumulate(np.maximum(stop, carried_stop[rows, None]), axis=1),
+                        np.minimum.accumulate(np.minimum(stop, carried_stop[rows, None]), axis=1))
+
+        sl_hit = np.where(is_buy, adverse <= stop, adverse >= stop) & valid
+        tp_hit = np.where(is_buy, favourable >= take_profit[rows, None], favourable <= take_profit[rows, None]) & valid
+        close_hit = (best_pips >= close_trigger) & valid
+        event = sl_hit | tp_hit | close_hit
+        resolved = event.any(axis=1)
+
+        picked = np.flatnonzero(resolved)
+        first = event[picked].argmax(axis=1)
+        done = rows[picked]
+        exit_index[done] = index[picked, first]
+        at_sl = sl_hit[picked, first]
+        at_tp = tp_hit[picked, first] & ~at_sl
+        exit_price[done] = np.where(at_sl, stop[picked, first],
+                                    np.where(at_tp, take_profit[done], entry[done] + direction[done] * close_trigger * params.pip_size))
+        reason[done] = np.where(at_sl, 0, np.where(at_tp, 1, 2))
+
+        # Positions still open at the end of the data are marked to market on the last bar
+        ended = rows[~resolved & ~valid[:, -1]]
+        last_close = bars["close"][bar_count - 1]
+        exit_price[ended] = np.where(side[ended] == BUY, last_close, last_close + bars["ask_offset"][bar_count - 1])
+
+        carry = ~resolved & valid[:, -1]
+        pending = rows[carry]
+        carried_best[pending] = best_pips[carry, -1]
+        carried_stop[pending] = stop[carry, -1]
+        start_index[pending] += horizon
+        horizon *= 4
+    return exit_index, exit_price, reason
+
+# Function to backtest one symbol's bars
+def backtest_symbol(symbol: str, rates: np.ndarray, params: BacktestParams) -> pd.DataFrame:
+    bars = {
+        "time": rates["time"].astype(np.int64),
+        "high": rates["high"].astype(np.float64),
+        "low": rates["low"].astype(np.float64),
+        "close": rates["close"].astype(np.float64),
+        "ask_offset": rates["spread"].astype(np.float64) * params.point,
+    }
+    times = bars["time"]
+    if len(times) == 0:
+        return empty_trades()
+
+    sessions = [("day", time_of_day(params.day_high_low_time)), ("asia", time_of_day(params.asia_high_low_time))]
+    delete_time = time_of_day(params.delete_orders_time)
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in ["level", "order_type", "placed", "fill_index", "side", "entry"]}
+
+    for day in range(int(times[0]) // DAY, int(times[-1]) // DAY + 1):
+        if weekday(day) >= 5:
+            continue
+        for session, placement_time in sessions:
+            placed = day * DAY + placement_time
+            start, end = level_window(day, session, params)
+            # Bars in [start, end] as the H1 query would see them at placement time
+            lo = np.searchsorted(times, start, side="left")
+            hi = np.searchsorted(times, min(end + HOUR, placed), side="left")
+            high, low, _, _ = range_extrema(rates[lo:hi])
+            if high is None:
+                continue
+
+            # The bid at placement is the close of the last bar before it
+            last = np.searchsorted(times, placed, side="left") - 1
+            if last < 0 or placed - times[last] > HOUR:
+                continue
+            bid = bars["close"][last]
+
+            levels = []
+            order_types = []
+            kinds = []
+            if bid < high:
+                levels += [high, high]
+                order_types += [ORDER_TYPE_SELL_LIMIT, ORDER_TYPE_BUY_STOP]
+                kinds += [f"{session}_high"] * 2
+            if bid > low:
+                levels += [low, low]
+                order_types += [ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_STOP]
+                kinds += [f"{session}_low"] * 2
+            if not levels:
+                continue
+
+            # Pending orders live until the next delete_orders_time run
+            expiry = day * DAY + delete_time
+            while expiry <= placed:
+                expiry += DAY
+            first = last + 1
+            stop = np.searchsorted(times, expiry, side="left")
+            fills = find_fills(bars["high"][first:stop], bars["low"][first:stop], bars["ask_offset"][first:stop],
+                               np.array(levels), np.array(order_types))
+            filled = fills >= 0
+            if not filled.any():
+                continue
+
+            order_types = np.array(order_types)[filled]
+            columns["level"].append(np.array(kinds)[filled])
+            columns["order_type"].append(order_types)
+            columns["placed"].append(np.full(filled.sum(), placed, dtype=np.int64))
+            columns["fill_index"].append(fills[filled] + first)
+            columns["side"].append(np.where(np.isin(order_types, [ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP]), BUY, SELL))
+            columns["entry"].append(np.array(levels)[filled])
+
+    if not columns["entry"]:
+        return empty_trades()
+
+    side = np.concatenate(columns["side"])
+    entry = np.concatenate(columns["entry"])
+    fill_index = np.concatenate(columns["fill_index"])
+    exit_index, exit_price, reason = simulate_exits(side, entry, fill_index, bars, params)
+    direction = np.where(side == BUY, 1.0, -1.0)
+
+    return pd.DataFrame({
+        "symbol": symbol,
+        "level": np.concatenate(columns["level"]),
+        "order_type": [ORDER_TYPE_NAMES[order_type] for order_type in np.concatenate(columns["order_type"])],
+        "placed": pd.to_datetime(np.concatenate(columns["placed"]), unit="s"),
+        "filled": pd.to_datetime(times[fill_index], unit="s"),
+        "entry": entry,
+        "closed": pd.to_datetime(times[exit_index], unit="s"),
+        "exit": exit_price,
+        "reason": EXIT_REASONS[reason],
+        "pips": direction * (exit_price - entry) / params.pip_size,
+    })
+
+def empty_trades() -> pd.DataFrame:
+    return pd.DataFrame(columns=["symbol", "level", "order_type", "placed", "filled", "entry", "closed", "exit", "reason", "pips"])
+
+# Function to backtest every symbol and collect the trades into one table
+def run_backtest(bars_by_symbol: Dict[str, np.ndarray], params: Optional[BacktestParams] = None) -> BacktestResult:
+    params = params or BacktestParams()
+    frames = [backtest_symbol(symbol, rates, params) for symbol, rates in bars_by_symbol.items()]
+    frames = [frame for frame in frames if len(frame)]
+    trades = pd.concat(frames, ignore_index=True) if frames else empty_trades()
+    if len(trades):
+        trades = trades.sort_values("closed", kind="stable", ignore_index=True)
+    return BacktestResult(trades=trades)
+
+# Function to compute the headline numbers of a trade table
+def summarize_trades(trades: pd.DataFrame) -> Dict[str, float]:
+    pips = trades["pips"].to_numpy(dtype=np.float64) if len(trades) else np.zeros(0)
+    gains = pips[pips > 0].sum()
+    losses = -pips[pips < 0].sum()
+    equity = np.cumsum(pips)
+    drawdown = (np.maximum.accumulate(np.r_[0.0, equity]) - np.r_[0.0, equity]).max() if len(pips) else 0.0
+    return {
+        "trades": int(len(pips)),
+        "net_pips": float(pips.sum()),
+        "win_rate": float((pips > 0).mean()) if len(pips) else 0.0,
+        "profit_factor": float(gains / losses) if losses else float("inf") if gains else 0.0,
+        "max_drawdown_pips": float(drawdown),
+    }
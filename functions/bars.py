@@ -0,0 +1,200 @@
+import calendar
+import os
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple, Union
+
+BAR_DIR = os.path.join("data", "bars")
+
+# Record layout of the arrays returned by mt5.copy_rates_range / copy_rates_from_pos
+RATE_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+TIMEFRAME_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "M30": 1800, "H1": 3600, "H4": 14400, "D1": 86400}
+
+# Fetches the bars opened in [start, end] from the terminal, like mt5.copy_rates_range
+RatesFetcher = Callable[[datetime, datetime], Optional[np.ndarray]]
+
+# Function to convert a datetime to the epoch seconds used in bar 'time' fields.
+# Naive datetimes are read as broker server wall-clock time, like the bar times themselves.
+def to_epoch(moment: Union[datetime, int, float]) -> int:
+    if isinstance(moment, datetime):
+        if moment.tzinfo is None:
+            return calendar.timegm(moment.timetuple())
+        return int(moment.timestamp())
+    return int(moment)
+
+# Function to convert epoch seconds back to a datetime the terminal accepts
+def from_epoch(seconds: int) -> datetime:
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc)
+
+# Function to copy terminal rates into the store's record layout
+def to_rate_records(rates: Optional[np.ndarray]) -> np.ndarray:
+    if rates is None or len(rates) == 0:
+        return np.empty(0, dtype=RATE_DTYPE)
+    if rates.dtype == RATE_DTYPE:
+        return np.asarray(rates)
+    records = np.zeros(len(rates), dtype=RATE_DTYPE)
+    for name in RATE_DTYPE.names:
+        if name in rates.dtype.names:
+            records[name] = rates[name]
+    return records
+
+class BarStore:
+    """Append-only, memory-mapped file of closed bars for one symbol and timeframe."""
+
+    def __init__(self, symbol: str, timeframe: str, directory: str = BAR_DIR):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.seconds = TIMEFRAME_SECONDS[timeframe]
+        self.path = os.path.join(directory, f"{symbol}_{timeframe}.bin")
+        self.synced_until: Optional[int] = None  # Open time up to which the store is known complete
+        self.requested_from: Optional[int] = None  # Earliest start already asked of the terminal for a backfill
+        self.fetches = 0
+        self._bars: Optional[np.ndarray] = None
+        self._size = -1
+        # Retries, scheduled jobs and order threads may update one symbol's store at once; reentrant, since
+        # rates_range calls append and backfill, and they call bars()
+        self.lock = threading.RLock()
+
+    # Function to memory-map the stored bars, remapping only when the file has grown
+    def bars(self) -> np.ndarray:
+        with self.lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if size != self._size:
+                count = size // RATE_DTYPE.itemsize
+                if count == 0:
+                    self._bars = np.empty(0, dtype=RATE_DTYPE)
+                else:
+                    self._bars = np.memmap(self.path, dtype=RATE_DTYPE, mode="r", shape=(count,))
+                self._size = size
+            return self._bars
+
+    def last_time(self) -> Optional[int]:
+        bars = self.bars()
+        return int(bars["time"][-1]) if len(bars) else None
+
+    # Function to append bars newer than the last stored one
+    def append(self, records: np.ndarray):
+        with self.lock:
+            last = self.last_time()
+            if last is not None:
+                records = records[records["time"] > last]
+            if len(records) == 0:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as file:
+                file.write(np.ascontiguousarray(records, dtype=RATE_DTYPE).tobytes())
+
+    # Function to merge bars older than the stored ones in, rewriting the file once
+    def backfill(self, records: np.ndarray):
+        with self.lock:
+            bars = self.bars()
+            first = int(bars["time"][0])
+            records = records[records["time"] < first]
+            if len(records) == 0:
+                return
+            merged = np.concatenate([records, np.array(bars)])
+            self._bars = None
+            self._size = -1
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(merged.tobytes())
+            os.replace(tmp_path, self.path)
+
+    # Function to bring the store up to date for [start, end] and return the bars in that window.
+    # Only bars newer than the store (or older, for a backfill) are fetched; closed bars are kept on
+    # disk while the still-forming bar is returned without being stored.
+    def rates_range(self, start: Union[datetime, int], end: Union[datetime, int], fetch: RatesFetcher, now: Union[datetime, int]) -> np.ndarray:
+        with self.lock:
+            start_ts, end_ts, now_ts = to_epoch(start), to_epoch(end), to_epoch(now)
+            live = np.empty(0, dtype=RATE_DTYPE)
+
+            last = self.last_time()
+            # Bars before the first stored one are asked for once; a gap the terminal has no data for stays a gap
+            backfill_until = int(self.bars()["time"][0]) if last is not None else None
+            if self.requested_from is not None and backfill_until is not None:
+                backfill_until = min(backfill_until, self.requested_from)
+            if backfill_until is not None and start_ts < backfill_until:
+                fetched = to_rate_records(self._fetch(fetch, start_ts, backfill_until - 1))
+                self.backfill(fetched[fetched["time"] + self.seconds <= now_ts])
+                self.requested_from = start_ts
+
+            synced_until = self.synced_until if self.synced_until is not None else last
+            if synced_until is None or end_ts > synced_until:
+                fetch_from = start_ts if last is None else last + 1
+                fetched = to_rate_records(self._fetch(fetch, fetch_from, end_ts))
+                closed = fetched["time"] + self.seconds <= now_ts
+                self.append(fetched[closed])
+                live = fetched[~closed]
+                # An empty answer may just mean the terminal has not loaded the history yet, so keep asking
+                if len(fetched):
+                    self.synced_until = max(min(end_ts, now_ts - self.seconds), self.last_time() or 0)
+
+            bars = self.bars()
+            times = bars["time"]
+            lo = np.searchsorted(times, start_ts, side="left")
+            hi = np.searchsorted(times, end_ts, side="right")
+            window = bars[lo:hi]
+            if len(live):
+                window = np.concatenate([np.array(window), live[(live["time"] >= start_ts) & (live["time"] <= end_ts)]])
+            return window
+
+    def _fetch(self, fetch: RatesFetcher, start_ts: int, end_ts: int) -> Optional[np.ndarray]:
+        self.fetches += 1
+        return fetch(from_epoch(start_ts), from_epoch(end_ts))
+
+bar_stores: Dict[Tuple[str, str], BarStore] = {}
+bar_stores_lock = threading.Lock()
+
+# Function to get the shared bar store of a symbol and timeframe
+def get_bar_store(symbol: str, timeframe: str, directory: str = BAR_DIR) -> BarStore:
+    key = (symbol, timeframe)
+    store = bar_stores.get(key)
+    if store is None:
+        with bar_stores_lock:
+            store = bar_stores.get(key)
+            if store is None:
+                store = bar_stores[key] = BarStore(symbol, timeframe, directory)
+    return store
+
+# Function to find a window's high and low and the open times of the bars that made them.
+# Works on the structured rates array directly; the field lookups are views, so nothing is copied.
+def range_extrema(rates: np.ndarray) -> Tuple[Optional[float], Optional[float], Optional[int], Optional[int]]:
+    if rates is None or len(rates) == 0:
+        return None, None, None, None
+    highs = rates["high"]
+    lows = rates["low"]
+    high_index = int(highs.argmax())
+    low_index = int(lows.argmin())
+    times = rates["time"]
+    return float(highs[high_index]), float(lows[low_index]), int(times[high_index]), int(times[low_index])
+
+# Function to aggregate ticks (time_msc, bid, ask) into bid bars with the average spread in points
+def ticks_to_bars(ticks: np.ndarray, seconds: int = 60, point: float = 0.00001) -> np.ndarray:
+    if len(ticks) == 0:
+        return np.empty(0, dtype=RATE_DTYPE)
+    bucket = (ticks["time_msc"] // 1000) // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    bid = ticks["bid"].astype(np.float64)
+    spread = (ticks["ask"] - ticks["bid"]) / point
+    counts = np.diff(np.r_[starts, len(ticks)])
+
+    bars = np.zeros(len(starts), dtype=RATE_DTYPE)
+    bars["time"] = bucket[starts]
+    bars["open"] = bid[starts]
+    bars["high"] = np.maximum.reduceat(bid, starts)
+    bars["low"] = np.minimum.reduceat(bid, starts)
+    bars["close"] = bid[np.r_[starts[1:], len(ticks)] - 1]
+    bars["tick_volume"] = counts
+    bars["spread"] = np.rint(np.add.reduceat(spread, starts) / counts)
+    return bars
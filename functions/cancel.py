@@ -0,0 +1,83 @@
+import MetaTrader5 as mt5
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+from functions.dispatcher import get_order_executor
+from functions.dedupe import dedupe_index
+from functions.logger import get_logger, log_order
+
+logger = get_logger()
+
+# Removal retcodes worth another try: the terminal or the broker was busy, not the request wrong
+TRANSIENT_RETCODES = (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_TIMEOUT, mt5.TRADE_RETCODE_PRICE_CHANGED,
+                      mt5.TRADE_RETCODE_TOO_MANY_REQUESTS, mt5.TRADE_RETCODE_CONNECTION)
+CANCEL_RETRIES = 2  # Further attempts per order after a transient failure
+CANCEL_RETRY_DELAY = 0.05  # Seconds before the first further attempt; doubled for the next
+
+@dataclass
+class CancelReport:
+    removed: List[int] = field(default_factory=list)
+    failed: Dict[int, Optional[int]] = field(default_factory=dict)  # ticket -> last retcode, None if the terminal never answered
+    retries: int = 0
+    elapsed: float = 0.0  # Wall-clock seconds for the whole batch
+
+    def summary(self) -> str:
+        total = len(self.removed) + len(self.failed)
+        return f"{len(self.removed)}/{total} orders removed in {self.elapsed * 1000:.1f} ms ({self.retries} retries)"
+
+# Function to pick the pending orders to cancel: any of the magic numbers, the comment prefix, the symbol and
+# the tickets narrow the selection when given
+def select_orders(orders: Optional[Iterable], magics: Optional[Iterable[int]] = None, prefix: Optional[str] = None,
+                  symbol: Optional[str] = None, tickets: Optional[Iterable[int]] = None) -> list:
+    magics = set(magics) if magics is not None else None
+    tickets = set(tickets) if tickets is not None else None
+    return [order for order in orders or []
+            if (magics is None or order.magic in magics)
+            and (prefix is None or order.comment.startswith(prefix))
+            and (symbol is None or order.symbol == symbol)
+            and (tickets is None or order.ticket in tickets)]
+
+# Function to remove one order, retrying transient failures; returns the last result
+def remove_order(order, send: Callable[[dict], object]) -> tuple:
+    request = {
+        "action": mt5.TRADE_ACTION_REMOVE,
+        "order": order.ticket,
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": mt5.ORDER_FILLING_IOC,
+    }
+    attempts = 0
+    while True:
+        result = send(request)
+        attempts += 1
+        log_order("delete", request, result, symbol=order.symbol)
+        if (result is not None and result.retcode not in TRANSIENT_RETCODES) or attempts > CANCEL_RETRIES:
+            return result, attempts - 1
+        time.sleep(CANCEL_RETRY_DELAY * 2 ** (attempts - 1))
+
+# Function to cancel pending orders with their removals in flight at once, on the order dispatcher's pool,
+# so clearing a book takes about one round trip instead of one per order. send is mt5.order_send or a wrapper
+# around it, such as a strategy's journal.
+def cancel_orders(orders: Iterable, send: Optional[Callable[[dict], object]] = None, description: str = "Cancelled") -> CancelReport:
+    report = CancelReport()
+    orders = list(orders)
+    if not orders:
+        return report
+    if send is None:
+        # Looked up on every call, so the metrics and rate-limit wrappers installed at startup apply
+        send = mt5.order_send
+
+    started = time.perf_counter()
+    for order, (result, retries) in zip(orders, get_order_executor().map(lambda order: remove_order(order, send), orders)):
+        report.retries += retries
+        if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+            report.removed.append(order.ticket)
+            # A cancelled bracket may be placed again
+            dedupe_index.discard(order.ticket)
+        else:
+            report.failed[order.ticket] = result.retcode if result is not None else None
+    report.elapsed = time.perf_counter() - started
+
+    logger.info(f"{description}: {report.summary()}")
+    for ticket, retcode in report.failed.items():
+        logger.error(f"Failed to remove order {ticket}: {'no answer from the terminal' if retcode is None else f'retcode {retcode}'}")
+    return report
@@ -0,0 +1,134 @@
+import MetaTrader5 as mt5
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from functions.logger import get_logger
+
+logger = get_logger()
+
+# Order types as they are spelled in order comments
+ORDER_TYPE_NAMES = {
+    mt5.ORDER_TYPE_BUY_LIMIT: "Buy Limit",
+    mt5.ORDER_TYPE_SELL_LIMIT: "Sell Limit",
+    mt5.ORDER_TYPE_BUY_STOP: "Buy Stop",
+    mt5.ORDER_TYPE_SELL_STOP: "Sell Stop",
+}
+ORDER_TYPES = {name: order_type for order_type, name in ORDER_TYPE_NAMES.items()}
+
+# Level kinds: the previous day's and the Asia session's high and low, and a candle's high and low
+PREVIOUS_DAY_HIGH, PREVIOUS_DAY_LOW = "PDH", "PDL"
+ASIA_HIGH, ASIA_LOW = "ASH", "ASL"
+CANDLE_HIGH, CANDLE_LOW = "H", "L"
+
+# A bracket order is placed at most once per (strategy, symbol, session, level kind, order type). The strategy
+# is its comment prefix and the session a day or candle label.
+DedupeKey = Tuple[str, str, str, str, int]
+
+# Tagged comments read "<prefix> <order type> <level kind><session>", e.g. "M2 Sell Limit H181415",
+# well within the terminal's 31 characters
+COMMENT_PATTERN = re.compile(r"^(\S+) (Buy Limit|Sell Limit|Buy Stop|Sell Stop) ([A-Z]+)(\d+)$")
+
+# Function to label a trading day as a session
+def day_session(day: datetime) -> str:
+    return f"{day:%m%d}"
+
+# Function to label a candle, by its open time, as a session
+def candle_session(candle_time: int) -> str:
+    return f"{datetime.fromtimestamp(int(candle_time)):%d%H%M}"
+
+# Function to build an order comment; without a level kind it is the plain "<prefix> <order type>"
+def order_comment(prefix: str, order_type: int, level: str = "", session: str = "") -> str:
+    comment = f"{prefix} {ORDER_TYPE_NAMES[order_type]}"
+    return f"{comment} {level}{session}" if level else comment
+
+# Function to read the dedupe key back from an order's symbol and comment; None for untagged comments
+def comment_key(symbol: str, comment: str) -> Optional[DedupeKey]:
+    match = COMMENT_PATTERN.match(comment)
+    if match is None:
+        return None
+    prefix, type_name, level, session = match.groups()
+    return prefix, symbol, session, level, ORDER_TYPES[type_name]
+
+# Bracket orders placed, or being placed, per dedupe key. A request is claimed before it is sent and settled
+# with its result, so a job that fires twice, a retry or a restart never sends the same bracket again.
+class DedupeIndex:
+    def __init__(self):
+        self.entries: Dict[DedupeKey, Optional[int]] = {}  # key -> ticket, None while the request is in flight
+        self.skipped = 0
+        self.refusals = threading.local()  # Whether the calling thread's last claim was refused
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: DedupeKey) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def ticket(self, key: DedupeKey) -> Optional[int]:
+        with self.lock:
+            return self.entries.get(key)
+
+    # Function to claim a placement request's key; False if the bracket is already placed or in flight.
+    # Requests with untagged comments are always let through.
+    def claim(self, request: dict) -> bool:
+        key = comment_key(request["symbol"], request["comment"])
+        self.refusals.last = False
+        if key is None:
+            return True
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = None
+                return True
+            self.skipped += 1
+        self.refusals.last = True
+        logger.warning(f"Not placing {request['comment']} for {request['symbol']} again; it is already placed")
+        return False
+
+    # Function to tell whether the last claim made on this thread was refused, so a caller that only sees a
+    # place_* function's None can tell a repeat from a failed request
+    def last_refused(self) -> bool:
+        return getattr(self.refusals, "last", False)
+
+    # Function to record a claimed request's result: the ticket when it was placed, otherwise the claim is dropped
+    def settle(self, request: dict, result):
+        key = comment_key(request["symbol"], request["comment"])
+        if key is None:
+            return
+        with self.lock:
+            if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+                self.entries[key] = result.order
+            elif key in self.entries and self.entries[key] is None:
+                del self.entries[key]
+
+    # Function to forget a cancelled order, so its bracket can be placed again
+    def discard(self, ticket: int):
+        with self.lock:
+            for key in [key for key, placed in self.entries.items() if placed == ticket]:
+                del self.entries[key]
+
+    # Function to drop a strategy's entries for a symbol from every session but the current one
+    def expire(self, strategy: str, symbol: str, session: str):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == strategy and key[1] == symbol and key[2] != session]:
+                del self.entries[key]
+
+    # Function to rebuild a strategy's entries from the live orders and positions carrying its magic numbers.
+    # A position keeps the comment of the order it was filled from, so filled brackets count as placed too.
+    def rebuild(self, strategy: str, magics: Iterable[int], items: Iterable) -> int:
+        magics = set(magics)
+        entries = {}
+        for item in items:
+            if item.magic not in magics:
+                continue
+            key = comment_key(item.symbol, item.comment)
+            if key is not None and key[0] == strategy:
+                entries[key] = item.ticket
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == strategy]:
+                del self.entries[key]
+            self.entries.update(entries)
+        return len(entries)
+
+dedupe_index = DedupeIndex()
@@ -0,0 +1,96 @@
+import MetaTrader5 as mt5
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+from functions.dedupe import dedupe_index
+from functions.logger import get_logger
+
+logger = get_logger()
+
+MAX_ORDER_WORKERS = 8
+
+# An order placement to run: the place_* function and its arguments
+OrderJob = Tuple[Callable[..., Optional[mt5.OrderSendResult]], tuple]
+
+@dataclass
+class OrderOutcome:
+    name: str
+    args: tuple
+    result: Optional[mt5.OrderSendResult] = None
+    error: Optional[str] = None
+    skipped: bool = False  # Not sent: the bracket was already placed or in flight
+    latency: float = 0.0  # Seconds spent in the placement call
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None and self.result.retcode == mt5.TRADE_RETCODE_DONE
+
+@dataclass
+class BatchResult:
+    outcomes: List[OrderOutcome] = field(default_factory=list)
+    elapsed: float = 0.0  # Wall-clock seconds for the whole batch
+
+    @property
+    def succeeded(self) -> List[OrderOutcome]:
+        return [outcome for outcome in self.outcomes if outcome.ok]
+
+    @property
+    def failed(self) -> List[OrderOutcome]:
+        return [outcome for outcome in self.outcomes if not outcome.ok and not outcome.skipped]
+
+    @property
+    def skipped(self) -> List[OrderOutcome]:
+        return [outcome for outcome in self.outcomes if outcome.skipped]
+
+    def summary(self) -> str:
+        latencies = [outcome.latency for outcome in self.outcomes]
+        slowest = max(latencies) if latencies else 0.0
+        skipped = f", {len(self.skipped)} already placed" if self.skipped else ""
+        return (f"{len(self.succeeded)}/{len(self.outcomes)} orders placed in {self.elapsed * 1000:.1f} ms "
+                f"(slowest request {slowest * 1000:.1f} ms{skipped})")
+
+order_executor: Optional[ThreadPoolExecutor] = None
+order_executor_lock = threading.Lock()
+
+# Function to get the shared worker pool, creating it on first use; the m2/m3 workers may ask for it at once
+def get_order_executor() -> ThreadPoolExecutor:
+    global order_executor
+    if order_executor is None:
+        with order_executor_lock:
+            if order_executor is None:
+                order_executor = ThreadPoolExecutor(max_workers=MAX_ORDER_WORKERS, thread_name_prefix="order")
+    return order_executor
+
+# Function to run a single placement and time it
+def run_order_job(job: OrderJob) -> OrderOutcome:
+    place, args = job
+    outcome = OrderOutcome(name=place.__name__, args=args)
+    started = time.perf_counter()
+    try:
+        outcome.result = place(*args)
+        if outcome.result is None and dedupe_index.last_refused():
+            outcome.skipped = True
+        elif outcome.result is None:
+            outcome.error = f"order_send returned None: {mt5.last_error()}"
+        elif outcome.result.retcode != mt5.TRADE_RETCODE_DONE:
+            outcome.error = f"retcode {outcome.result.retcode}"
+    except Exception as e:
+        outcome.error = str(e)
+    outcome.latency = time.perf_counter() - started
+    return outcome
+
+# Function to send a batch of placements concurrently and collect every result
+def dispatch_orders(jobs: List[OrderJob]) -> BatchResult:
+    batch = BatchResult()
+    if not jobs:
+        return batch
+
+    started = time.perf_counter()
+    batch.outcomes = list(get_order_executor().map(run_order_job, jobs))
+    batch.elapsed = time.perf_counter() - started
+
+    for outcome in batch.failed:
+        logger.error(f"{outcome.name}{outcome.args} failed: {outcome.error}")
+    return batch
@@ -0,0 +1,103 @@
+import MetaTrader5 as mt5
+import schedule
+import threading
+import time
+from typing import Dict, Iterable, List
+from functions.account import AccountSnapshot
+from functions.ticks import reset_tick_snapshot, poll_changed_symbols, next_poll_delay, MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+from functions.metrics import metrics
+from functions.logger import get_logger
+
+logger = get_logger()
+
+# Magic number every strategy used before each got its own; their older orders and positions still carry it
+LEGACY_MAGIC = 234000
+
+# A strategy run by StrategyHost. Subclasses set name, magic and comment_prefix, schedule their jobs in
+# setup() and react to quotes in on_quote(); everything they trade is told apart by magic and comment prefix.
+class Strategy:
+    name = ""
+    magic = LEGACY_MAGIC
+    comment_prefix = ""
+
+    def __init__(self, symbols: Iterable[str]):
+        self.symbols = list(symbols)
+
+    def owns(self, item) -> bool:
+        return item.comment.startswith(self.comment_prefix) and item.magic in (self.magic, LEGACY_MAGIC)
+
+    # Called once before the host starts polling; jobs scheduled here run on the host's job thread
+    def setup(self, host: "StrategyHost"):
+        pass
+
+    # Called on the polling thread whenever the quote of one of the strategy's symbols changed
+    def on_quote(self, host: "StrategyHost", symbol: str):
+        pass
+
+# Runs several strategies in one process over one terminal connection: one tick poller, one account snapshot
+# per pass and one scheduler thread, however many strategies there are
+class StrategyHost:
+    def __init__(self, strategies: List[Strategy], min_poll_interval: float = MIN_POLL_INTERVAL,
+                 max_idle_delay: float = MAX_IDLE_DELAY):
+        self.strategies = strategies
+        self.min_poll_interval = min_poll_interval
+        self.max_idle_delay = max_idle_delay
+        self.account = AccountSnapshot()
+        self.symbols = sorted({symbol for strategy in strategies for symbol in strategy.symbols})
+        self.subscribers: Dict[str, List[Strategy]] = {
+            symbol: [strategy for strategy in strategies if symbol in strategy.symbols] for symbol in self.symbols
+        }
+        self.stop_event = threading.Event()
+
+    def positions(self, strategy: Strategy, symbol: str = None) -> list:
+        return [pos for pos in self.account.positions(symbol) if strategy.owns(pos)]
+
+    def orders(self, strategy: Strategy, symbol: str = None) -> list:
+        return [order for order in self.account.orders(symbol) if strategy.owns(order)]
+
+    # Scheduled jobs run on their own thread, so a slow session job does not hold up quote handling
+    def run_jobs(self):
+        while not self.stop_event.is_set():
+            reset_tick_snapshot()
+            try:
+                schedule.run_pending()
+            except Exception:
+                logger.exception("Scheduled job failed")
+            self.stop_event.wait(1)
+
+    # Function to poll once: every strategy subscribed to a symbol whose quote moved gets on_quote
+    def poll(self) -> bool:
+        reset_tick_snapshot()
+        started = time.perf_counter()
+        changed_symbols = poll_changed_symbols(self.symbols, self.min_poll_interval)
+        # Every strategy reads this pass's positions and orders from the same snapshot
+        self.account.invalidate()
+        for symbol in changed_symbols:
+            for strategy in self.subscribers[symbol]:
+                try:
+                    strategy.on_quote(self, symbol)
+                except Exception:
+                    logger.exception(f"Strategy {strategy.name} failed on {symbol}")
+        metrics.observe_loop("host", time.perf_counter() - started)
+        return bool(changed_symbols)
+
+    def run(self):
+        for strategy in self.strategies:
+            strategy.setup(self)
+            logger.info(f"Hosting strategy {strategy.name} (magic {strategy.magic}) on {', '.join(strategy.symbols)}")
+
+        jobs = threading.Thread(target=self.run_jobs, name="host-jobs", daemon=True)
+        jobs.start()
+
+        delay = self.min_poll_interval
+        try:
+            while not self.stop_event.is_set():
+                changed = self.poll()
+                delay = next_poll_delay(delay, changed, self.min_poll_interval, self.max_idle_delay)
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            logger.info("Execution interrupted by user.")
+        finally:
+            self.stop_event.set()
+            jobs.join()
+            mt5.shutdown()
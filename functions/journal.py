@@ -0,0 +1,173 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from functions.logger import get_logger
+
+logger = get_logger()
+
+# Record kinds
+INTENT = 1  # An order request about to be sent
+RESULT = 2  # What the terminal answered to an intent
+STATE = 3  # A strategy state change: a candle handled, an OCO group placed, a ticket to manage...
+
+# Every record is framed as [body length: u32][crc32 of body: u32][body], and the body as
+# [time: f64][kind: u8][compact JSON payload]. A crash mid-write leaves a short or corrupt last frame,
+# which replay detects and cuts off.
+FRAME = struct.Struct("<II")
+BODY = struct.Struct("<dB")
+
+SYNC_INTERVAL = 0.05  # Seconds between batched fsyncs; a crash loses at most this much journal
+COMPACT_BYTES = 4 * 1024 * 1024  # Journal size past which strategies rewrite it as a snapshot
+
+JournalRecord = namedtuple("JournalRecord", ["kind", "time", "data"])
+
+# Function to encode one record as a frame
+def encode_record(kind: int, data: dict, timestamp: Optional[float] = None) -> bytes:
+    body = BODY.pack(time.time() if timestamp is None else timestamp, kind) + json.dumps(data, separators=(",", ":")).encode()
+    return FRAME.pack(len(body), zlib.crc32(body)) + body
+
+# Function to read every intact record of a journal file, returning them with the length of the intact prefix
+def read_journal(path: str) -> Tuple[List[JournalRecord], int]:
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, "rb") as file:
+        data = file.read()
+
+    records = []
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        body = data[start:start + length]
+        if len(body) < length or length < BODY.size or zlib.crc32(body) != crc:
+            break
+        timestamp, kind = BODY.unpack_from(body)
+        records.append(JournalRecord(kind, timestamp, json.loads(body[BODY.size:])))
+        offset = start + length
+
+    if offset < len(data):
+        logger.warning(f"Journal {path} ends in {len(data) - offset} bytes of a torn record; discarding them")
+    return records, offset
+
+# Function to list the intents whose result was never journaled: the process died while they were in flight
+def unresolved_intents(records: Iterable[JournalRecord]) -> List[dict]:
+    pending: Dict[int, dict] = {}
+    for record in records:
+        if record.kind == INTENT:
+            pending[record.data["seq"]] = record.data["request"]
+        elif record.kind == RESULT:
+            pending.pop(record.data["seq"], None)
+    return list(pending.values())
+
+# Append-only journal of order intents, their results and strategy state changes. Appends only write to
+# the file buffer; a background thread flushes and fsyncs whatever accumulated every sync_interval seconds,
+# so the order path never waits on the disk. Until open() is called every append is a no-op.
+class Journal:
+    def __init__(self, path: str, sync_interval: float = SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.file = None
+        self.dirty = False
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()  # Keeps compact() from swapping the file while it is being synced
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    # Function to replay the journal, cut off a torn last record and start appending after the intact ones
+    def open(self) -> List[JournalRecord]:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        records, length = read_journal(self.path)
+        self.file = open(self.path, "ab")
+        if self.file.tell() > length:
+            self.file.truncate(length)
+            self.file.seek(length)
+        self.sequence = max((record.data["seq"] for record in records if record.kind == INTENT), default=0)
+
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.run_sync, name="journal-sync", daemon=True)
+        self.thread.start()
+        return records
+
+    def append(self, kind: int, data: dict):
+        if self.file is None:
+            return
+        frame = encode_record(kind, data)
+        with self.lock:
+            self.file.write(frame)
+            self.dirty = True
+
+    def state(self, name: str, **data):
+        self.append(STATE, {"name": name, **data})
+
+    # Function to send an order request through order_send with its intent and result journaled around it
+    def send(self, order_send: Callable[[dict], object], request: dict):
+        with self.lock:
+            self.sequence += 1
+            seq = self.sequence
+        self.append(INTENT, {"seq": seq, "request": request})
+        result = order_send(request)
+        if result is None:
+            self.append(RESULT, {"seq": seq, "retcode": None})
+        else:
+            self.append(RESULT, {"seq": seq, "retcode": result.retcode, "order": result.order, "deal": result.deal})
+        return result
+
+    # Function to make everything appended so far durable
+    def sync(self):
+        with self.sync_lock:
+            with self.lock:
+                if self.file is None or not self.dirty:
+                    return
+                self.file.flush()
+                fd = self.file.fileno()
+                self.dirty = False
+            # Outside the append lock, so appends carry on while the disk catches up
+            os.fsync(fd)
+
+    def run_sync(self):
+        while not self.stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except OSError:
+                logger.exception(f"Failed to sync journal {self.path}")
+
+    def size(self) -> int:
+        with self.lock:
+            return self.file.tell() if self.file is not None else 0
+
+    # Function to replace the journal with a snapshot of the current state, which snapshot() returns as
+    # (kind, data) records. Appends wait meanwhile, so none lands in the old file after the snapshot was taken.
+    # The snapshot is synced to a new file before it replaces the journal, so a crash leaves one or the other.
+    def compact(self, snapshot: Callable[[], Iterable[Tuple[int, dict]]]):
+        if self.file is None:
+            return
+        temporary = f"{self.path}.tmp"
+        with self.sync_lock, self.lock:
+            with open(temporary, "wb") as file:
+                for kind, data in snapshot():
+                    file.write(encode_record(kind, data))
+                file.flush()
+                os.fsync(file.fileno())
+            # The journal has to be closed before it can be replaced on Windows
+            self.file.close()
+            os.replace(temporary, self.path)
+            self.file = open(self.path, "ab")
+            self.dirty = False
+
+    def close(self):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sync()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
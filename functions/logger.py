@@ -1,9 +1,180 @@
 # logger.py
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_QUEUE_SIZE = 10000  # Records waiting for the writer thread; beyond this new records are dropped
+
+# Noisy events logged at most count times per interval seconds for each key (usually the symbol)
+RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "no_pending_orders": (1, 60.0),
+    "no_candle_data": (1, 60.0),
+    "fetch_rates": (1, 60.0),
+    "no_rates": (1, 60.0),
+    "no_tick": (1, 10.0),
+}
+
+# order_send retcodes that mean the request went through (placed, done, done partially) or had nothing to do
+OK_RETCODES = (10008, 10009, 10010)
+NO_CHANGES_RETCODE = 10025
+
+# Queue handler that never waits: a full queue drops the record and counts it instead of blocking the caller.
+# Messages are formatted on the writer thread, only exception tracebacks are rendered up front.
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Filter that lets each noisy event through at most count times per interval for each key. The next record
+# let through reports how many were held back in the meantime.
+class EventRateLimit(logging.Filter):
+    def __init__(self, limits: Dict[str, Tuple[int, float]] = RATE_LIMITS):
+        super().__init__()
+        self.limits = limits
+        self.windows: Dict[Tuple[str, object], list] = {}  # (event, key) -> [window start, passed, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        limit = self.limits.get(event)
+        if limit is None:
+            return True
+        count, interval = limit
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.setdefault((event, getattr(record, "key", None)), [now, 0, 0])
+            if now - window[0] >= interval:
+                suppressed = window[2]
+                window[:] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+            if window[1] >= count:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+# One order_send and its outcome, rendered as a single key=value line only when the writer thread formats it
+class OrderEvent:
+    __slots__ = ("action", "request", "fields", "retcode", "order", "deal", "price", "volume", "comment")
+
+    REQUEST_FIELDS = ("symbol", "type", "volume", "price", "sl", "tp", "order", "position", "magic", "comment")
+
+    def __init__(self, action: str, request: dict, result=None, fields: Optional[dict] = None):
+        self.action = action
+        self.request = request
+        self.fields = fields or {}
+        # Only the fields worth logging are kept, not the result itself
+        if result is None:
+            self.retcode = self.order = self.deal = self.price = self.volume = self.comment = None
+        else:
+            self.retcode = result.retcode
+            self.order = result.order
+            self.deal = result.deal
+            self.price = result.price
+            self.volume = result.volume
+            self.comment = result.comment
+
+    def __str__(self) -> str:
+        fields = [f"order {self.action}"]
+        for name in self.REQUEST_FIELDS:
+            value = self.fields.get(name, self.request.get(name))
+            if value is None:
+                continue
+            if name == "comment":
+                fields.append(f'{name}="{value}"')
+            elif isinstance(value, float):
+                # Drop float noise such as 1.2973800000000002
+                fields.append(f"{name}={value:.10g}")
+            else:
+                fields.append(f"{name}={value}")
+        if self.retcode is None:
+            fields.append("result=none")
+        else:
+            fields.append(f"retcode={self.retcode}")
+            if self.order and self.order != self.request.get("order"):
+                fields.append(f"ticket={self.order}")
+            if self.deal:
+                fields.append(f"deal={self.deal} fill_price={self.price:.10g} fill_volume={self.volume:.10g}")
+            if self.retcode not in OK_RETCODES:
+                fields.append(f'reason="{self.comment}"')
+        return " ".join(fields)
 
-# Configure the logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+log_queue = queue.Queue(LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+rate_limit = EventRateLimit()
+queue_handler.addFilter(rate_limit)
+logger.addHandler(queue_handler)
+
+# The writer thread is the only one that touches stdout, so a slow disk or blocked pipe never stalls trading
+stream_handler = logging.StreamHandler(sys.stderr)
+stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+listener.start()
+
+# Function to flush the queued records at exit, giving up after timeout seconds if the output is stuck
+def stop_listener(timeout: float = 2.0):
+    try:
+        listener.queue.put(listener._sentinel, timeout=timeout)
+    except queue.Full:
+        return
+    listener._thread.join(timeout)
+
+atexit.register(stop_listener)
+
+# A forked worker process inherits the queue but not the writer thread; give it both afresh
+def restart_listener():
+    listener.queue = queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    rate_limit.lock = threading.Lock()
+    listener.start()
+
+# Windows has no fork; spawned processes import this module afresh
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_listener)
 
 def get_logger():
     return logger
+
+# Function to tag a record with an event name, and the key it is rate-limited per, for the extra= argument
+def event(name: str, key: Optional[object] = None) -> dict:
+    return {"event": name, "key": key}
+
+# Function to log an order_send request and its result as one structured record. Failures are warnings,
+# requests the terminal had nothing to do for are debug. fields fill in what the request leaves out, such as
+# the symbol of an order removal.
+def log_order(action: str, request: dict, result=None, **fields):
+    if result is None or (result.retcode not in OK_RETCODES and result.retcode != NO_CHANGES_RETCODE):
+        level = logging.WARNING
+    elif result.retcode == NO_CHANGES_RETCODE:
+        level = logging.DEBUG
+    else:
+        level = logging.INFO
+    if logger.isEnabledFor(level):
+        logger.log(level, OrderEvent(action, request, result, fields), extra=event("order"))
+
+# Function to report how many records were dropped because the writer thread fell behind
+def log_queue_stats():
+    if queue_handler.dropped:
+        logger.warning(f"Logging queue was full; {queue_handler.dropped} records dropped so far")
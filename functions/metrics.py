@@ -0,0 +1,230 @@
+import MetaTrader5 as mt5
+import functools
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+from functions.logger import get_logger
+
+logger = get_logger()
+
+# Terminal functions the bot calls through the MetaTrader5 module, which instrument_terminal times
+# and throttle_terminal rate-limits
+TERMINAL_CALLS = ("symbol_info_tick", "symbol_info", "copy_rates_from_pos", "copy_rates_range",
+                  "positions_get", "orders_get", "order_send")
+
+# Histogram bucket upper bounds in seconds, from a local tick lookup to a stuck order_send
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_INTERVAL = 60.0  # Seconds between snapshots written to the metrics file
+METRICS_FILE_BYTES = 10 * 1024 * 1024
+METRICS_FILE_BACKUPS = 5
+
+# Fixed-bucket latency histogram; counts[i] holds observations in (buckets[i-1], buckets[i]], the last one the overflow
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    # Function to return the cumulative counts per upper bound, as Prometheus expects them
+    def cumulative(self) -> list:
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        for bound, running in self.cumulative():
+            if running >= q * self.count:
+                return bound
+        return float("inf")
+
+# Terminal call latencies and results per call and symbol, plus loop-iteration timings per loop
+class Metrics:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.calls: Dict[Tuple[str, str], Histogram] = {}
+        self.results = Counter()  # (call, symbol, result) -> count
+        self.loops: Dict[str, Histogram] = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    # Function to record one terminal call; result is the retcode for order_send, "ok" or "none" otherwise
+    def observe_call(self, call: str, symbol: str, seconds: float, result: str):
+        key = (call, symbol)
+        with self.lock:
+            histogram = self.calls.get(key)
+            if histogram is None:
+                histogram = self.calls[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self.results[(call, symbol, result)] += 1
+
+    def observe_loop(self, loop: str, seconds: float):
+        with self.lock:
+            histogram = self.loops.get(loop)
+            if histogram is None:
+                histogram = self.loops[loop] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    # Function to render every metric in the Prometheus text exposition format
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            lines.append("# HELP mt5_call_duration_seconds Time spent in MetaTrader5 calls")
+            lines.append("# TYPE mt5_call_duration_seconds histogram")
+            for (call, symbol), histogram in sorted(self.calls.items()):
+                render_histogram(lines, "mt5_call_duration_seconds", f'call="{call}",symbol="{symbol}"', histogram)
+            lines.append("# HELP mt5_call_results_total MetaTrader5 calls by result (order_send retcode, ok or none)")
+            lines.append("# TYPE mt5_call_results_total counter")
+            for (call, symbol, result), count in sorted(self.results.items()):
+                lines.append(f'mt5_call_results_total{{call="{call}",symbol="{symbol}",result="{result}"}} {count}')
+            lines.append("# HELP loop_iteration_seconds Time spent in one iteration of a polling loop")
+            lines.append("# TYPE loop_iteration_seconds histogram")
+            for loop, histogram in sorted(self.loops.items()):
+                render_histogram(lines, "loop_iteration_seconds", f'loop="{loop}"', histogram)
+        return "\n".join(lines) + "\n"
+
+    # Function to summarize the metrics as a dict (counts, mean and approximate p50/p95/p99 from the buckets)
+    def snapshot(self) -> dict:
+        def summarize(histogram: Histogram) -> dict:
+            return {
+                "count": histogram.count,
+                "mean": histogram.total / histogram.count if histogram.count else 0.0,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+            }
+
+        with self.lock:
+            return {
+                "time": time.time(),
+                "calls": {f"{call}/{symbol}": summarize(histogram) for (call, symbol), histogram in sorted(self.calls.items())},
+                "results": {f"{call}/{symbol}/{result}": count for (call, symbol, result), count in sorted(self.results.items())},
+                "loops": {loop: summarize(histogram) for loop, histogram in sorted(self.loops.items())},
+            }
+
+def render_histogram(lines: list, name: str, labels: str, histogram: Histogram):
+    for bound, count in histogram.cumulative():
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+metrics = Metrics()
+
+# Function to find the symbol a terminal call is about: the first argument, the request's symbol or symbol=.
+# Order removals carry no symbol and are recorded under "".
+def call_symbol(args: tuple, kwargs: dict) -> str:
+    if args:
+        first = args[0]
+        if isinstance(first, str):
+            return first
+        if isinstance(first, dict):
+            return first.get("symbol", "")
+    return kwargs.get("symbol", "")
+
+# Function to classify a terminal call's result
+def call_result(call: str, result) -> str:
+    if result is None:
+        return "none"
+    if call == "order_send":
+        return str(result.retcode)
+    return "ok"
+
+# Function to check whether a terminal function, or one it wraps, is already instrumented
+def is_metered(func) -> bool:
+    while func is not None:
+        if getattr(func, "metered", False):
+            return True
+        func = getattr(func, "__wrapped__", None)
+    return False
+
+# Function to time every terminal call made through the MetaTrader5 module. Install it before
+# throttle_terminal, so the recorded latency is the terminal's and not the rate limiter's wait.
+def instrument_terminal(registry: Metrics = metrics, names: Iterable[str] = TERMINAL_CALLS):
+    for name in names:
+        func = getattr(mt5, name)
+        # Installing twice would count every call twice, also when the rate limiter went on in between
+        if is_metered(func):
+            continue
+
+        # updated=() keeps the rate limiter's marker, if it is installed below, off this wrapper
+        @functools.wraps(func, updated=())
+        def metered(*args, _func=func, _name=name, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = _func(*args, **kwargs)
+            except Exception:
+                registry.observe_call(_name, call_symbol(args, kwargs), time.perf_counter() - started, "exception")
+                raise
+            registry.observe_call(_name, call_symbol(args, kwargs), time.perf_counter() - started, call_result(_name, result))
+            return result
+
+        metered.metered = True
+        setattr(mt5, name, metered)
+
+# Function to serve the metrics at http://host:port/metrics from a background thread
+def serve_metrics(port: int, host: str = "127.0.0.1", registry: Metrics = metrics) -> ThreadingHTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+# Function to append a JSON snapshot of the metrics to a size-rotated file every interval seconds
+def write_metrics_file(path: str, interval: float = METRICS_INTERVAL, registry: Metrics = metrics,
+                       max_bytes: int = METRICS_FILE_BYTES, backups: int = METRICS_FILE_BACKUPS) -> threading.Event:
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    snapshots = logging.getLogger("metrics")
+    snapshots.addHandler(handler)
+    snapshots.setLevel(logging.INFO)
+    snapshots.propagate = False
+    stop = threading.Event()
+
+    def write():
+        while not stop.wait(interval):
+            snapshots.info(json.dumps(registry.snapshot()))
+
+    threading.Thread(target=write, name="metrics-file", daemon=True).start()
+    return stop
+
+# Function to instrument the terminal and start whichever exporters are configured
+def start_metrics(port: Optional[int] = None, path: Optional[str] = None, interval: float = METRICS_INTERVAL):
+    instrument_terminal()
+    if port:
+        serve_metrics(port)
+    if path:
+        write_metrics_file(path, interval)
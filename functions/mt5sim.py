@@ -0,0 +1,404 @@
+"""Simulated MetaTrader 5 terminal for profiling and load-testing on machines without MT5.
+
+It exposes the part of the MetaTrader5 API this project uses (initialize, shutdown, last_error,
+symbol_info, symbol_info_tick, copy_rates_range, copy_rates_from_pos, order_send, orders_get,
+positions_get and the constants), replays a recorded or synthetic tick stream, matches pending
+orders and SL/TP against it, and adds configurable per-call latency and failure rates.
+
+    from functions import mt5sim
+    mt5sim.install(mt5sim.SimTerminal({"EURUSD": mt5sim.make_random_ticks(...)}, latency={"order_send": 0.03}))
+    import main  # every "import MetaTrader5 as mt5" now gets the simulator
+"""
+import random
+import sys
+import threading
+import time
+import numpy as np
+from collections import Counter, namedtuple
+from typing import Dict, Optional, Tuple, Union
+from functions.bars import RATE_DTYPE, to_epoch, ticks_to_bars
+
+# Constants, with the values of the MetaTrader5 package
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+TRADE_ACTION_MODIFY = 7
+TRADE_ACTION_REMOVE = 8
+
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_ERROR = 10011
+TRADE_RETCODE_TIMEOUT = 10012
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+TRADE_RETCODE_NO_CHANGES = 10025
+TRADE_RETCODE_CONNECTION = 10031
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400,
+}
+
+# Result types, with the fields of the MetaTrader5 package
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+TradeOrder = namedtuple("TradeOrder", "ticket time_setup time_setup_msc time_done time_done_msc time_expiration type type_time "
+                                      "type_filling state magic position_id position_by_id reason volume_initial volume_current "
+                                      "price_open sl tp price_current price_stoplimit symbol comment external_id")
+TradePosition = namedtuple("TradePosition", "ticket time time_msc time_update time_update_msc type magic identifier reason volume "
+                                            "price_open sl tp price_current swap profit symbol comment external_id")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request_id retcode_external request")
+SymbolInfo = namedtuple("SymbolInfo", "name point digits spread trade_stops_level trade_freeze_level trade_tick_value "
+                                      "trade_tick_size trade_contract_size volume_min volume_max volume_step currency_base currency_profit")
+
+# Layout of tick arrays, as returned by mt5.copy_ticks_range
+TICK_DTYPE = np.dtype([
+    ("time", "<i8"), ("bid", "<f8"), ("ask", "<f8"), ("last", "<f8"), ("volume", "<u8"),
+    ("time_msc", "<i8"), ("flags", "<u4"), ("volume_real", "<f8"),
+])
+
+# Retcodes a failed order_send is drawn from: the transient errors a broker returns under load
+DEFAULT_FAILURE_RETCODES = (TRADE_RETCODE_REQUOTE, TRADE_RETCODE_TIMEOUT, TRADE_RETCODE_PRICE_CHANGED,
+                            TRADE_RETCODE_TOO_MANY_REQUESTS, TRADE_RETCODE_CONNECTION)
+
+BUY_TYPES = (ORDER_TYPE_BUY, ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP)
+
+# Function to generate a random-walk tick stream for a symbol
+def make_random_ticks(count: int, start: Union[int, float] = 1700000000, interval_ms: int = 250, price: float = 1.1,
+                      volatility: float = 0.00002, spread: float = 0.00008, seed: Optional[int] = None) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    ticks["time_msc"] = int(start * 1000) + np.cumsum(rng.integers(1, 2 * interval_ms, count))
+    ticks["time"] = ticks["time_msc"] // 1000
+    ticks["bid"] = np.round(price + np.cumsum(rng.normal(0, volatility, count)), 5)
+    ticks["ask"] = np.round(ticks["bid"] + spread, 5)
+    return ticks
+
+class SimTerminal:
+    """Replays tick streams and keeps a simulated account of pending orders and positions."""
+
+    def __init__(self, feeds: Dict[str, np.ndarray], latency: Union[float, Dict[str, float]] = 0.0, jitter: float = 0.0,
+                 failure_rates: Optional[Dict[str, float]] = None, failure_retcodes=DEFAULT_FAILURE_RETCODES,
+                 symbols: Optional[Dict[str, dict]] = None, seed: Optional[int] = None):
+        self.feeds = feeds
+        self.latency = latency  # Seconds per call, or per call name
+        self.jitter = jitter  # Relative random spread added to each latency
+        self.failure_rates = failure_rates or {}  # Probability per call name that the call fails
+        self.failure_retcodes = failure_retcodes
+        self.symbols = symbols or {}
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+
+        self.now_msc = min(int(ticks["time_msc"][0]) for ticks in feeds.values()) if feeds else 0
+        self.cursor = {symbol: 0 for symbol in feeds}  # Index of the next tick not yet applied
+        self.orders: Dict[int, TradeOrder] = {}
+        self.positions: Dict[int, TradePosition] = {}
+        self.history = []  # (ticket, symbol, type, volume, price_open, price_close, reason)
+        self.next_ticket = 1000000
+        self.rates_cache: Dict[Tuple[str, int], np.ndarray] = {}
+        self.calls = Counter()
+        self.failures = Counter()
+        self.error = (1, "Success")
+        self.replay_thread: Optional[threading.Thread] = None
+        self.replaying = False
+        self.advance(0)
+
+    # Function to sleep for the configured latency of a call and decide whether it fails
+    def call(self, name: str) -> bool:
+        self.calls[name] += 1
+        latency = self.latency.get(name, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency > 0:
+            time.sleep(max(0.0, latency * (1 + self.random.uniform(-self.jitter, self.jitter))))
+        if self.random.random() < self.failure_rates.get(name, 0.0):
+            self.failures[name] += 1
+            self.error = (-10005, "IPC timeout")
+            return False
+        self.error = (1, "Success")
+        return True
+
+    # Function to move the simulated clock forward, filling pending orders and closing positions on SL/TP
+    def advance(self, seconds: float):
+        with self.lock:
+            self.now_msc += int(seconds * 1000)
+            for symbol, ticks in self.feeds.items():
+                start = self.cursor[symbol]
+                stop = int(np.searchsorted(ticks["time_msc"], self.now_msc, side="right"))
+                if stop > start:
+                    self.match(symbol, ticks[start:stop])
+                    self.cursor[symbol] = stop
+
+    # Function to run the clock in a background thread, `speed` simulated seconds per real second
+    def start_replay(self, speed: float = 1.0, step: float = 0.01):
+        def replay():
+            # Advance by the real time that passed, so the clock keeps up even when calls hold the lock
+            last = time.monotonic()
+            while self.replaying:
+                time.sleep(step)
+                now = time.monotonic()
+                self.advance((now - last) * speed)
+                last = now
+        self.replaying = True
+        self.replay_thread = threading.Thread(target=replay, name="mt5sim-replay", daemon=True)
+        self.replay_thread.start()
+
+    def stop_replay(self):
+        self.replaying = False
+        if self.replay_thread is not None:
+            self.replay_thread.join()
+            self.replay_thread = None
+
+    # Function to apply a slice of new ticks to the symbol's pending orders and positions
+    def match(self, symbol: str, ticks: np.ndarray):
+        for position in [position for position in self.positions.values() if position.symbol == symbol]:
+            self.check_stops(position, ticks)
+
+        bid = ticks["bid"]
+        ask = ticks["ask"]
+        for order in [order for order in self.orders.values() if order.symbol == symbol]:
+            if order.type == ORDER_TYPE_BUY_LIMIT:
+                hit = ask <= order.price_open
+            elif order.type == ORDER_TYPE_SELL_LIMIT:
+                hit = bid >= order.price_open
+            elif order.type == ORDER_TYPE_BUY_STOP:
+                hit = ask >= order.price_open
+            else:
+                hit = bid <= order.price_open
+            if not hit.any():
+                continue
+            index = int(hit.argmax())
+            is_buy = order.type in BUY_TYPES
+            # Limits fill at their price, stops at the first price through the level
+            if order.type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT):
+                price = order.price_open
+            else:
+                price = float(ask[index] if is_buy else bid[index])
+            del self.orders[order.ticket]
+            time_msc = int(ticks["time_msc"][index])
+            self.positions[order.ticket] = TradePosition(
+                ticket=order.ticket, time=time_msc // 1000, time_msc=time_msc, time_update=time_msc // 1000,
+                time_update_msc=time_msc, type=ORDER_TYPE_BUY if is_buy else ORDER_TYPE_SELL, magic=order.magic,
+                identifier=order.ticket, reason=0, volume=order.volume_initial, price_open=price, sl=order.sl, tp=order.tp,
+                price_current=price, swap=0.0, profit=0.0, symbol=symbol, comment=order.comment, external_id="")
+            self.check_stops(self.positions[order.ticket], ticks[index + 1:])
+
+    # Function to close a position on the first tick that reaches its SL or TP
+    def check_stops(self, position: TradePosition, ticks: np.ndarray):
+        if len(ticks) == 0 or position.ticket not in self.positions:
+            return
+        if position.type == ORDER_TYPE_BUY:
+            price = ticks["bid"]
+            sl_hit = price <= position.sl if position.sl else np.zeros(len(ticks), dtype=bool)
+            tp_hit = price >= position.tp if position.tp else np.zeros(len(ticks), dtype=bool)
+        else:
+            price = ticks["ask"]
+            sl_hit = price >= position.sl if position.sl else np.zeros(len(ticks), dtype=bool)
+            tp_hit = price <= position.tp if position.tp else np.zeros(len(ticks), dtype=bool)
+        hit = sl_hit | tp_hit
+        if hit.any():
+            index = int(hit.argmax())
+            self.close(position, float(price[index]), "sl" if sl_hit[index] else "tp")
+        else:
+            self.positions[position.ticket] = position._replace(price_current=float(price[-1]), profit=self.profit(position, float(price[-1])))
+
+    def profit(self, position: TradePosition, price: float) -> float:
+        direction = 1 if position.type == ORDER_TYPE_BUY else -1
+        contract = self.symbol_spec(position.symbol)["trade_contract_size"]
+        return round(direction * (price - position.price_open) * position.volume * contract, 2)
+
+    def close(self, position: TradePosition, price: float, reason: str):
+        del self.positions[position.ticket]
+        self.history.append((position.ticket, position.symbol, position.type, position.volume, position.price_open, price, reason))
+
+    # Function to get the last tick at or before the simulated clock
+    def current_tick(self, symbol: str) -> Optional[Tick]:
+        ticks = self.feeds.get(symbol)
+        if ticks is None or self.cursor[symbol] == 0:
+            return None
+        tick = ticks[self.cursor[symbol] - 1]
+        return Tick(int(tick["time_msc"]) // 1000, float(tick["bid"]), float(tick["ask"]), float(tick["last"]),
+                    int(tick["volume"]), int(tick["time_msc"]), int(tick["flags"]), float(tick["volume_real"]))
+
+    def symbol_spec(self, symbol: str) -> dict:
+        spec = {"point": 0.00001, "digits": 5, "spread": 8, "trade_stops_level": 0, "trade_freeze_level": 0,
+                "trade_tick_value": 1.0, "trade_tick_size": 0.00001, "trade_contract_size": 100000.0,
+                "volume_min": 0.01, "volume_max": 100.0, "volume_step": 0.01,
+                "currency_base": symbol[:3], "currency_profit": symbol[3:6]}
+        spec.update(self.symbols.get(symbol, {}))
+        return spec
+
+    # Function to get the bars of a symbol up to the simulated clock; the forming bar only sees past ticks
+    def rates(self, symbol: str, timeframe: int) -> np.ndarray:
+        ticks = self.feeds.get(symbol)
+        if ticks is None or self.cursor[symbol] == 0:
+            return np.empty(0, dtype=RATE_DTYPE)
+        seconds = TIMEFRAME_SECONDS[timeframe]
+        key = (symbol, timeframe)
+        if key not in self.rates_cache:
+            self.rates_cache[key] = ticks_to_bars(ticks, seconds, self.symbol_spec(symbol)["point"])
+        rates = self.rates_cache[key]
+
+        last_tick = ticks[self.cursor[symbol] - 1]
+        forming_start = int(last_tick["time"]) // seconds * seconds
+        closed = rates[: int(np.searchsorted(rates["time"], forming_start, side="left"))]
+        first_tick = int(np.searchsorted(ticks["time_msc"], forming_start * 1000, side="left"))
+        forming = ticks_to_bars(ticks[first_tick:self.cursor[symbol]], seconds, self.symbol_spec(symbol)["point"])
+        return np.concatenate([closed, forming])
+
+    def new_ticket(self) -> int:
+        self.next_ticket += 1
+        return self.next_ticket
+
+    # Function to carry out a trade request the way the trade server would
+    def send(self, request: dict) -> OrderSendResult:
+        action = request.get("action")
+        symbol = request.get("symbol")
+        retcode, order_ticket, deal, price = TRADE_RETCODE_DONE, 0, 0, request.get("price", 0.0)
+
+        if action == TRADE_ACTION_PENDING:
+            tick = self.current_tick(symbol)
+            order_type = request["type"]
+            if tick is None:
+                retcode = TRADE_RETCODE_MARKET_CLOSED
+            elif ((order_type == ORDER_TYPE_BUY_LIMIT and price >= tick.ask) or (order_type == ORDER_TYPE_SELL_LIMIT and price <= tick.bid)
+                  or (order_type == ORDER_TYPE_BUY_STOP and price <= tick.ask) or (order_type == ORDER_TYPE_SELL_STOP and price >= tick.bid)):
+                retcode = TRADE_RETCODE_INVALID_PRICE
+            else:
+                order_ticket = self.new_ticket()
+                self.orders[order_ticket] = TradeOrder(
+                    ticket=order_ticket, time_setup=self.now_msc // 1000, time_setup_msc=self.now_msc, time_done=0, time_done_msc=0,
+                    time_expiration=0, type=order_type, type_time=request.get("type_time", ORDER_TIME_GTC),
+                    type_filling=request.get("type_filling", ORDER_FILLING_RETURN), state=1, magic=request.get("magic", 0),
+                    position_id=0, position_by_id=0, reason=3, volume_initial=request["volume"], volume_current=request["volume"],
+                    price_open=price, sl=request.get("sl", 0.0), tp=request.get("tp", 0.0), price_current=tick.bid,
+                    price_stoplimit=0.0, symbol=symbol, comment=request.get("comment", ""), external_id="")
+        elif action == TRADE_ACTION_REMOVE:
+            order_ticket = request.get("order")
+            if self.orders.pop(order_ticket, None) is None:
+                retcode = TRADE_RETCODE_INVALID
+        elif action == TRADE_ACTION_SLTP:
+            position = self.positions.get(request.get("position"))
+            if position is None:
+                retcode = TRADE_RETCODE_INVALID
+            elif request.get("sl", position.sl) == position.sl and request.get("tp", position.tp) == position.tp:
+                retcode = TRADE_RETCODE_NO_CHANGES
+            else:
+                self.positions[position.ticket] = position._replace(sl=request.get("sl", position.sl), tp=request.get("tp", position.tp))
+        elif action == TRADE_ACTION_DEAL:
+            tick = self.current_tick(symbol)
+            if tick is None:
+                retcode = TRADE_RETCODE_MARKET_CLOSED
+            elif request.get("position"):
+                position = self.positions.get(request["position"])
+                if position is None:
+                    retcode = TRADE_RETCODE_INVALID
+                else:
+                    price = tick.bid if position.type == ORDER_TYPE_BUY else tick.ask
+                    deal = self.new_ticket()
+                    self.close(position, price, "deal")
+            else:
+                is_buy = request["type"] == ORDER_TYPE_BUY
+                price = tick.ask if is_buy else tick.bid
+                order_ticket = deal = self.new_ticket()
+                self.positions[order_ticket] = TradePosition(
+                    ticket=order_ticket, time=self.now_msc // 1000, time_msc=self.now_msc, time_update=self.now_msc // 1000,
+                    time_update_msc=self.now_msc, type=request["type"], magic=request.get("magic", 0), identifier=order_ticket,
+                    reason=3, volume=request["volume"], price_open=price, sl=request.get("sl", 0.0), tp=request.get("tp", 0.0),
+                    price_current=price, swap=0.0, profit=0.0, symbol=symbol, comment=request.get("comment", ""), external_id="")
+        else:
+            retcode = TRADE_RETCODE_INVALID
+
+        tick = self.current_tick(symbol) if symbol else None
+        return OrderSendResult(retcode=retcode, deal=deal, order=order_ticket, volume=request.get("volume", 0.0), price=price,
+                               bid=tick.bid if tick else 0.0, ask=tick.ask if tick else 0.0, comment="", request_id=0,
+                               retcode_external=0, request=request)
+
+terminal: Optional[SimTerminal] = None
+
+# Function to make this module stand in for MetaTrader5 in every later "import MetaTrader5"
+def install(sim_terminal: SimTerminal):
+    global terminal
+    terminal = sim_terminal
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+
+def initialize(*args, **kwargs) -> bool:
+    return terminal is not None
+
+def shutdown():
+    if terminal is not None:
+        terminal.stop_replay()
+
+def last_error() -> Tuple[int, str]:
+    return terminal.error if terminal is not None else (-10003, "IPC initialize failed")
+
+def symbol_info_tick(symbol: str) -> Optional[Tick]:
+    if not terminal.call("symbol_info_tick"):
+        return None
+    with terminal.lock:
+        return terminal.current_tick(symbol)
+
+def symbol_info(symbol: str) -> Optional[SymbolInfo]:
+    if not terminal.call("symbol_info") or symbol not in terminal.feeds:
+        return None
+    return SymbolInfo(name=symbol, **terminal.symbol_spec(symbol))
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to) -> Optional[np.ndarray]:
+    if not terminal.call("copy_rates_range"):
+        return None
+    with terminal.lock:
+        rates = terminal.rates(symbol, timeframe)
+    times = rates["time"]
+    return rates[(times >= to_epoch(date_from)) & (times <= to_epoch(date_to))]
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+    if not terminal.call("copy_rates_from_pos"):
+        return None
+    with terminal.lock:
+        rates = terminal.rates(symbol, timeframe)
+    end = len(rates) - start_pos
+    return rates[max(0, end - count):max(0, end)]
+
+def order_send(request: dict) -> OrderSendResult:
+    if not terminal.call("order_send"):
+        retcode = terminal.random.choice(terminal.failure_retcodes)
+        return OrderSendResult(retcode=retcode, deal=0, order=0, volume=request.get("volume", 0.0), price=request.get("price", 0.0),
+                               bid=0.0, ask=0.0, comment="simulated failure", request_id=0, retcode_external=0, request=request)
+    with terminal.lock:
+        return terminal.send(request)
+
+def orders_get(symbol: Optional[str] = None, ticket: Optional[int] = None, group: Optional[str] = None) -> Optional[tuple]:
+    if not terminal.call("orders_get"):
+        return None
+    with terminal.lock:
+        return tuple(order for order in terminal.orders.values()
+                     if (symbol is None or order.symbol == symbol) and (ticket is None or order.ticket == ticket))
+
+def positions_get(symbol: Optional[str] = None, ticket: Optional[int] = None, group: Optional[str] = None) -> Optional[tuple]:
+    if not terminal.call("positions_get"):
+        return None
+    with terminal.lock:
+        return tuple(position for position in terminal.positions.values()
+                     if (symbol is None or position.symbol == symbol) and (ticket is None or position.ticket == ticket))
@@ -0,0 +1,110 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BUY = 0
+SELL = 1
+# ORDER_TYPE_BUY_LIMIT and ORDER_TYPE_BUY_STOP; the book itself does not need the terminal
+BUY_ORDER_TYPES = (2, 4)
+
+HIGH = "high"
+LOW = "low"
+
+@dataclass
+class OcoOrder:
+    ticket: int
+    symbol: str
+    group: int
+    level: str
+    order_type: int
+
+    @property
+    def side(self) -> int:
+        return BUY if self.order_type in BUY_ORDER_TYPES else SELL
+
+# One-cancels-other book for the pending orders m2.py and m3.py bracket each candle with.
+# Every ticket maps straight to its order and every group to its (at most four) members,
+# so looking up, removing and cancelling the siblings of a ticket never scans older groups.
+class OcoBook:
+    def __init__(self):
+        self.orders: Dict[int, OcoOrder] = {}
+        self.groups: Dict[int, Dict[int, OcoOrder]] = {}
+        self.next_group = 0
+        # Per-symbol workers share one book
+        self.lock = threading.RLock()
+
+    def __contains__(self, ticket: int) -> bool:
+        return ticket in self.orders
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    # Function to register one candle's orders, given as {level: [(ticket, order_type), ...]}; None tickets are skipped.
+    # A ticket already in another group moves to the new one, so a fill never cancels the members of a group it has left.
+    def add_group(self, symbol: str, levels: Dict[str, Iterable[Tuple[Optional[int], int]]]) -> int:
+        with self.lock:
+            group = self.next_group
+            self.next_group += 1
+
+            members = {}
+            for level, orders in levels.items():
+                for ticket, order_type in orders:
+                    if ticket is None:
+                        continue
+                    if ticket in self.orders and self.orders[ticket].group != group:
+                        self.discard(ticket)
+                    order = OcoOrder(ticket, symbol, group, level, order_type)
+                    members[ticket] = order
+                    self.orders[ticket] = order
+
+            if members:
+                self.groups[group] = members
+            return group
+
+    def get(self, ticket: int) -> Optional[OcoOrder]:
+        return self.orders.get(ticket)
+
+    # Function to drop a ticket (deleted, filled or expired), and its group once that is empty
+    def discard(self, ticket: int) -> Optional[OcoOrder]:
+        with self.lock:
+            order = self.orders.pop(ticket, None)
+            if order is None:
+                return None
+
+            members = self.groups[order.group]
+            del members[ticket]
+            if not members:
+                del self.groups[order.group]
+            return order
+
+    # Function to list the other orders in a ticket's group, optionally only those on the opposite level
+    def siblings(self, ticket: int, other_level_only: bool = False) -> List[OcoOrder]:
+        with self.lock:
+            order = self.orders.get(ticket)
+            if order is None:
+                return []
+
+            return [sibling for sibling in self.groups[order.group].values()
+                    if sibling.ticket != ticket and not (other_level_only and sibling.level == order.level)]
+
+    # Function to take a filled ticket out of the book and return the siblings that should now be cancelled
+    def fill(self, ticket: int, other_level_only: bool = False) -> List[OcoOrder]:
+        with self.lock:
+            siblings = self.siblings(ticket, other_level_only)
+            self.discard(ticket)
+            return siblings
+
+    def tickets(self, symbol: Optional[str] = None) -> List[int]:
+        with self.lock:
+            return [ticket for ticket, order in self.orders.items() if symbol is None or order.symbol == symbol]
+
+    # Function to list every group as (symbol, {level: [(ticket, order_type), ...]}), the form add_group takes
+    def export(self) -> List[Tuple[str, Dict[str, List[Tuple[int, int]]]]]:
+        with self.lock:
+            groups = []
+            for members in self.groups.values():
+                levels: Dict[str, List[Tuple[int, int]]] = {}
+                for order in members.values():
+                    levels.setdefault(order.level, []).append((order.ticket, order.order_type))
+                groups.append((next(iter(members.values())).symbol, levels))
+            return groups
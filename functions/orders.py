@@ -1,80 +1,117 @@
 import MetaTrader5 as mt5
 from typing import Optional
+from functions.dedupe import dedupe_index, order_comment
+from functions.symbols import symbol_registry
+from functions.logger import log_order
 
-# Function to place a buy limit order
-def place_buy_limit(symbol:str, price:float, volume:float) -> Optional[mt5.OrderSendResult]:
+# Orders and positions placed by main.py carry this magic number and comments starting with "CXC"
+MAGIC = 234000
+COMMENT_PREFIX = "CXC"
+
+# Initial SL and TP distances from the order price, in pips of the order's symbol
+SL_PIPS = 10
+TP_PIPS = 60
+symbol_registry.register_offsets(COMMENT_PREFIX, SL_PIPS, TP_PIPS)
+
+# Function to tell main.py's orders and positions apart from those of m1.py, m2.py and m3.py
+def is_own(item) -> bool:
+    return item.comment.startswith(COMMENT_PREFIX)
+
+# Function to place a buy limit order. Orders tagged with a level kind and session are placed at most once
+# per (symbol, session, level kind, order type); a repeat returns None.
+def place_buy_limit(symbol:str, price:float, volume:float, level:str="", session:str="") -> Optional[mt5.OrderSendResult]:
+    offsets = symbol_registry.offsets(symbol, COMMENT_PREFIX)
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_BUY_LIMIT,
         "price": price,
-        "sl": price - 0.001,  # Initial Stop loss 10 pips below the buy limit price
-        "tp": price + 0.006,  # Initial Take profit 60 pips above the buy limit price
+        "sl": round(price - offsets.sl, offsets.digits),  # Initial Stop loss SL_PIPS below the buy limit price
+        "tp": round(price + offsets.tp, offsets.digits),  # Initial Take profit TP_PIPS above the buy limit price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "CXC Buy Limit",
+        "magic": MAGIC,
+        "comment": order_comment(COMMENT_PREFIX, mt5.ORDER_TYPE_BUY_LIMIT, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
+    if not dedupe_index.claim(request):
+        return None
     result = mt5.order_send(request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
     return result
 
 # Function to place a sell limit order
-def place_sell_limit(symbol:str, price:float, volume:float) -> Optional[mt5.OrderSendResult]:
+def place_sell_limit(symbol:str, price:float, volume:float, level:str="", session:str="") -> Optional[mt5.OrderSendResult]:
+    offsets = symbol_registry.offsets(symbol, COMMENT_PREFIX)
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_SELL_LIMIT,
         "price": price,
-        "sl": price + 0.001,  # Initial Stop loss 10 pips above the sell limit price
-        "tp": price - 0.006,  # Initial Take profit 60 pips below the sell limit price
+        "sl": round(price + offsets.sl, offsets.digits),  # Initial Stop loss SL_PIPS above the sell limit price
+        "tp": round(price - offsets.tp, offsets.digits),  # Initial Take profit TP_PIPS below the sell limit price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "CXC Sell Limit",
+        "magic": MAGIC,
+        "comment": order_comment(COMMENT_PREFIX, mt5.ORDER_TYPE_SELL_LIMIT, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
+    if not dedupe_index.claim(request):
+        return None
     result = mt5.order_send(request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
     return result
 
 # Function to place a buy stop order
-def place_buy_stop(symbol:str, price:float, volume:float) -> Optional[mt5.OrderSendResult]:
+def place_buy_stop(symbol:str, price:float, volume:float, level:str="", session:str="") -> Optional[mt5.OrderSendResult]:
+    offsets = symbol_registry.offsets(symbol, COMMENT_PREFIX)
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_BUY_STOP,
         "price": price,
-        "sl": price - 0.001,  # Initial Stop loss 10 pips below the buy stop price
-        "tp": price + 0.006,  # Initial Take profit 60 pips above the buy stop price
+        "sl": round(price - offsets.sl, offsets.digits),  # Initial Stop loss SL_PIPS below the buy stop price
+        "tp": round(price + offsets.tp, offsets.digits),  # Initial Take profit TP_PIPS above the buy stop price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "CXC Buy Stop",
+        "magic": MAGIC,
+        "comment": order_comment(COMMENT_PREFIX, mt5.ORDER_TYPE_BUY_STOP, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
+    if not dedupe_index.claim(request):
+        return None
     result = mt5.order_send(request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
     return result
 
 # Function to place a sell stop order
-def place_sell_stop(symbol:str, price:float, volume:float) -> Optional[mt5.OrderSendResult]:
+def place_sell_stop(symbol:str, price:float, volume:float, level:str="", session:str="") -> Optional[mt5.OrderSendResult]:
+    offsets = symbol_registry.offsets(symbol, COMMENT_PREFIX)
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_SELL_STOP,
         "price": price,
-        "sl": price + 0.001,  # Initial Stop loss 10 pips above the sell stop price
-        "tp": price - 0.006,  # Initial Take profit 60 pips below the sell stop price
+        "sl": round(price + offsets.sl, offsets.digits),  # Initial Stop loss SL_PIPS above the sell stop price
+        "tp": round(price - offsets.tp, offsets.digits),  # Initial Take profit TP_PIPS below the sell stop price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "CXC Sell Stop",
+        "magic": MAGIC,
+        "comment": order_comment(COMMENT_PREFIX, mt5.ORDER_TYPE_SELL_STOP, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
+    if not dedupe_index.claim(request):
+        return None
     result = mt5.order_send(request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
     return result
 
 def place_modified_sl(symbol:str, ticket:str, sl:float, tp:float) -> Optional[mt5.OrderSendResult]:
@@ -84,9 +121,10 @@ def place_modified_sl(symbol:str, ticket:str, sl:float, tp:float) -> Optional[mt
         "position": ticket,
         "sl": sl,
         "tp": tp,
-        "magic": 234000,
+        "magic": MAGIC,
     }
     result = mt5.order_send(request)
+    log_order("modify_sl", request, result)
     return result
 
 def close_position(symbol:str, ticket:str, volume:float, current_price:float, order_type:int)  -> Optional[mt5.OrderSendResult]:
@@ -98,9 +136,10 @@ def close_position(symbol:str, ticket:str, volume:float, current_price:float, or
         "price": current_price,
         "type": order_type,
         "deviation": 10,
-        "magic": 234000,
+        "magic": MAGIC,
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
     result = mt5.order_send(request)
+    log_order("close", request, result)
     return result
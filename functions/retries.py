@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+from functions.ticks import reset_tick_snapshot
+from functions.logger import get_logger
+
+logger = get_logger()
+
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry; the delay doubles after every failed attempt
+RETRY_MAX_DELAY = 60.0
+RETRY_DEADLINE = 30 * 60.0  # Seconds after which a job that still fails is given up
+MAX_CONCURRENT_RETRIES = 2
+
+# A job is one session's work for one symbol
+RetryKey = Tuple[str, str]  # (session, symbol)
+
+@dataclass
+class RetryJob:
+    key: RetryKey
+    day: date  # The session day the work is for
+    attempt: Callable[[], bool]  # Returns True once the work is done, False to be retried
+    deadline: float  # time.monotonic() after which the job is dropped
+    next_run: float
+    attempts: int = 0
+    running: bool = False
+
+# Retries of (session, symbol) jobs, each on its own exponential backoff and deadline, at most max_concurrent
+# at a time on a small thread pool. Work done for a session day, by the scheduled run or a retry, is recorded
+# so it is never queued or run again that day.
+class RetryQueue:
+    def __init__(self, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY,
+                 deadline: float = RETRY_DEADLINE, max_concurrent: int = MAX_CONCURRENT_RETRIES):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.max_concurrent = max_concurrent
+        self.jobs: Dict[RetryKey, RetryJob] = {}
+        self.completed: Dict[RetryKey, date] = {}  # The last day each job's work was done
+        self.stats = {"attempts": 0, "completed": 0, "expired": 0}
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def is_done(self, session: str, symbol: str, day: date) -> bool:
+        with self.lock:
+            return self.completed.get((session, symbol)) == day
+
+    # Function to record that a job's work is done for the day, dropping a queued retry for it
+    def complete(self, session: str, symbol: str, day: date):
+        key = (session, symbol)
+        with self.lock:
+            self.completed[key] = day
+            job = self.jobs.get(key)
+            if job is not None and not job.running:
+                del self.jobs[key]
+
+    # Function to queue a job for retrying, unless its work is already done or it is queued for that day
+    def schedule(self, session: str, symbol: str, day: date, attempt: Callable[[], bool]):
+        key = (session, symbol)
+        now = time.monotonic()
+        with self.lock:
+            if self.completed.get(key) == day:
+                return
+            job = self.jobs.get(key)
+            if job is not None and (job.day == day or job.running):
+                return
+            self.jobs[key] = RetryJob(key, day, attempt, now + self.deadline, now + self.base_delay)
+        logger.info(f"Retrying {session} for {symbol} in {self.base_delay:g}s")
+
+    def pending(self) -> List[RetryKey]:
+        with self.lock:
+            return list(self.jobs)
+
+    # Function to start the jobs that are due, as many as the concurrency limit allows, and drop the expired ones.
+    # Returns how many were started; they run in the background.
+    def run_due(self) -> int:
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            running = sum(job.running for job in self.jobs.values())
+            for key, job in list(self.jobs.items()):
+                if job.running:
+                    continue
+                if now >= job.deadline:
+                    del self.jobs[key]
+                    self.stats["expired"] += 1
+                    logger.warning(f"Gave up retrying {key[0]} for {key[1]} after {job.attempts} attempts")
+                elif job.next_run <= now and running < self.max_concurrent:
+                    job.running = True
+                    running += 1
+                    due.append(job)
+
+        if due and self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="retry")
+        for job in due:
+            self.executor.submit(self.run_job, job)
+        return len(due)
+
+    def run_job(self, job: RetryJob):
+        # Start from fresh quotes; this thread's snapshot still holds the previous attempt's
+        reset_tick_snapshot()
+        try:
+            done = job.attempt()
+        except Exception:
+            logger.exception(f"Retry of {job.key[0]} for {job.key[1]} failed")
+            done = False
+
+        with self.lock:
+            job.attempts += 1
+            job.running = False
+            self.stats["attempts"] += 1
+            if done:
+                self.completed[job.key] = max(self.completed.get(job.key, job.day), job.day)
+                self.stats["completed"] += 1
+            # The job may have been completed by the scheduled run, or replaced for a new day, meanwhile
+            if self.jobs.get(job.key) is not job:
+                return
+            if done or self.completed.get(job.key) == job.day:
+                del self.jobs[job.key]
+            else:
+                job.next_run = time.monotonic() + min(self.max_delay, self.base_delay * 2 ** job.attempts)
@@ -0,0 +1,162 @@
+import MetaTrader5 as mt5
+import asyncio
+import schedule
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Set, Tuple
+from functions.trading import retry_missing_symbols
+from functions.session import plan_sl_tp, close_trailed_position, move_trailed_sl
+from functions.ticks import reset_tick_snapshot, poll_changed_symbols, next_poll_delay, MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+from functions.metrics import metrics
+from functions.logger import get_logger
+
+logger = get_logger()
+
+LATENCY_BUDGET = 0.5  # Seconds a trailing-stop check or SL/close request may take before it is reported as late
+JOB_TIMEOUT = 120.0  # Seconds a scheduled job may run before it is reported as late
+CHECK_WORKERS = 4
+PROTECTION_WORKERS = 8
+JOB_WORKERS = 4
+
+# Trailing-stop checks, the SL/close requests they produce and session jobs each get their own threads,
+# so a job stuck in copy_rates_range or a slow order_send never takes the thread a check needs
+check_executor = ThreadPoolExecutor(CHECK_WORKERS, thread_name_prefix="checks")
+protection_executor = ThreadPoolExecutor(PROTECTION_WORKERS, thread_name_prefix="protection")
+job_executor = ThreadPoolExecutor(JOB_WORKERS, thread_name_prefix="jobs")
+
+runtime_stats = {"late_checks": 0, "late_calls": 0, "skipped_actions": 0, "last_check": 0.0}
+
+# Function to run func on an executor thread, starting from a fresh tick snapshot
+def run_fresh(func: Callable, *args):
+    reset_tick_snapshot()
+    return func(*args)
+
+# Function to run one trailing-stop check, timed as an iteration of the protection loop
+def run_check(*args):
+    started = time.perf_counter()
+    try:
+        return run_fresh(plan_protection, *args)
+    finally:
+        metrics.observe_loop("protection", time.perf_counter() - started)
+
+# Function to await a blocking call on executor, logging once it runs past timeout but still waiting for it,
+# so the caller never starts a second copy while the first is stuck in the terminal
+async def run_blocking(executor: Executor, timeout: float, description: str, func: Callable, *args):
+    future = asyncio.get_running_loop().run_in_executor(executor, run_fresh, func, *args)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        runtime_stats["late_calls"] += 1
+        logger.warning(f"{description} is taking longer than {timeout}s; waiting for the terminal")
+        return await future
+
+# Function to find the positions that need their SL moved or closing, optionally only on symbols whose quote moved
+def plan_protection(currency_pairs: list, event_driven: bool, min_poll_interval: float) -> Tuple[bool, list, list]:
+    if not event_driven:
+        return True, *plan_sl_tp()
+
+    changed_symbols = poll_changed_symbols(currency_pairs, min_poll_interval)
+    if not changed_symbols:
+        return False, [], []
+    return True, *plan_sl_tp(changed_symbols)
+
+# Trailing-stop loop. Each SL move or close runs as its own task, so one slow request only delays its own
+# position; a position with a request still in flight is skipped until that request returns.
+async def protect_positions(currency_pairs: list, event_driven: bool, min_poll_interval: float, max_idle_delay: float,
+                            latency_budget: float):
+    loop = asyncio.get_running_loop()
+    in_flight: Dict[int, asyncio.Task] = {}
+    abandoned: Set[asyncio.Future] = set()
+    planning = None
+    delay = min_poll_interval
+
+    async def run_action(ticket: int, description: str, func: Callable, *args):
+        try:
+            await run_blocking(protection_executor, latency_budget, description, func, *args)
+        except Exception:
+            logger.exception(f"{description} failed")
+        finally:
+            in_flight.pop(ticket, None)
+
+    while True:
+        if planning is None:
+            planning = loop.run_in_executor(check_executor, run_check, currency_pairs, event_driven, min_poll_interval)
+        done, _ = await asyncio.wait({planning}, timeout=latency_budget)
+        if not done:
+            runtime_stats["late_checks"] += 1
+            if len(abandoned) < CHECK_WORKERS - 1:
+                # Leave the stuck check to finish on its own and start a fresh one on another thread
+                logger.warning(f"Trailing-stop check exceeded the {latency_budget}s latency budget; starting another")
+                abandoned.add(planning)
+                planning.add_done_callback(abandoned.discard)
+                planning = None
+            else:
+                # Every check thread is already stuck in the terminal
+                logger.warning(f"Trailing-stop check exceeded the {latency_budget}s latency budget; still waiting for the terminal")
+            continue
+
+        try:
+            changed, moves, closes = planning.result()
+        except Exception:
+            logger.exception("Trailing-stop check failed")
+            changed, moves, closes = False, [], []
+        planning = None
+        runtime_stats["last_check"] = time.time()
+
+        actions: List[Tuple[int, str, Callable, tuple]] = \
+            [(pos.ticket, f"Closing position {pos.ticket}", close_trailed_position, (pos, price)) for pos, price in closes] + \
+            [(pos.ticket, f"Moving SL of position {pos.ticket}", move_trailed_sl, (pos, sl)) for pos, sl in moves]
+        for ticket, description, func, args in actions:
+            if ticket in in_flight:
+                runtime_stats["skipped_actions"] += 1
+                continue
+            in_flight[ticket] = asyncio.create_task(run_action(ticket, description, func, *args))
+
+        delay = next_poll_delay(delay, changed, min_poll_interval, max_idle_delay) if event_driven else 1
+        await asyncio.sleep(delay)
+
+# Scheduled-job loop: every due job runs on the job executor, and a job that is still running is not started again
+async def run_jobs(job_timeout: float):
+    running: Dict[int, asyncio.Task] = {}
+
+    async def run_job(job: schedule.Job):
+        try:
+            result = await run_blocking(job_executor, job_timeout, f"Job {job}", job.run)
+            if result is schedule.CancelJob or isinstance(result, schedule.CancelJob):
+                schedule.cancel_job(job)
+        except Exception:
+            logger.exception(f"Job {job} failed")
+            # job.run() raised before rescheduling itself; without this it would be retried every second
+            job._schedule_next_run()
+
+    while True:
+        for job in list(schedule.jobs):
+            task = running.get(id(job))
+            if task is not None and not task.done():
+                continue
+            if job.should_run:
+                running[id(job)] = asyncio.create_task(run_job(job))
+        await asyncio.sleep(1)
+
+async def run_runtime(currency_pairs: list, lot_size: float, event_driven: bool = True, min_poll_interval: float = MIN_POLL_INTERVAL,
+                      max_idle_delay: float = MAX_IDLE_DELAY, latency_budget: float = LATENCY_BUDGET, job_timeout: float = JOB_TIMEOUT):
+    # Start the retries of symbols that were missing market data once they are due
+    schedule.every(1).seconds.do(retry_missing_symbols)
+
+    await asyncio.gather(
+        protect_positions(currency_pairs, event_driven, min_poll_interval, max_idle_delay, latency_budget),
+        run_jobs(job_timeout),
+    )
+
+# Function to run the bot on the asyncio runtime until interrupted
+def run_async(currency_pairs: list, lot_size: float, **options):
+    try:
+        asyncio.run(run_runtime(currency_pairs, lot_size, **options))
+    except KeyboardInterrupt:
+        logger.info("Execution interrupted by user.")
+    finally:
+        check_executor.shutdown(wait=False, cancel_futures=True)
+        protection_executor.shutdown(wait=False, cancel_futures=True)
+        job_executor.shutdown(wait=False, cancel_futures=True)
+        # Shutdown MetaTrader5 connection
+        mt5.shutdown()
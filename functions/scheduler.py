@@ -1,8 +1,11 @@
+import MetaTrader5 as mt5
 import schedule
 import time
-from functions.trading import run_get_previous_day_high_low, run_get_previous_asia_session_high_low
-from functions.session import delete_pending_orders_at_1am, adjust_sl_tp
-from functions.logger import get_logger
+from functions.trading import run_get_previous_day_high_low, run_get_previous_asia_session_high_low, retry_missing_symbols
+from functions.session import delete_pending_orders_at_1am, adjust_sl_tp, stop_manager
+from functions.ticks import reset_tick_snapshot, log_tick_stats, poll_changed_symbols, next_poll_delay, MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+from functions.metrics import metrics
+from functions.logger import get_logger, log_queue_stats
 
 logger = get_logger()
 
@@ -17,19 +20,37 @@ def schedule_tasks(currency_pairs:list, day_high_low_time:str, asia_high_low_tim
     # Schedule delete_pending_orders_at_1am at the specified time
     schedule.every().day.at(delete_orders_time).do(delete_pending_orders_at_1am)
 
-def run_scheduler(currency_pairs:list,lot_size:float):
-    global previouse_day_missing_symbols, asia_session_missing_symbols
+    # Report how many tick round trips the per-iteration snapshot saved, any log records dropped and the SL requests sent
+    schedule.every(10).minutes.do(log_tick_stats)
+    schedule.every(10).minutes.do(log_queue_stats)
+    schedule.every(10).minutes.do(stop_manager.log_stats, "Session")
+
+def run_scheduler(currency_pairs:list, lot_size:float, event_driven:bool=True, min_poll_interval:float=MIN_POLL_INTERVAL, max_idle_delay:float=MAX_IDLE_DELAY):
+    delay = min_poll_interval
     try:
         while True:
-            if previouse_day_missing_symbols:
-                run_get_previous_day_high_low(currency_pairs, lot_size)
-            if asia_session_missing_symbols:
-                run_get_previous_asia_session_high_low(currency_pairs, lot_size)
-            adjust_sl_tp()
+            reset_tick_snapshot()
+            started = time.perf_counter()
+
+            # Start the retries of symbols that were missing market data once they are due; they run on
+            # their own threads, so a slow retry never holds up the trailing stops
+            retry_missing_symbols()
+
+            if event_driven:
+                # Only re-evaluate positions on symbols whose quote moved
+                changed_symbols = poll_changed_symbols(currency_pairs, min_poll_interval)
+                if changed_symbols:
+                    adjust_sl_tp(changed_symbols)
+                delay = next_poll_delay(delay, bool(changed_symbols), min_poll_interval, max_idle_delay)
+            else:
+                adjust_sl_tp()
+                delay = 1
+
             schedule.run_pending()
-            time.sleep(1)
+            metrics.observe_loop("scheduler", time.perf_counter() - started)
+            time.sleep(delay)
     except KeyboardInterrupt:
         logger.info("Execution interrupted by user.")
     finally:
         # Shutdown MetaTrader5 connection
-        mt5.shutdown()
\ No newline at end of file
+        mt5.shutdown()
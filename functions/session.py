@@ -1,55 +1,55 @@
 import MetaTrader5 as mt5
-from functions.orders import place_modified_sl
+from typing import Iterable, List, Optional, Tuple
+from functions.orders import place_modified_sl, close_position, is_own, MAGIC, COMMENT_PREFIX
+from functions.cancel import cancel_orders, select_orders, CancelReport
+from functions.ticks import get_close_price
+from functions.trailing import plan_trailing, SESSION_TIERS
+from functions.stops import StopManager
+from functions.symbols import symbol_registry
 from functions.logger import get_logger
 
 logger = get_logger()
 
-# Function to adjust stop loss and take profit based on the given conditions
-def adjust_sl_tp():
+# SL modifications of main.py's positions, paced and sent once per tier
+stop_manager = StopManager(SESSION_TIERS)
+
+# Function to work out which positions' stops to move and which positions to close
+def plan_sl_tp(symbols: Optional[Iterable[str]] = None) -> Tuple[List[Tuple[mt5.TradePosition, float]], List[Tuple[mt5.TradePosition, float]]]:
     positions = mt5.positions_get()
-    for pos in positions:
-        symbol = pos.symbol
-        ticket = pos.ticket
-        order_type = pos.type
-        open_price = pos.price_open
-        volume = pos.volume
-
-        current_price = mt5.symbol_info_tick(symbol).bid if order_type == mt5.ORDER_TYPE_BUY else mt5.symbol_info_tick(symbol).ask
-        profit = (current_price - open_price) if order_type == mt5.ORDER_TYPE_BUY else (open_price - current_price)
-        profit_pips = profit * 10000  # Convert profit to pips
-        negative_order_type = mt5.ORDER_TYPE_SELL if order_type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-
-        current_sl = pos.sl
-        current_tp = pos.tp
-
-        try:
-            if profit_pips >= 60:
-                close_position(symbol, ticket, volume, current_price, negative_order_type)
-            elif profit_pips >= 30:
-                sl_price = open_price + 0.0029 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.0029
-                if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                    place_modified_sl(symbol, ticket, sl_price, current_tp)
-            elif profit_pips >= 20:
-                sl_price = open_price + 0.001 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.001
-                if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                    place_modified_sl(symbol, ticket, sl_price, current_tp)
-            elif profit_pips >= 10:
-                sl_price = open_price + 0.00005 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.00005
-                if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                    place_modified_sl(symbol, ticket, sl_price, current_tp)
-        except Exception as e:
-            logger.error(f"Error adjusting SL/TP for {symbol} (ticket: {ticket}): {e}")
+    if not positions:
+        return [], []
+    positions = [pos for pos in positions if is_own(pos) and (symbols is None or pos.symbol in symbols)]
+
+    return plan_trailing(positions, SESSION_TIERS, get_close_price, get_pip=symbol_registry.pip)
+
+# Function to close a position that reached its closing tier
+def close_trailed_position(pos: mt5.TradePosition, current_price: float):
+    try:
+        negative_order_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
+        close_position(pos.symbol, pos.ticket, pos.volume, current_price, negative_order_type)
+        stop_manager.forget(pos.ticket)
+    except Exception as e:
+        logger.error(f"Error closing position for {pos.symbol} (ticket: {pos.ticket}): {e}")
+
+# Function to move a position's stop loss up to its current tier
+def move_trailed_sl(pos: mt5.TradePosition, sl_price: float):
+    try:
+        stop_manager.update(pos, sl_price, lambda sl: place_modified_sl(pos.symbol, pos.ticket, sl, pos.tp))
+    except Exception as e:
+        logger.error(f"Error adjusting SL/TP for {pos.symbol} (ticket: {pos.ticket}): {e}")
+
+# Function to adjust stop loss and take profit based on the given conditions
+def adjust_sl_tp(symbols: Optional[Iterable[str]] = None):
+    moves, closes = plan_sl_tp(symbols)
+
+    for pos, current_price in closes:
+        close_trailed_position(pos, current_price)
+
+    for pos, sl_price in moves:
+        move_trailed_sl(pos, sl_price)
 
 # Function to delete pending orders scheduled for 1 AM
-def delete_pending_orders_at_1am():
-    positions = mt5.positions_get()
-    # print(positions)
-    orders = mt5.orders_get()
-    for order in orders:
-        close_request = {
-            "action": mt5.TRADE_ACTION_REMOVE,
-            "order": order.ticket,
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        result = mt5.order_send(close_request)
+def delete_pending_orders_at_1am() -> CancelReport:
+    # Leave the orders of m1.py, m2.py and m3.py alone
+    orders = select_orders(mt5.orders_get(), magics=(MAGIC,), prefix=COMMENT_PREFIX)
+    return cancel_orders(orders, description="Pending orders at 1 AM")
@@ -0,0 +1,156 @@
+import calendar
+import threading
+import numpy as np
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+from functions.bars import from_epoch
+from functions.logger import get_logger
+
+logger = get_logger()
+
+MINUTES_PER_DAY = 24 * 60
+SECONDS_PER_DAY = 24 * 60 * 60
+KEPT_DAYS = 7  # Days of tables kept; older ones are dropped when a new day is built
+
+# A session that opens at start on the trading day span trading days back and closes at end on the trading day
+# itself, both wall-clock times in the session time zone. The previous day is (05:00, 05:00, 1).
+@dataclass(frozen=True)
+class Session:
+    start: time
+    end: time
+    span: int = 0
+
+# One session's window in server time: epoch seconds of the broker's wall clock, the way the terminal stamps bars
+@dataclass(frozen=True)
+class SessionWindow:
+    start: int
+    end: int
+
+    def __contains__(self, server_time) -> bool:
+        return self.start <= server_time < self.end
+
+    # As datetimes copy_rates_range and the bar store take
+    @property
+    def start_time(self) -> datetime:
+        return from_epoch(self.start)
+
+    @property
+    def end_time(self) -> datetime:
+        return from_epoch(self.end)
+
+# Session windows worked out once per trading day and shared by every symbol and strategy. Session hours are
+# set in the trader's time zone (the machine's by default) and turned into the broker's server time, so DST on
+# either side moves the windows with it. Without a server time zone the server clock is taken to read the same
+# as the session time zone, which is what the bot always assumed. Weekends are not trading days: a session asked
+# for on a Saturday or Sunday is Friday's, and a span reaching back over a weekend skips it.
+#
+# Per server day there is also a table with a bit per session for every minute, so telling whether a bar falls
+# in some sessions is an index and a mask instead of date arithmetic.
+class SessionCalendar:
+    def __init__(self, session_timezone: Optional[str] = None, server_timezone: Optional[str] = None):
+        self.sessions: Dict[str, Session] = {}
+        self.bits: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.configure(session_timezone, server_timezone)
+
+    # Function to set the time zones, e.g. "Asia/Colombo" and the broker's "Europe/Athens"; drops every table
+    def configure(self, session_timezone: Optional[str] = None, server_timezone: Optional[str] = None):
+        with self.lock:
+            self.session_zone = ZoneInfo(session_timezone) if session_timezone else None
+            self.server_zone = ZoneInfo(server_timezone) if server_timezone else None
+            self.tables: Dict[date, Dict[str, SessionWindow]] = {}
+            self.minute_tables: Dict[int, np.ndarray] = {}
+        if server_timezone:
+            logger.info(f"Session hours in {session_timezone or 'local time'}, server time in {server_timezone}")
+
+    # Function to declare a session, with start and end as "HH:MM"
+    def register(self, name: str, start: str, end: str, span: int = 0):
+        with self.lock:
+            self.sessions[name] = Session(time.fromisoformat(start), time.fromisoformat(end), span)
+            self.bits.setdefault(name, 1 << len(self.bits))
+            self.tables.clear()
+            self.minute_tables.clear()
+
+    # Function to combine the bits of the given sessions, for in_session
+    def mask(self, *names: str) -> int:
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def today(self) -> date:
+        return datetime.now(self.session_zone).date()
+
+    # Function to get the last trading day on or before day
+    @staticmethod
+    def trading_day(day: date) -> date:
+        return day - timedelta(days=max(0, day.weekday() - 4))
+
+    # Function to step back count trading days from day
+    @staticmethod
+    def previous_trading_day(day: date, count: int = 1) -> date:
+        for _ in range(count):
+            day -= timedelta(days=3 if day.weekday() == 0 else 1)
+        return SessionCalendar.trading_day(day)
+
+    # Function to turn a wall-clock time in the session time zone into server epoch seconds
+    def to_server(self, day: date, moment: time) -> int:
+        local = datetime.combine(day, moment)
+        if self.server_zone is not None:
+            aware = local.replace(tzinfo=self.session_zone) if self.session_zone is not None else local.astimezone()
+            local = aware.astimezone(self.server_zone).replace(tzinfo=None)
+        return calendar.timegm(local.timetuple())
+
+    def build_window(self, session: Session, day: date) -> SessionWindow:
+        opens = self.previous_trading_day(day, session.span) if session.span else day
+        return SessionWindow(self.to_server(opens, session.start), self.to_server(day, session.end))
+
+    # Function to get a trading day's table of session windows, building it on first use
+    def table(self, day: date) -> Dict[str, SessionWindow]:
+        table = self.tables.get(day)
+        if table is None:
+            with self.lock:
+                table = {name: self.build_window(session, day) for name, session in self.sessions.items()}
+                for old in [old for old in self.tables if (day - old).days > KEPT_DAYS]:
+                    del self.tables[old]
+                self.tables[day] = table
+        return table
+
+    # Function to get a session's window for day (today by default); a weekend day gets Friday's window
+    def window(self, name: str, day: Optional[date] = None) -> SessionWindow:
+        return self.table(self.trading_day(day or self.today()))[name]
+
+    # Function to build the per-minute session bits of one server day (epoch seconds // SECONDS_PER_DAY)
+    def minute_table(self, server_day: int) -> np.ndarray:
+        bits = self.minute_tables.get(server_day)
+        if bits is not None:
+            return bits
+        with self.lock:
+            bits = np.zeros(MINUTES_PER_DAY, dtype=np.uint64)
+            day_start = server_day * SECONDS_PER_DAY
+            server_date = from_epoch(day_start).date()
+            # The session time zone is less than a day away from the server's, so these days cover it.
+            # Weekends are not trading days and have no sessions of their own.
+            for day in (server_date - timedelta(days=1), server_date, server_date + timedelta(days=1)):
+                if day.weekday() > 4:
+                    continue
+                for name, session in self.sessions.items():
+                    window = self.build_window(session, day)
+                    first = max(0, (window.start - day_start) // 60)
+                    last = min(MINUTES_PER_DAY, -(-(window.end - day_start) // 60))
+                    if first < last:
+                        bits[first:last] |= np.uint64(self.bits[name])
+            for old in [old for old in self.minute_tables if server_day - old > KEPT_DAYS]:
+                del self.minute_tables[old]
+            self.minute_tables[server_day] = bits
+        return bits
+
+    # Function to tell whether server_time (a bar's time) falls in any of the sessions in mask
+    def in_session(self, server_time: int, mask: int) -> bool:
+        server_time = int(server_time)
+        return bool(int(self.minute_table(server_time // SECONDS_PER_DAY)[(server_time % SECONDS_PER_DAY) // 60]) & mask)
+
+# One calendar per process; every strategy trades against the same broker clock
+session_calendar = SessionCalendar()
@@ -0,0 +1,153 @@
+import MetaTrader5 as mt5
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from functions.trailing import BUY
+from functions.symbols import symbol_registry
+from functions.workers import RateLimiter
+from functions.logger import get_logger
+
+logger = get_logger()
+
+STOP_UPDATES_PER_SECOND = 5  # SL modifications the whole account may send per second, shared by every strategy
+REJECT_BACKOFF = 1.0  # Seconds a ticket waits after a rejected modification; doubled per further rejection
+MAX_REJECT_BACKOFF = 60.0
+STATE_TTL = 3600.0  # Seconds after which the state of a ticket no longer trailed is dropped
+
+# Retcodes that leave the stop where it was asked to be
+CONFIRMED_RETCODES = (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_NO_CHANGES)
+
+# Every strategy in the process trades the same account, so they share one budget
+stop_limiter = RateLimiter(STOP_UPDATES_PER_SECOND)
+
+@dataclass
+class StopState:
+    symbol: str
+    side: int
+    open_price: float
+    confirmed_sl: float  # What the broker has, as far as we know: the position's SL or the last accepted request
+    pip: float
+    requested_sl: Optional[float] = None  # The modification in flight, if any
+    pending_sl: Optional[float] = None  # The latest SL held back while a request was in flight, backing off or throttled
+    tier: int = -1  # Highest trailing tier confirmed
+    rejections: int = 0  # Rejections in a row
+    retry_at: float = 0.0
+    touched: float = 0.0
+
+# Per-ticket stop management. A ticket sends a modification only when the SL asked for is better than both
+# the one confirmed and the one in flight, never while a request is in flight or backing off after a
+# rejection, and only within the account's rate limit. Whatever was held back is coalesced into the latest
+# SL the trailing plan asks for, so the requests sent follow the tier transitions rather than the loop.
+class StopManager:
+    def __init__(self, tiers: Sequence[Tuple[float, Optional[float]]], limiter: RateLimiter = stop_limiter,
+                 get_pip: Callable[[str], float] = symbol_registry.pip):
+        self.sl_pips = sorted(tier[1] for tier in tiers if tier[1] is not None)
+        self.limiter = limiter
+        self.get_pip = get_pip
+        self.states: Dict[int, StopState] = {}
+        self.stats = Counter()  # sent, confirmed, rejected, coalesced, backing_off, throttled, reached
+        self.lock = threading.Lock()
+        self.pruned = time.monotonic()
+
+    # Function to tell whether sl is a better stop than current for a position on side
+    @staticmethod
+    def improves(sl: float, current: Optional[float], side: int) -> bool:
+        if current is None or current == 0.0:
+            return True
+        return sl > current if side == BUY else sl < current
+
+    # Function to find the highest tier whose SL offset the stop has reached
+    def tier_of(self, state: StopState, sl: float) -> int:
+        offset = (sl - state.open_price if state.side == BUY else state.open_price - sl) / state.pip
+        tier = -1
+        for index, sl_pips in enumerate(self.sl_pips):
+            if offset + 1e-6 >= sl_pips:
+                tier = index
+        return tier
+
+    # Function to decide whether to send a position's new SL now; returns the SL to send or None
+    def begin(self, position, sl: float) -> Optional[float]:
+        now = time.monotonic()
+        with self.lock:
+            self.prune(now)
+            state = self.states.get(position.ticket)
+            if state is None:
+                state = self.states[position.ticket] = StopState(position.symbol, position.type, position.price_open, position.sl,
+                                                                 self.get_pip(position.symbol))
+            elif self.improves(position.sl, state.confirmed_sl, state.side):
+                # Moved since, by a request whose result was lost or by hand
+                state.confirmed_sl = position.sl
+            state.touched = now
+
+            if not self.improves(sl, state.confirmed_sl, state.side):
+                # The position still shows the old SL, but the broker already has this one
+                self.stats["reached"] += 1
+                state.pending_sl = None
+                return None
+            if state.requested_sl is not None:
+                if self.improves(sl, state.requested_sl, state.side):
+                    state.pending_sl = sl
+                    self.stats["coalesced"] += 1
+                return None
+            if now < state.retry_at:
+                state.pending_sl = sl
+                self.stats["backing_off"] += 1
+                return None
+            if not self.limiter.try_acquire():
+                state.pending_sl = sl
+                self.stats["throttled"] += 1
+                return None
+
+            state.requested_sl = sl
+            state.pending_sl = None
+            self.stats["sent"] += 1
+            return sl
+
+    # Function to record the result of a modification sent after begin()
+    def finish(self, ticket: int, sl: float, result):
+        with self.lock:
+            state = self.states.get(ticket)
+            if state is None:
+                return
+            state.requested_sl = None
+            if result is not None and result.retcode in CONFIRMED_RETCODES:
+                state.confirmed_sl = sl
+                state.tier = max(state.tier, self.tier_of(state, sl))
+                state.rejections = 0
+                self.stats["confirmed"] += 1
+            else:
+                state.rejections += 1
+                state.retry_at = time.monotonic() + min(MAX_REJECT_BACKOFF, REJECT_BACKOFF * 2 ** (state.rejections - 1))
+                self.stats["rejected"] += 1
+
+    # Function to move a position's SL through the state machine; send(sl) sends the modification.
+    # Returns send's result, or None when nothing was sent.
+    def update(self, position, sl: float, send: Callable[[float], object]):
+        sl = self.begin(position, sl)
+        if sl is None:
+            return None
+        result = None
+        try:
+            result = send(sl)
+        finally:
+            self.finish(position.ticket, sl, result)
+        return result
+
+    def forget(self, ticket: int):
+        with self.lock:
+            self.states.pop(ticket, None)
+
+    # Function to drop the states of tickets not trailed for a while, mostly closed positions. A ticket
+    # trailed again starts over from its position's SL.
+    def prune(self, now: float):
+        if now - self.pruned < STATE_TTL / 10:
+            return
+        self.pruned = now
+        for ticket in [ticket for ticket, state in self.states.items() if now - state.touched > STATE_TTL and state.requested_sl is None]:
+            del self.states[ticket]
+
+    def log_stats(self, name: str):
+        logger.info(f"{name} stops - " + ", ".join(f"{key}: {self.stats[key]}" for key in
+                    ("sent", "confirmed", "rejected", "coalesced", "backing_off", "throttled", "reached")))
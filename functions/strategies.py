@@ -0,0 +1,106 @@
+import schedule
+from typing import Dict, List
+import m1
+import m2
+import m3
+from functions.host import Strategy, StrategyHost
+from functions.orders import MAGIC, COMMENT_PREFIX
+from functions.scheduler import schedule_tasks
+from functions.trading import retry_missing_symbols, restore_brackets
+from functions.session import close_trailed_position, move_trailed_sl
+from functions.ticks import get_close_price
+from functions.symbols import symbol_registry
+from functions.trailing import plan_trailing, SESSION_TIERS
+
+# main.py: previous-day and Asia-session brackets placed at fixed times, trailed with the session tiers
+class SessionStrategy(Strategy):
+    name = "session"
+    magic = MAGIC
+    comment_prefix = COMMENT_PREFIX
+
+    def __init__(self, symbols: List[str], day_high_low_time: str, asia_high_low_time: str, delete_orders_time: str, lot_size: float):
+        super().__init__(symbols)
+        self.day_high_low_time = day_high_low_time
+        self.asia_high_low_time = asia_high_low_time
+        self.delete_orders_time = delete_orders_time
+        self.lot_size = lot_size
+
+    def setup(self, host: StrategyHost):
+        restore_brackets()
+        schedule_tasks(self.symbols, self.day_high_low_time, self.asia_high_low_time, self.delete_orders_time, self.lot_size)
+        schedule.every(1).seconds.do(retry_missing_symbols)
+
+    def on_quote(self, host: StrategyHost, symbol: str):
+        moves, closes = plan_trailing(host.positions(self, symbol), SESSION_TIERS, get_close_price, get_pip=symbol_registry.pip)
+        for pos, current_price in closes:
+            close_trailed_position(pos, current_price)
+        for pos, sl_price in moves:
+            move_trailed_sl(pos, sl_price)
+
+# m1.py: the session brackets with m1's own windows and trailing
+class M1Strategy(Strategy):
+    name = "m1"
+    magic = m1.magic
+    comment_prefix = "M1"
+
+    def __init__(self, symbols: List[str], day_high_low_time: str, asia_high_low_time: str, delete_orders_time: str, lot_size: float):
+        super().__init__(symbols)
+        # m1 keeps its settings in module globals, which get_user_inputs() fills when it runs on its own
+        m1.currency_pairs = self.symbols
+        m1.day_high_low_time = day_high_low_time
+        m1.asia_high_low_time = asia_high_low_time
+        m1.delete_orders_time = delete_orders_time
+        m1.lot_size = lot_size
+
+    def setup(self, host: StrategyHost):
+        m1.restore_state()
+        m1.schedule_tasks()
+        schedule.every(1).seconds.do(m1.retry_missing_symbols)
+
+    def on_quote(self, host: StrategyHost, symbol: str):
+        m1.adjust_sl_tp(host.positions(self, symbol))
+
+# m2.py / m3.py: M15 candle brackets with one-cancels-other cleanup
+class CandleStrategy(Strategy):
+    module = None
+
+    def __init__(self, symbols: List[str] = None):
+        super().__init__(symbols or self.module.symbols)
+
+    def setup(self, host: StrategyHost):
+        # Read and update the host's snapshot instead of keeping a second one
+        self.module.account = host.account
+        self.module.restore_state()
+        schedule.every(10).minutes.do(self.module.candle_latency.log_stats)
+        schedule.every(10).minutes.do(self.module.stop_manager.log_stats, self.name.upper())
+        # The module's own log_stats would report the host's tick and log queue stats a second time
+        schedule.every(10).minutes.do(self.module.compact_journal)
+
+    def on_quote(self, host: StrategyHost, symbol: str):
+        self.module.handle_quote(symbol)
+
+class M2Strategy(CandleStrategy):
+    name = "m2"
+    module = m2
+    magic = m2.magic
+    comment_prefix = "M2"
+
+class M3Strategy(CandleStrategy):
+    name = "m3"
+    module = m3
+    magic = m3.magic
+    comment_prefix = "M3"
+
+STRATEGIES = {"session": SessionStrategy, "m1": M1Strategy, "m2": M2Strategy, "m3": M3Strategy}
+
+# Function to build the named strategies; session and m1 take their symbols, times and lot size from config
+def build_strategies(names: List[str], config: Dict) -> List[Strategy]:
+    strategies = []
+    for name in names:
+        cls = STRATEGIES[name]
+        if issubclass(cls, CandleStrategy):
+            strategies.append(cls())
+        else:
+            strategies.append(cls(config["currency_pairs"], config["day_high_low_time"], config["asia_high_low_time"],
+                                  config["delete_orders_time"], float(config["lot_size"])))
+    return strategies
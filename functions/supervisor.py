@@ -0,0 +1,228 @@
+import MetaTrader5 as mt5
+import _thread
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from functions.scheduler import schedule_tasks
+from functions.trading import restore_brackets
+from functions.symbols import symbol_registry
+from functions.session_calendar import session_calendar
+from functions.runtime import run_async, runtime_stats, LATENCY_BUDGET, JOB_TIMEOUT
+from functions.ticks import MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+from functions.metrics import start_metrics, TERMINAL_CALLS, METRICS_INTERVAL
+from functions.logger import get_logger
+
+logger = get_logger()
+
+HEARTBEAT_INTERVAL = 5.0  # Seconds between worker health reports
+HEARTBEAT_TIMEOUT = 30.0  # A worker silent for this long is treated as dead
+REPORT_INTERVAL = 60.0  # Seconds between the supervisor's throughput summaries
+
+# Function to split symbols round-robin over count workers
+def partition_symbols(symbols: List[str], count: int) -> List[List[str]]:
+    return [symbols[index::count] for index in range(count)]
+
+# Function to hand the symbols of dead workers to the live ones with the fewest symbols. Live workers only
+# ever gain symbols: taking one away would leave its open positions on that worker's account unmanaged.
+def rebalance(assignments: Dict[int, List[str]], dead: List[int]) -> Dict[int, List[str]]:
+    live = {index: list(symbols) for index, symbols in assignments.items() if index not in dead}
+    if not live:
+        return live
+    orphaned = [symbol for index in dead for symbol in assignments.get(index, [])]
+    for symbol in orphaned:
+        target = min(live, key=lambda index: (len(live[index]), index))
+        live[target].append(symbol)
+    return live
+
+# Function to count calls to the terminal functions made through the MetaTrader5 module
+def count_terminal_calls(counts: Counter, names=TERMINAL_CALLS):
+    for name in names:
+        func = getattr(mt5, name)
+
+        @functools.wraps(func)
+        def counted(*args, _func=func, _name=name, **kwargs):
+            counts[_name] += 1
+            return _func(*args, **kwargs)
+
+        setattr(mt5, name, counted)
+
+# Function to connect to one terminal; path is passed positionally as mt5.initialize expects
+def initialize_terminal(terminal: dict) -> bool:
+    options = {key: value for key, value in terminal.items() if key != "path"}
+    if "path" in terminal:
+        return mt5.initialize(terminal["path"], **options)
+    return mt5.initialize(**options)
+
+# Worker process: the main.py flow for one terminal and its share of the symbols. It sends a heartbeat with
+# its symbols and call counts every heartbeat_interval seconds, takes new symbol lists from commands and
+# stops on a "stop" command.
+def run_worker(index: int, terminal: dict, symbols: List[str], settings: dict,
+               heartbeats: multiprocessing.Queue, commands: multiprocessing.Queue):
+    if not initialize_terminal(terminal):
+        heartbeats.put({"worker": index, "pid": os.getpid(), "error": str(mt5.last_error())})
+        return
+
+    # Every task and scheduled job holds this list, so assigning new symbols in place reaches all of them
+    currency_pairs = list(symbols)
+    counts = Counter()
+    count_terminal_calls(counts)
+    # Each worker serves its own metrics, on metrics_port + its index, and writes its own metrics file
+    port = settings.get("metrics_port")
+    path = settings.get("metrics_file")
+    start_metrics(port + index if port else None, f"{path}.{index}" if path else None,
+                  settings.get("metrics_interval", METRICS_INTERVAL))
+
+    symbol_registry.load(currency_pairs)
+    session_calendar.configure(settings.get("session_timezone"), settings.get("server_timezone"))
+    # A restarted worker must not place the brackets its predecessor already placed
+    restore_brackets()
+    schedule_tasks(currency_pairs, settings["day_high_low_time"], settings["asia_high_low_time"],
+                   settings["delete_orders_time"], settings["lot_size"])
+
+    def report():
+        while True:
+            heartbeats.put({
+                "worker": index,
+                "pid": os.getpid(),
+                "time": time.time(),
+                "symbols": list(currency_pairs),
+                "calls": dict(counts),
+                "runtime": dict(runtime_stats),
+            })
+            try:
+                command = commands.get(timeout=settings.get("heartbeat_interval", HEARTBEAT_INTERVAL))
+            except queue.Empty:
+                continue
+            if command[0] == "assign":
+                currency_pairs[:] = command[1]
+                logger.info(f"Worker {index} now trading {', '.join(currency_pairs)}")
+            elif command[0] == "stop":
+                _thread.interrupt_main()
+                return
+
+    threading.Thread(target=report, name=f"worker-{index}-health", daemon=True).start()
+    run_async(currency_pairs, settings["lot_size"],
+              event_driven=settings.get("event_driven", True),
+              min_poll_interval=settings.get("min_poll_interval", MIN_POLL_INTERVAL),
+              max_idle_delay=settings.get("max_idle_delay", MAX_IDLE_DELAY),
+              latency_budget=settings.get("latency_budget", LATENCY_BUDGET),
+              job_timeout=settings.get("job_timeout", JOB_TIMEOUT))
+
+# Supervisor: starts one worker process per configured terminal, each owning a partition of the symbols,
+# tracks their heartbeats and hands a dead worker's symbols to the others
+class Supervisor:
+    def __init__(self, terminals: List[dict], symbols: List[str], settings: dict, start_method: Optional[str] = None):
+        self.terminals = terminals
+        self.settings = settings
+        self.context = multiprocessing.get_context(start_method)
+        self.heartbeats = self.context.Queue()
+        self.commands = {index: self.context.Queue() for index in range(len(terminals))}
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.assignments: Dict[int, List[str]] = dict(enumerate(partition_symbols(symbols, len(terminals))))
+        self.dead: List[int] = []
+        self.health: Dict[int, dict] = {}
+        self.reported: Dict[int, dict] = {}  # Heartbeat each worker's last throughput figure was taken from
+        self.started = time.time()
+
+    def start(self):
+        for index, terminal in enumerate(self.terminals):
+            process = self.context.Process(target=run_worker, name=f"cxc-worker-{index}",
+                                           args=(index, terminal, self.assignments[index], self.settings,
+                                                 self.heartbeats, self.commands[index]))
+            process.start()
+            self.processes[index] = process
+            logger.info(f"Started worker {index} (pid {process.pid}) for {', '.join(self.assignments[index]) or 'no symbols'}")
+
+    # Function to read the heartbeats that have arrived since the last call
+    def collect(self):
+        while True:
+            try:
+                beat = self.heartbeats.get_nowait()
+            except queue.Empty:
+                return
+            if "error" in beat:
+                logger.error(f"Worker {beat['worker']} could not initialize its terminal: {beat['error']}")
+                continue
+            self.health[beat["worker"]] = beat
+
+    # Function to find workers whose process exited or that stopped sending heartbeats
+    def find_dead(self) -> List[int]:
+        timeout = self.settings.get("heartbeat_timeout", HEARTBEAT_TIMEOUT)
+        now = time.time()
+        dead = []
+        for index, process in self.processes.items():
+            if index in self.dead:
+                continue
+            beat = self.health.get(index, {})
+            # A worker whose trailing-stop checks stopped completing is as good as dead, even if it still reports
+            last_seen = min(beat.get("time", self.started), beat.get("runtime", {}).get("last_check") or self.started)
+            if not process.is_alive():
+                logger.error(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}")
+                dead.append(index)
+            elif now - last_seen > timeout:
+                logger.error(f"Worker {index} (pid {process.pid}) has not reported progress for {now - last_seen:.0f}s; terminating it")
+                process.terminate()
+                dead.append(index)
+        return dead
+
+    def handle_dead(self, dead: List[int]):
+        self.dead.extend(dead)
+        assignments = rebalance(self.assignments, self.dead)
+        if not assignments:
+            logger.error("No live workers left")
+        for index, symbols in assignments.items():
+            if symbols != self.assignments[index]:
+                self.commands[index].put(("assign", symbols))
+                logger.info(f"Moved {', '.join(set(symbols) - set(self.assignments[index]))} to worker {index}")
+        for index in self.dead:
+            self.assignments[index] = []
+        self.assignments.update(assignments)
+
+    # Function to log each live worker's symbols and terminal calls per second since the previous report
+    def report(self):
+        for index, beat in sorted(self.health.items()):
+            if index in self.dead:
+                continue
+            previous = self.reported.get(index, beat)
+            elapsed = beat["time"] - previous["time"]
+            calls = sum(beat["calls"].values()) - sum(previous["calls"].values())
+            rate = calls / elapsed if elapsed > 0 else 0.0
+            age = time.time() - beat["time"]
+            logger.info(f"Worker {index}: {len(beat['symbols'])} symbols, {rate:.1f} calls/s, "
+                        f"last heartbeat {age:.1f}s ago, runtime {beat['runtime']}")
+            self.reported[index] = beat
+
+    def live(self) -> bool:
+        return len(self.dead) < len(self.processes)
+
+    def stop(self):
+        for index, process in self.processes.items():
+            if process.is_alive():
+                self.commands[index].put(("stop",))
+        for process in self.processes.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    def run(self, poll_interval: float = 1.0):
+        self.start()
+        last_report = time.time()
+        try:
+            while self.live():
+                time.sleep(poll_interval)
+                self.collect()
+                dead = self.find_dead()
+                if dead:
+                    self.handle_dead(dead)
+                if time.time() - last_report >= self.settings.get("report_interval", REPORT_INTERVAL):
+                    self.report()
+                    last_report = time.time()
+        except KeyboardInterrupt:
+            logger.info("Stopping workers")
+        finally:
+            self.stop()
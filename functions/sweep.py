@@ -0,0 +1,88 @@
+"""Parameter sweeps of the offline backtest across a process pool.
+
+Market data is copied once into shared memory and every worker maps the same read-only
+arrays, so adding workers does not add copies of the bars.
+"""
+import itertools
+import os
+import random
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from functions.backtest import BacktestParams, run_backtest
+from functions.logger import get_logger
+
+logger = get_logger()
+
+PARAM_NAMES = {field.name for field in fields(BacktestParams)}
+
+# (shared memory name, length, dtype description) per symbol
+SharedSpec = Dict[str, Tuple[str, int, list]]
+
+# Bars mapped from shared memory inside each worker process
+worker_bars: Dict[str, np.ndarray] = {}
+worker_segments: List[shared_memory.SharedMemory] = []
+
+# Function to expand a parameter grid into every combination
+def grid(space: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+# Function to draw a random sample of combinations from a parameter grid
+def random_sample(space: Dict[str, Sequence[Any]], count: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{name: rng.choice(list(values)) for name, values in space.items()} for _ in range(count)]
+
+# Function to copy each symbol's bars into a shared memory segment
+def share_bars(bars_by_symbol: Dict[str, np.ndarray]) -> Tuple[SharedSpec, List[shared_memory.SharedMemory]]:
+    specs = {}
+    segments = []
+    for symbol, rates in bars_by_symbol.items():
+        segment = shared_memory.SharedMemory(create=True, size=max(rates.nbytes, 1))
+        np.ndarray(rates.shape, dtype=rates.dtype, buffer=segment.buf)[:] = rates
+        specs[symbol] = (segment.name, len(rates), rates.dtype.descr)
+        segments.append(segment)
+    return specs, segments
+
+# Function run once in every worker to map the shared bars read-only
+def attach_shared_bars(specs: SharedSpec):
+    for symbol, (name, length, descr) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        rates = np.ndarray((length,), dtype=np.dtype(descr), buffer=segment.buf)
+        rates.flags.writeable = False
+        worker_bars[symbol] = rates
+        worker_segments.append(segment)
+
+# Function to backtest one parameter combination inside a worker
+def run_combination(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    params = BacktestParams(**overrides)
+    summary = run_backtest(worker_bars, params).summary()
+    return {**overrides, **summary}
+
+# Function to run a sweep over the given combinations and return one ranked table
+def run_sweep(bars_by_symbol: Dict[str, np.ndarray], combinations: List[Dict[str, Any]], workers: Optional[int] = None,
+              rank_by: str = "net_pips") -> pd.DataFrame:
+    unknown = {name for combination in combinations for name in combination} - PARAM_NAMES
+    if unknown:
+        raise ValueError(f"Unknown backtest parameters: {', '.join(sorted(unknown))}")
+
+    workers = workers or os.cpu_count() or 1
+    specs, segments = share_bars(bars_by_symbol)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared_bars, initargs=(specs,)) as pool:
+            chunksize = max(1, len(combinations) // (workers * 4))
+            rows = list(pool.map(run_combination, combinations, chunksize=chunksize))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    logger.info(f"Swept {len(rows)} parameter combinations on {workers} workers")
+    table = pd.DataFrame(rows)
+    if len(table):
+        table = table.sort_values(rank_by, ascending=False, kind="stable", ignore_index=True)
+        table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
@@ -0,0 +1,113 @@
+import MetaTrader5 as mt5
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import Dict, Iterable
+from functions.logger import get_logger, event
+
+logger = get_logger()
+
+SYMBOL_TTL = 3600.0  # Seconds a symbol's properties are kept before they are fetched again
+MISSING_TTL = 30.0  # Seconds before a symbol the terminal did not describe is asked for again
+
+# Price offsets of one strategy's orders on one symbol, in price units; digits is what prices are rounded to
+Offsets = namedtuple("Offsets", "sl tp digits")
+
+@dataclass(frozen=True)
+class SymbolSpec:
+    point: float
+    digits: int
+    stops_level: int  # Closest a stop may be to the price, in points
+    tick_value: float
+    tick_size: float
+    volume_min: float
+    volume_max: float
+    volume_step: float
+
+    # A pip is ten points on 3- and 5-digit quotes (EURUSD 0.0001, USDJPY 0.01) and one point otherwise
+    @property
+    def pip(self) -> float:
+        return self.point * 10 if self.digits in (3, 5) else self.point
+
+    @property
+    def min_stop(self) -> float:
+        return self.stops_level * self.point
+
+# What the bot assumed for every symbol before it asked the terminal: a 5-digit forex pair
+DEFAULT_SPEC = SymbolSpec(point=0.00001, digits=5, stops_level=0, tick_value=1.0, tick_size=0.00001,
+                          volume_min=0.01, volume_max=100.0, volume_step=0.01)
+
+# Function to read the properties the bot uses out of mt5.symbol_info
+def spec_from_info(info) -> SymbolSpec:
+    return SymbolSpec(point=info.point, digits=info.digits, stops_level=info.trade_stops_level,
+                      tick_value=info.trade_tick_value, tick_size=info.trade_tick_size,
+                      volume_min=info.volume_min, volume_max=info.volume_max, volume_step=info.volume_step)
+
+# Symbol properties fetched once per symbol and kept for SYMBOL_TTL, with every strategy's SL/TP offsets worked out
+# in price units when a symbol is (re)loaded, so placing an order is a dict lookup instead of a terminal call and
+# pip arithmetic. Strategies register their offsets in pips at import time.
+class SymbolRegistry:
+    def __init__(self, ttl: float = SYMBOL_TTL):
+        self.ttl = ttl
+        self.specs: Dict[str, SymbolSpec] = {}
+        self.expires: Dict[str, float] = {}
+        self.pips: Dict[str, float] = {}
+        self.offset_pips: Dict[str, tuple] = {}  # strategy -> (sl pips, tp pips)
+        self.offset_table: Dict[tuple, Offsets] = {}  # (symbol, strategy) -> Offsets
+        self.lock = threading.Lock()
+
+    # Function to declare a strategy's initial SL and TP distances, in pips
+    def register_offsets(self, name: str, sl_pips: float, tp_pips: float):
+        with self.lock:
+            self.offset_pips[name] = (sl_pips, tp_pips)
+            for symbol, spec in self.specs.items():
+                self.offset_table[(symbol, name)] = self.compute_offsets(spec, sl_pips, tp_pips)
+
+    # Function to turn pip distances into price offsets; a stop is never closer than the broker's stops level
+    @staticmethod
+    def compute_offsets(spec: SymbolSpec, sl_pips: float, tp_pips: float) -> Offsets:
+        return Offsets(sl=max(sl_pips * spec.pip, spec.min_stop), tp=max(tp_pips * spec.pip, spec.min_stop), digits=spec.digits)
+
+    # Function to fetch the properties of the given symbols from the terminal, replacing what is cached
+    def load(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            self.fetch(symbol)
+
+    def fetch(self, symbol: str) -> SymbolSpec:
+        info = mt5.symbol_info(symbol)
+        if info is None:
+            logger.warning(f"No symbol info for {symbol}, assuming a 5-digit quote", extra=event("no_symbol_info", symbol))
+            spec, ttl = self.specs.get(symbol, DEFAULT_SPEC), MISSING_TTL
+        else:
+            spec, ttl = spec_from_info(info), self.ttl
+        with self.lock:
+            self.specs[symbol] = spec
+            self.pips[symbol] = spec.pip
+            self.expires[symbol] = time.monotonic() + ttl
+            for name, (sl_pips, tp_pips) in self.offset_pips.items():
+                self.offset_table[(symbol, name)] = self.compute_offsets(spec, sl_pips, tp_pips)
+        return spec
+
+    def spec(self, symbol: str) -> SymbolSpec:
+        spec = self.specs.get(symbol)
+        if spec is None or time.monotonic() > self.expires[symbol]:
+            spec = self.fetch(symbol)
+        return spec
+
+    def pip(self, symbol: str) -> float:
+        pip = self.pips.get(symbol)
+        if pip is None or time.monotonic() > self.expires[symbol]:
+            pip = self.fetch(symbol).pip
+        return pip
+
+    # Function to get a strategy's SL/TP offsets on a symbol, in price units
+    def offsets(self, symbol: str, name: str) -> Offsets:
+        offsets = self.offset_table.get((symbol, name))
+        if offsets is None or time.monotonic() > self.expires[symbol]:
+            self.fetch(symbol)
+            offsets = self.offset_table[(symbol, name)]
+        return offsets
+
+# One registry per process; every strategy trades through the same terminal
+symbol_registry = SymbolRegistry()
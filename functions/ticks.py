@@ -0,0 +1,95 @@
+import MetaTrader5 as mt5
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from functions.logger import get_logger, event
+
+logger = get_logger()
+
+# Ticks fetched during the current loop iteration, keyed by symbol. Each thread keeps its own,
+# so per-symbol workers can reset theirs without dropping another worker's quotes.
+class TickSnapshot(threading.local):
+    def __init__(self):
+        self.ticks: Dict[str, Optional[mt5.Tick]] = {}
+
+tick_snapshot = TickSnapshot()
+# Hit/miss counters shared by every worker thread
+tick_stats = {"hits": 0, "misses": 0}
+tick_stats_lock = threading.Lock()
+
+# Function to start a new loop iteration, dropping the quotes from the previous one
+def reset_tick_snapshot():
+    tick_snapshot.ticks.clear()
+
+# Function to get a symbol's tick, fetching it from the terminal at most once per iteration
+def get_tick(symbol: str) -> Optional[mt5.Tick]:
+    if symbol in tick_snapshot.ticks:
+        with tick_stats_lock:
+            tick_stats["hits"] += 1
+        return tick_snapshot.ticks[symbol]
+
+    with tick_stats_lock:
+        tick_stats["misses"] += 1
+    tick = mt5.symbol_info_tick(symbol)
+    if tick is None:
+        logger.error(f"Failed to retrieve tick for {symbol}", extra=event("no_tick", symbol))
+    tick_snapshot.ticks[symbol] = tick
+    return tick
+
+# Function to fetch the ticks of several symbols into the snapshot up front
+def prefetch_ticks(symbols: Iterable[str]):
+    for symbol in set(symbols):
+        get_tick(symbol)
+
+# Function to get the current bid (for buys) or ask (for sells) used to value a position
+def get_close_price(symbol: str, order_type: int) -> Optional[float]:
+    tick = get_tick(symbol)
+    if tick is None:
+        return None
+    return tick.bid if order_type == mt5.ORDER_TYPE_BUY else tick.ask
+
+# Function to report how many terminal round trips the snapshot has saved; reset clears the counters as they are read
+def get_tick_stats(reset: bool = False) -> Dict[str, float]:
+    with tick_stats_lock:
+        hits, misses = tick_stats["hits"], tick_stats["misses"]
+        if reset:
+            tick_stats["hits"] = 0
+            tick_stats["misses"] = 0
+    lookups = hits + misses
+    hit_rate = hits / lookups if lookups else 0.0
+    return {"hits": hits, "misses": misses, "hit_rate": hit_rate}
+
+# Function to log and reset the hit/miss counters
+def log_tick_stats():
+    stats = get_tick_stats(reset=True)
+    logger.info(f"Tick snapshot - hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.1%}")
+
+MIN_POLL_INTERVAL = 0.1  # Fastest a single symbol is polled, in seconds
+MAX_IDLE_DELAY = 1.0  # Longest the loop sleeps while no quote changes
+
+# Last seen quote time (ms) and last poll time per symbol
+last_tick_msc: Dict[str, int] = {}
+last_poll_time: Dict[str, float] = {}
+
+# Function to list the symbols whose quote changed since they were last polled
+def poll_changed_symbols(symbols: Iterable[str], min_interval=MIN_POLL_INTERVAL) -> List[str]:
+    now = time.monotonic()
+    changed = []
+    for symbol in symbols:
+        if symbol in last_poll_time and now - last_poll_time[symbol] < min_interval:
+            continue
+        last_poll_time[symbol] = now
+
+        tick = get_tick(symbol)
+        if tick is None:
+            continue
+        if last_tick_msc.get(symbol) != tick.time_msc:
+            last_tick_msc[symbol] = tick.time_msc
+            changed.append(symbol)
+    return changed
+
+# Function to back off the loop sleep while the market is quiet and snap back on a change
+def next_poll_delay(delay: float, changed: bool, min_interval=MIN_POLL_INTERVAL, max_delay=MAX_IDLE_DELAY) -> float:
+    if changed:
+        return min_interval
+    return min(max(delay, min_interval) * 2, max_delay)
@@ -1,124 +1,163 @@
 import MetaTrader5 as mt5
 from typing import Tuple, Optional
-from datetime import datetime, timedelta
-import pandas as pd
-from functions.orders import place_buy_limit, place_sell_limit, place_buy_stop, place_sell_stop
+from datetime import datetime
+import numpy as np
+from functools import partial
+from functions.orders import place_buy_limit, place_sell_limit, place_buy_stop, place_sell_stop, MAGIC, COMMENT_PREFIX
+from functions.dedupe import dedupe_index, day_session, PREVIOUS_DAY_HIGH, PREVIOUS_DAY_LOW, ASIA_HIGH, ASIA_LOW
+from functions.dispatcher import dispatch_orders, BatchResult
+from functions.bars import get_bar_store, range_extrema, from_epoch
+from functions.ticks import get_tick
+from functions.retries import RetryQueue
+from functions.session_calendar import session_calendar
 from functions.logger import get_logger
 
 logger = get_logger()
 
-# Function to get the previous day's high and low prices, considering weekends
+# Sessions the brackets are placed for, in the session time zone of the calendar
+PREVIOUS_DAY = "previous_day"
+ASIA_SESSION = "asia_session"
+session_calendar.register(PREVIOUS_DAY, "05:00", "05:00", span=1)
+session_calendar.register(ASIA_SESSION, "05:00", "13:00")
+
+# Symbols whose session data could not be fetched yet are retried one (session, symbol) at a time
+retry_queue = RetryQueue()
+
+# Function to get H1 bars for a window, served from the local bar store so only new bars are downloaded
+def copy_h1_rates(symbol: str, start: datetime, end: datetime) -> Optional[np.ndarray]:
+    tick = get_tick(symbol)
+    if tick is None:
+        return mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, start, end)
+    store = get_bar_store(symbol, "H1")
+    return store.rates_range(start, end, lambda fetch_start, fetch_end: mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, fetch_start, fetch_end), tick.time)
+
+# Function to get the previous day's high and low prices, from the previous trading day's 05:00 to today's
 def get_previous_day_high_low(symbol: str) -> Tuple[Optional[float], Optional[float]]:
-    now = datetime.now() # 03:00
-    end = now.replace(hour=5, minute=00, second=0, microsecond=0) #18 05:00
-
-    # Skip weekends
-    if end.weekday() == 5:  # Saturday
-        end -= timedelta(days=1)
-    elif end.weekday() == 6:  # Sunday
-        end -= timedelta(days=2)
-
-    start = end - timedelta(days=1) # 17 05:00
-    start = start.replace(hour=5, minute=00, second=0, microsecond=0)
-    
-    # Skip weekends
-    if start.weekday() == 5:  # Saturday
-        start -= timedelta(days=1)
-    elif start.weekday() == 6:  # Sunday
-        start -= timedelta(days=2)
-
-    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, start, end)
-    
-    if rates is not None and len(rates) > 0:
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        # print(df[['time', 'open', 'high', 'low', 'close', 'tick_volume']])
-        high = df['high'].max()
-        low = df['low'].min()
-        logger.info(f"Fetching Previouse Day Data for {symbol}- HIGH: {high}, LOW: {low}")
+    window = session_calendar.window(PREVIOUS_DAY)
+    rates = copy_h1_rates(symbol, window.start_time, window.end_time)
+
+    high, low, high_time, low_time = range_extrema(rates)
+    if high is not None:
+        logger.info(f"Fetching Previouse Day Data for {symbol}- HIGH: {high} ({from_epoch(high_time):%Y-%m-%d %H:%M}), LOW: {low} ({from_epoch(low_time):%Y-%m-%d %H:%M})")
         return high, low
     else:
         logger.info(f"No data retrieved for {symbol} in the given date range.")
         return None, None
 
-# Function to get the previous Asia session's high and low prices (2:30 AM to 10:30 AM)
+# Function to get the previous Asia session's high and low prices (05:00 to 13:00)
 def get_previous_asia_session_high_low(symbol: str) -> Tuple[Optional[float], Optional[float]]:
-    today = datetime.now()
-    start = datetime(today.year, today.month, today.day, 5, 00)
-    end = datetime(today.year, today.month, today.day, 13, 00)
-
-    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, start, end)
-
-    if rates is not None and len(rates) > 0:
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        # print(df[['time', 'open', 'high', 'low', 'close', 'tick_volume']])
-        high = df['high'].max()
-        low = df['low'].min()
-        logger.info(f"Fetching Asia Session Data for {symbol}- HIGH: {high}, LOW: {low}")
+    window = session_calendar.window(ASIA_SESSION)
+    rates = copy_h1_rates(symbol, window.start_time, window.end_time)
+
+    high, low, high_time, low_time = range_extrema(rates)
+    if high is not None:
+        logger.info(f"Fetching Asia Session Data for {symbol}- HIGH: {high} ({from_epoch(high_time):%Y-%m-%d %H:%M}), LOW: {low} ({from_epoch(low_time):%Y-%m-%d %H:%M})")
         return high, low
     else:
         logger.info(f"No data retrieved for {symbol} in the given date range.")
         return None, None
 
-# Function to run get_previous_day_high_low and place trades
-def run_get_previous_day_high_low(currency_pairs: list, lot_size: float):
-    global previouse_day_missing_symbols
+SESSIONS = {
+    # session: (name in the batch summary, name in messages, function returning the session's high and low,
+    #           level kinds of the high and the low)
+    PREVIOUS_DAY: ("Previouse Day", "previous day's", get_previous_day_high_low, PREVIOUS_DAY_HIGH, PREVIOUS_DAY_LOW),
+    ASIA_SESSION: ("Asia Session", "Asia session's", get_previous_asia_session_high_low, ASIA_HIGH, ASIA_LOW),
+}
+
+# Placement function per order type
+PLACE_ORDER = {
+    mt5.ORDER_TYPE_SELL_LIMIT: place_sell_limit,
+    mt5.ORDER_TYPE_BUY_STOP: place_buy_stop,
+    mt5.ORDER_TYPE_BUY_LIMIT: place_buy_limit,
+    mt5.ORDER_TYPE_SELL_STOP: place_sell_stop,
+}
+
+# Function to build a symbol's bracket orders around a session's high and low, leaving out those already
+# placed this session day. Returns None when the quote or the bars are missing, so the symbol can be retried.
+def plan_brackets(session: str, pair: str, lot_size: float, day: str) -> Optional[list]:
+    _, label, get_high_low, high_level, low_level = SESSIONS[session]
+    symbol_info = mt5.symbol_info_tick(pair)
+    if symbol_info is None:
+        logger.error(f"Failed to retrieve symbol info for {pair}")
+        return None
+    current_price = symbol_info.bid
+    high, low = get_high_low(pair)
+    if high is None or low is None:
+        logger.error(f"Failed to retrieve {label} high and low for {pair}.")
+        return None
+
+    orders = []
+    if current_price < high:
+        orders += [(mt5.ORDER_TYPE_SELL_LIMIT, high, high_level), (mt5.ORDER_TYPE_BUY_STOP, high, high_level)]
+    else:
+        logger.info(f"Current price ({current_price}) is outside {label} high for {pair}. No orders placed.")
+    if current_price > low:
+        orders += [(mt5.ORDER_TYPE_BUY_LIMIT, low, low_level), (mt5.ORDER_TYPE_SELL_STOP, low, low_level)]
+    else:
+        logger.info(f"Current price ({current_price}) is outside {label} low for {pair}. No orders placed.")
+    # The place_* functions refuse repeats as well; leaving them out here keeps them out of the batch summary
+    return [(PLACE_ORDER[order_type], (pair, price, lot_size, level, day)) for order_type, price, level in orders
+            if (COMMENT_PREFIX, pair, day, level, order_type) not in dedupe_index]
+
+# Function to send a batch of brackets at once instead of one round trip after another
+def send_brackets(session: str, jobs: list) -> BatchResult:
+    batch = dispatch_orders(jobs)
+    if jobs:
+        logger.info(f"{SESSIONS[session][0]} brackets: {batch.summary()}")
+    return batch
+
+# Function to place a session's brackets on every pair not done yet today, queueing retries for the pairs
+# whose market data is missing or whose orders did not all go through
+def run_session_brackets(session: str, currency_pairs: list, lot_size: float) -> BatchResult:
+    day = session_calendar.today()
+    label = day_session(day)
+    jobs = []
+    planned = []
     for pair in currency_pairs:
-        symbol_info = mt5.symbol_info_tick(pair)
-        if symbol_info is not None:
-            current_price = symbol_info.bid
-            day_high, day_low = get_previous_day_high_low(pair)
-            if day_high is not None and day_low is not None:
-                if current_price < day_high:
-                    place_sell_limit(pair, day_high, lot_size)
-                    place_buy_stop(pair, day_high, lot_size)
-                    if pair in previouse_day_missing_symbols:
-                        previouse_day_missing_symbols.remove(pair)
-                else:
-                    
-                    logger.info(f"Current price ({current_price}) is outside previous day's high for {pair}. No orders placed.")
-                if current_price > day_low:
-                    place_buy_limit(pair, day_low, lot_size)
-                    place_sell_stop(pair, day_low, lot_size)
-                    if pair in previouse_day_missing_symbols:
-                        previouse_day_missing_symbols.remove(pair)
-                else:
-                    logger.info(f"Current price ({current_price}) is outside previous day's low for {pair}. No orders placed.")
-            else:
-                logger.error(f"Failed to retrieve previous day's high and low for {pair}.")
+        if retry_queue.is_done(session, pair, day):
+            continue
+        # Brackets of earlier days are no reason not to place today's
+        dedupe_index.expire(COMMENT_PREFIX, pair, label)
+        pair_jobs = plan_brackets(session, pair, lot_size, label)
+        if pair_jobs is None:
+            retry_queue.schedule(session, pair, day, partial(retry_brackets, session, pair, lot_size, label))
+            continue
+        jobs += pair_jobs
+        planned.append(pair)
+
+    batch = send_brackets(session, jobs)
+    failed = {outcome.args[0] for outcome in batch.failed}
+    for pair in planned:
+        if pair in failed:
+            # The orders that went through are in the dedupe index, so a retry only sends the others
+            retry_queue.schedule(session, pair, day, partial(retry_brackets, session, pair, lot_size, label))
         else:
-            if pair not in previouse_day_missing_symbols:
-                previouse_day_missing_symbols.append(pair)
-            logger.error(f"Failed to retrieve symbol info for {pair}")
+            retry_queue.complete(session, pair, day)
+    return batch
+
+# Function to retry one pair's brackets; True once the market data was there and every order went through
+def retry_brackets(session: str, pair: str, lot_size: float, day: str) -> bool:
+    jobs = plan_brackets(session, pair, lot_size, day)
+    if jobs is None:
+        return False
+    return not send_brackets(session, jobs).failed
+
+# Function to run get_previous_day_high_low and place trades
+def run_get_previous_day_high_low(currency_pairs: list, lot_size: float) -> BatchResult:
+    return run_session_brackets(PREVIOUS_DAY, currency_pairs, lot_size)
 
 # Function to run get_previous_asia_session_high_low and place trades
-def run_get_previous_asia_session_high_low(currency_pairs: list, lot_size: float):
-    global asia_session_missing_symbols
-    for pair in currency_pairs:
-        symbol_info = mt5.symbol_info_tick(pair)
-        if symbol_info is not None:
-            current_price = symbol_info.bid
-            asia_high, asia_low = get_previous_asia_session_high_low(pair)
-            if asia_high is not None and asia_low is not None:
-                if current_price < asia_high:
-                    place_sell_limit(pair, asia_high, lot_size)
-                    place_buy_stop(pair, asia_high, lot_size)
-                    if pair in asia_session_missing_symbols:
-                        asia_session_missing_symbols.remove(pair)
-                    asia_session_missing_symbols.append(pair)
-                else:
-                    logger.info(f"Current price ({current_price}) is outside Asia session's high for {pair}. No orders placed.")
-                if current_price > asia_low:
-                    place_buy_limit(pair, asia_low, lot_size)
-                    place_sell_stop(pair, asia_low, lot_size)
-                    if pair in asia_session_missing_symbols:
-                        asia_session_missing_symbols.remove(pair)
-                else:
-                    logger.info(f"Current price ({current_price}) is outside Asia session's low for {pair}. No orders placed.")
-            else:
-                logger.error(f"Failed to retrieve previous Asia session's high and low for {pair}.")
-        else:
-            if pair not in asia_session_missing_symbols:
-                asia_session_missing_symbols.append(pair)
-            logger.error(f"Failed to retrieve symbol info for {pair}")
+def run_get_previous_asia_session_high_low(currency_pairs: list, lot_size: float) -> BatchResult:
+    return run_session_brackets(ASIA_SESSION, currency_pairs, lot_size)
+
+# Function to start the retries that are due; they run on the retry queue's own threads
+def retry_missing_symbols() -> int:
+    return retry_queue.run_due()
+
+# Function to rebuild the dedupe index from the brackets the terminal already has, so a restart never places
+# them again
+def restore_brackets() -> int:
+    items = list(mt5.orders_get() or []) + list(mt5.positions_get() or [])
+    count = dedupe_index.rebuild(COMMENT_PREFIX, (MAGIC,), items)
+    logger.info(f"Found {count} brackets already placed")
+    return count
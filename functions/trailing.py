@@ -0,0 +1,94 @@
+import numpy as np
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Position sides, matching mt5.ORDER_TYPE_BUY / mt5.ORDER_TYPE_SELL
+BUY = 0
+SELL = 1
+
+PIP_SIZE = 0.0001
+
+# Trailing tiers as (profit trigger in pips, new SL in pips from the open price).
+# A SL of None closes the position instead of moving its stop.
+SESSION_TIERS = [
+    (10, 0.5),
+    (20, 10),
+    (30, 29),
+    (60, None),
+]
+
+M2_TIERS = [
+    (5, 0.5),
+    (20, 5),
+    (25, 24),
+]
+
+M3_TIERS = [
+    (10, 0.5),
+    (15, 3),
+    (20, 15),
+]
+
+# Function to split a tier table into sorted trigger, SL offset and close-flag arrays
+def tier_arrays(tiers: Sequence[Tuple[float, Optional[float]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ordered = sorted(tiers, key=lambda tier: tier[0])
+    triggers = np.array([tier[0] for tier in ordered], dtype=np.float64)
+    sl_pips = np.array([np.nan if tier[1] is None else tier[1] for tier in ordered], dtype=np.float64)
+    closes = np.array([tier[1] is None for tier in ordered], dtype=bool)
+    return triggers, sl_pips, closes
+
+# Function to work out the tier and new SL of every position in one vectorized pass
+def compute_trailing(open_price: np.ndarray, side: np.ndarray, current_sl: np.ndarray, price: np.ndarray,
+                     tiers: Sequence[Tuple[float, Optional[float]]], pip_size=PIP_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    triggers, sl_pips, closes = tier_arrays(tiers)
+    is_buy = side == BUY
+    direction = np.where(is_buy, 1.0, -1.0)
+
+    profit_pips = direction * (price - open_price) * (1.0 / pip_size)
+    tier = np.searchsorted(triggers, profit_pips, side="right") - 1
+    reached = tier >= 0
+    tier_index = np.where(reached, tier, 0)
+
+    new_sl = open_price + direction * sl_pips[tier_index] * pip_size
+    close = reached & closes[tier_index]
+    # Stops only ever move in the position's favour
+    improves = np.where(is_buy, new_sl > current_sl, new_sl < current_sl)
+    move = reached & ~close & improves
+    return tier, new_sl, move, close
+
+# Function to turn MT5 positions into the arrays used by compute_trailing
+# get_pip, if given, gives each symbol's pip size
+def positions_to_arrays(positions: Sequence, get_price: Callable[[str, int], Optional[float]],
+                        get_pip: Optional[Callable[[str], float]] = None) -> Tuple[list, dict]:
+    kept = []
+    prices = []
+    for pos in positions:
+        price = get_price(pos.symbol, pos.type)
+        if price is None:
+            continue
+        kept.append(pos)
+        prices.append(price)
+
+    arrays = {
+        "open_price": np.fromiter((pos.price_open for pos in kept), dtype=np.float64, count=len(kept)),
+        "side": np.fromiter((pos.type for pos in kept), dtype=np.int8, count=len(kept)),
+        "sl": np.fromiter((pos.sl for pos in kept), dtype=np.float64, count=len(kept)),
+        "price": np.array(prices, dtype=np.float64),
+    }
+    if get_pip is not None:
+        arrays["pip"] = np.fromiter((get_pip(pos.symbol) for pos in kept), dtype=np.float64, count=len(kept))
+    return kept, arrays
+
+# Function to list the positions whose SL has to move and the ones that have to be closed. With get_pip, each
+# position's tiers are in its own symbol's pips instead of pip_size.
+def plan_trailing(positions: Sequence, tiers: Sequence[Tuple[float, Optional[float]]],
+                  get_price: Callable[[str, int], Optional[float]], pip_size=PIP_SIZE,
+                  get_pip: Optional[Callable[[str], float]] = None) -> Tuple[List[tuple], List[tuple]]:
+    kept, arrays = positions_to_arrays(positions, get_price, get_pip)
+    if not kept:
+        return [], []
+
+    _, new_sl, move, close = compute_trailing(arrays["open_price"], arrays["side"], arrays["sl"], arrays["price"], tiers,
+                                              arrays.get("pip", pip_size))
+    moves = [(kept[i], float(new_sl[i])) for i in np.flatnonzero(move)]
+    closes = [(kept[i], float(arrays["price"][i])) for i in np.flatnonzero(close)]
+    return moves, closes
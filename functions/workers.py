@@ -0,0 +1,151 @@
+import MetaTrader5 as mt5
+import functools
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+from functions.logger import get_logger
+from functions.metrics import metrics, TERMINAL_CALLS
+from functions.ticks import reset_tick_snapshot, next_poll_delay, MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+
+logger = get_logger()
+
+LATENCY_SAMPLES = 500  # Candle latencies kept per symbol
+
+# Token bucket shared by every worker: at most rate calls per second on average, in bursts of up to burst
+class RateLimiter:
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waits = 0
+        self.waited = 0.0
+
+    # Function to block until a call may go through
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waits += 1
+                self.waited += wait
+            time.sleep(wait)
+
+    # Function to take a call's token only if one is left, without waiting
+    def try_acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+# Function to route the terminal calls made through the MetaTrader5 module via limiter
+def throttle_terminal(limiter: RateLimiter, names: Iterable[str] = TERMINAL_CALLS):
+    for name in names:
+        func = getattr(mt5, name)
+        # Re-installing replaces the previous limiter instead of stacking another one
+        if getattr(func, "limiter", None) is not None:
+            func = func.__wrapped__
+
+        @functools.wraps(func, updated=())
+        def limited(*args, _func=func, **kwargs):
+            limiter.acquire()
+            return _func(*args, **kwargs)
+
+        limited.limiter = limiter
+        setattr(mt5, name, limited)
+
+# Per-symbol time from a candle's close to its orders being placed. The broker's clock is estimated from
+# the quotes the workers see: a quote is never stamped later than "now" on the server, so the largest
+# (quote time - local time) seen so far is the best estimate of the server's offset from the local clock.
+class CandleLatency:
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.samples: Dict[str, deque] = {}
+        self.size = samples
+        self.clock_offset: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def observe(self, tick):
+        if tick is None:
+            return
+        offset = tick.time_msc / 1000 - time.time()
+        with self.lock:
+            if self.clock_offset is None or offset > self.clock_offset:
+                self.clock_offset = offset
+
+    def server_time(self) -> float:
+        return time.time() + (self.clock_offset or 0.0)
+
+    # Function to record that the orders for the candle closing at candle_close (server epoch) are placed
+    def record(self, symbol: str, candle_close: float) -> float:
+        latency = max(0.0, self.server_time() - candle_close)
+        with self.lock:
+            self.samples.setdefault(symbol, deque(maxlen=self.size)).append(latency)
+        return latency
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            samples = {symbol: sorted(values) for symbol, values in self.samples.items() if values}
+        return {
+            symbol: {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+            }
+            for symbol, values in samples.items()
+        }
+
+    def log_stats(self):
+        for symbol, stats in sorted(self.stats().items()):
+            logger.info(f"Candle close to orders placed for {symbol} - count: {stats['count']}, mean: {stats['mean']:.3f}s, "
+                        f"p50: {stats['p50']:.3f}s, p95: {stats['p95']:.3f}s, max: {stats['max']:.3f}s")
+
+# Function to run process_symbol in its own thread per symbol until stop is set or the process is interrupted.
+# process_symbol returns whether the symbol's quote changed, which drives that worker's poll backoff.
+# on_interval, if given, runs on the calling thread every interval seconds (stats logging and the like).
+# Every pass is timed under the loop name given.
+def run_symbol_workers(symbols: Iterable[str], process_symbol: Callable[[str], bool],
+                       min_interval=MIN_POLL_INTERVAL, max_delay=MAX_IDLE_DELAY, stop: Optional[threading.Event] = None,
+                       on_interval: Optional[Callable[[], None]] = None, interval: float = 600, name: str = "symbol_workers"):
+    stop = stop or threading.Event()
+
+    def work(symbol: str):
+        delay = min_interval
+        while not stop.is_set():
+            reset_tick_snapshot()
+            started = time.perf_counter()
+            try:
+                changed = process_symbol(symbol)
+            except Exception:
+                logger.exception(f"Worker for {symbol} failed")
+                changed = False
+            metrics.observe_loop(name, time.perf_counter() - started)
+            delay = next_poll_delay(delay, changed, min_interval, max_delay)
+            stop.wait(delay)
+
+    threads = [threading.Thread(target=work, args=(symbol,), name=f"worker-{symbol}", daemon=True) for symbol in symbols]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while not stop.wait(interval):
+            if on_interval is not None:
+                on_interval()
+    except KeyboardInterrupt:
+        logger.info("Stopping symbol workers")
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,42 @@
+import MetaTrader5 as mt5
+import argparse
+from functions.configs import read_config_file
+from functions.host import StrategyHost
+from functions.metrics import start_metrics, METRICS_INTERVAL
+from functions.strategies import STRATEGIES, build_strategies
+from functions.symbols import symbol_registry
+from functions.session_calendar import session_calendar
+from functions.ticks import MIN_POLL_INTERVAL, MAX_IDLE_DELAY
+from functions.logger import get_logger
+
+logger = get_logger()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several strategies in one process over one terminal connection.")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"Comma-separated strategies to run ({', '.join(STRATEGIES)})")
+    parser.add_argument("--config", default="config/config.json", help="Configuration file with currency_pairs, session times and lot_size")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(unknown)}")
+
+    config = read_config_file(args.config)
+    session_calendar.configure(config.get("session_timezone"), config.get("server_timezone"))
+
+    # Initialize the MetaTrader5 package
+    if not mt5.initialize():
+        logger.error("Initialize() failed")
+        mt5.shutdown()
+        return
+
+    start_metrics(config.get("metrics_port"), config.get("metrics_file"), config.get("metrics_interval", METRICS_INTERVAL))
+    host = StrategyHost(build_strategies(names, config),
+                        min_poll_interval=config.get("min_poll_interval", MIN_POLL_INTERVAL),
+                        max_idle_delay=config.get("max_idle_delay", MAX_IDLE_DELAY))
+    symbol_registry.load(host.symbols)
+    host.run()
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,48 @@
 import MetaTrader5 as mt5
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import datetime
 import time
 import schedule
-
-# Initialize the MetaTrader5 package
-if not mt5.initialize():
-    print("initialize() failed")
-    mt5.shutdown()
+from functools import partial
+from functions.bars import range_extrema
+from functions.ticks import get_close_price, reset_tick_snapshot, poll_changed_symbols, next_poll_delay, MIN_POLL_INTERVAL
+from functions.metrics import metrics, start_metrics
+from functions.logger import get_logger, event, log_order
+from functions.trailing import plan_trailing, SESSION_TIERS
+from functions.stops import StopManager
+from functions.symbols import symbol_registry
+from functions.session_calendar import session_calendar
+from functions.cancel import cancel_orders, select_orders
+from functions.journal import Journal, STATE, unresolved_intents
+from functions.dedupe import dedupe_index, order_comment, day_session, PREVIOUS_DAY_HIGH, PREVIOUS_DAY_LOW, ASIA_HIGH, ASIA_LOW
+
+logger = get_logger()
 
 missing_symbols_pdhl = []
 missing_symbols_ashl = []
 active_positions = []
 
+# Orders and positions of this strategy carry this magic number and comments starting with "M1"
+magic = 234001
+
+metrics_port = None  # Serve Prometheus metrics on this local port when set
+metrics_file = None  # Append metrics snapshots to this rotating file when set
+
+# Initial SL and TP distances from the order price, in pips of the order's symbol; the same as main.py's
+symbol_registry.register_offsets("M1", 10, 60)
+
+# Sessions the brackets are placed for, an hour later than main.py's
+M1_PREVIOUS_DAY = "m1_previous_day"
+M1_ASIA_SESSION = "m1_asia_session"
+session_calendar.register(M1_PREVIOUS_DAY, "06:00", "06:00", span=1)
+session_calendar.register(M1_ASIA_SESSION, "06:00", "14:00")
+
+# Order intents, results, managed tickets and missing symbols, replayed by restore_state() after a restart
+journal_path = "data/journal/m1.wal"
+journal = Journal(journal_path)
+
+# SL modifications, paced and sent once per tier; m1 trails with the same tiers as main.py
+stop_manager = StopManager(SESSION_TIERS)
+
 # Function to read configuration from a text file
 def read_config_file(filename):
     config = {}
@@ -41,170 +71,151 @@ def get_user_inputs():
     lot_size = input(f"Enter the lot size for orders (default: {config['lot_size']}): ") or config['lot_size']
     lot_size = float(lot_size)
 
-# Function to get the previous day's high and low prices, considering weekends
+# Function to get the previous day's high and low prices, from the previous trading day's 06:00 to today's
 def get_previous_day_high_low(symbol):
-    now = datetime.now() # 03:00
-    end = now.replace(hour=6, minute=00, second=0, microsecond=0) #18 05:00
-    # if now < end:
-    #     end -= timedelta(days=1)
-    
-    # Skip weekends
-    if end.weekday() == 5:  # Saturday
-        end -= timedelta(days=1)
-    elif end.weekday() == 6:  # Sunday
-        end -= timedelta(days=2)
-
-    start = end - timedelta(days=1) # 17 05:00
-    start = start.replace(hour=6, minute=00, second=0, microsecond=0)
-    
-    # Skip weekends
-    if start.weekday() == 5:  # Saturday
-        start -= timedelta(days=1)
-    elif start.weekday() == 6:  # Sunday
-        start -= timedelta(days=2)
+    window = session_calendar.window(M1_PREVIOUS_DAY)
 
-    print(f"Fetching data for PDHL - {symbol}")
+    logger.info(f"Fetching data for PDHL - {symbol}", extra=event("fetch_rates", symbol))
 
-    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, start, end)
+    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, window.start_time, window.end_time)
     if rates is not None and len(rates) >= 24:
         if symbol in missing_symbols_pdhl:
             missing_symbols_pdhl.remove(symbol)
 
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        high = df['high'].max()
-        low = df['low'].min()
+        high, low, _, _ = range_extrema(rates)
         return high, low
     else:
         if symbol not in missing_symbols_pdhl:
             missing_symbols_pdhl.append(symbol)
-        print(f"No data retrieved for {symbol} in the given date range.")
+        logger.warning(f"No data retrieved for {symbol} in the given date range.", extra=event("no_rates", symbol))
         return None, None
 
-# Function to get the previous Asia session's high and low prices (2:30 AM to 10:30 AM)
+# Function to get the previous Asia session's high and low prices (06:00 to 14:00)
 def get_previous_asia_session_high_low(symbol):
-    today = datetime.now()
-    start = datetime(today.year, today.month, today.day, 6, 00)
-    end = datetime(today.year, today.month, today.day, 14, 00)
-
-    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, start, end)
+    window = session_calendar.window(M1_ASIA_SESSION)
+    rates = mt5.copy_rates_range(symbol, mt5.TIMEFRAME_H1, window.start_time, window.end_time)
 
     if rates is not None and len(rates) > 0:
         if symbol in missing_symbols_ashl:
             missing_symbols_ashl.remove(symbol)
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        high = df['high'].max()
-        low = df['low'].min()
+        high, low, _, _ = range_extrema(rates)
         return high, low
     else:
         if symbol not in missing_symbols_ashl:
             missing_symbols_ashl.append(symbol)
-        print(f"No data retrieved for {symbol} in the given date range.")
+        logger.warning(f"No data retrieved for {symbol} in the given date range.", extra=event("no_rates", symbol))
         return None, None
 
-# Function to place a buy limit order
-def place_buy_limit(symbol, price, volume):
+# Function to place a buy limit order, at most once per (symbol, session, level kind, order type) when tagged
+def place_buy_limit(symbol, price, volume, level="", session=""):
     global active_positions
+    offsets = symbol_registry.offsets(symbol, "M1")
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_BUY_LIMIT,
         "price": price,
-        "sl": price - 0.001,  # Initial Stop loss 10 pips below the buy limit price
-        "tp": price + 0.006,  # Initial Take profit 60 pips above the buy limit price
+        "sl": round(price - offsets.sl, offsets.digits),  # Initial Stop loss 10 pips below the buy limit price
+        "tp": round(price + offsets.tp, offsets.digits),  # Initial Take profit 60 pips above the buy limit price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "M1 Buy Limit",
+        "magic": magic,
+        "comment": order_comment("M1", mt5.ORDER_TYPE_BUY_LIMIT, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
+    if not dedupe_index.claim(request):
+        return None
+    result = journal.send(mt5.order_send, request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
+    if result is not None:
         active_positions.append(result.order)
-        print(f"Order send result: {result}")
+        journal.state("active", ticket=result.order)
     return result
 
 # Function to place a sell limit order
-def place_sell_limit(symbol, price, volume):
+def place_sell_limit(symbol, price, volume, level="", session=""):
     global active_positions
+    offsets = symbol_registry.offsets(symbol, "M1")
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_SELL_LIMIT,
         "price": price,
-        "sl": price + 0.001,  # Initial Stop loss 10 pips above the sell limit price
-        "tp": price - 0.006,  # Initial Take profit 60 pips below the sell limit price
+        "sl": round(price + offsets.sl, offsets.digits),  # Initial Stop loss 10 pips above the sell limit price
+        "tp": round(price - offsets.tp, offsets.digits),  # Initial Take profit 60 pips below the sell limit price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "M1 Sell Limit",
+        "magic": magic,
+        "comment": order_comment("M1", mt5.ORDER_TYPE_SELL_LIMIT, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
+    if not dedupe_index.claim(request):
+        return None
+    result = journal.send(mt5.order_send, request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
+    if result is not None:
         active_positions.append(result.order)
-        print(f"Order send result: {result}")
+        journal.state("active", ticket=result.order)
     return result
 
 # Function to place a buy stop order
-def place_buy_stop(symbol, price, volume):
+def place_buy_stop(symbol, price, volume, level="", session=""):
     global active_positions
+    offsets = symbol_registry.offsets(symbol, "M1")
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_BUY_STOP,
         "price": price,
-        "sl": price - 0.001,  # Initial Stop loss 10 pips below the buy stop price
-        "tp": price + 0.006,  # Initial Take profit 60 pips above the buy stop price
+        "sl": round(price - offsets.sl, offsets.digits),  # Initial Stop loss 10 pips below the buy stop price
+        "tp": round(price + offsets.tp, offsets.digits),  # Initial Take profit 60 pips above the buy stop price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "M1 Buy Stop",
+        "magic": magic,
+        "comment": order_comment("M1", mt5.ORDER_TYPE_BUY_STOP, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
+    if not dedupe_index.claim(request):
+        return None
+    result = journal.send(mt5.order_send, request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
+    if result is not None:
         active_positions.append(result.order)
-        print(f"Order send result: {result}")
+        journal.state("active", ticket=result.order)
     return result
 
 # Function to place a sell stop order
-def place_sell_stop(symbol, price, volume):
+def place_sell_stop(symbol, price, volume, level="", session=""):
     global active_positions
+    offsets = symbol_registry.offsets(symbol, "M1")
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
         "symbol": symbol,
         "volume": volume,
         "type": mt5.ORDER_TYPE_SELL_STOP,
         "price": price,
-        "sl": price + 0.001,  # Initial Stop loss 10 pips above the sell stop price
-        "tp": price - 0.006,  # Initial Take profit 60 pips below the sell stop price
+        "sl": round(price + offsets.sl, offsets.digits),  # Initial Stop loss 10 pips above the sell stop price
+        "tp": round(price - offsets.tp, offsets.digits),  # Initial Take profit 60 pips below the sell stop price
         "deviation": 10,
-        "magic": 234000,
-        "comment": "M1 Sell Stop",
+        "magic": magic,
+        "comment": order_comment("M1", mt5.ORDER_TYPE_SELL_STOP, level, session),
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
+    if not dedupe_index.claim(request):
+        return None
+    result = journal.send(mt5.order_send, request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
+    if result is not None:
         active_positions.append(result.order)
-        print(f"Order send result: {result}")
+        journal.state("active", ticket=result.order)
     return result
 
 def place_modified_sl(symbol, ticket, sl, tp):
@@ -214,14 +225,10 @@ def place_modified_sl(symbol, ticket, sl, tp):
         "position": ticket,
         "sl": sl,
         "tp": tp,
-        "magic": 234000,
+        "magic": magic,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
-        print(f"Order send result: {result}")
+    result = journal.send(mt5.order_send, request)
+    log_order("modify_sl", request, result)
     return result
 
 def close_position(symbol, ticket, volume, current_price, order_type):
@@ -233,54 +240,34 @@ def close_position(symbol, ticket, volume, current_price, order_type):
         "price": current_price,
         "type": order_type,
         "deviation": 10,
-        "magic": 234000,
+        "magic": magic,
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
-    print(f"Sending order request: {request}")
-    result = mt5.order_send(request)
-    if result is None:
-        print("Order send failed: result is None")
-    else:
-        print(f"Order send result: {result}")
+    result = journal.send(mt5.order_send, request)
+    log_order("close", request, result)
     return result
 
+# Function to move a position's SL through the stop manager, which drops repeats and paces the requests
+def move_sl(pos, sl_price):
+    stop_manager.update(pos, sl_price, lambda sl: place_modified_sl(pos.symbol, pos.ticket, sl, pos.tp))
+
 # Function to adjust stop loss and take profit based on the given conditions
-def adjust_sl_tp():
+def adjust_sl_tp(positions=None):
     global active_positions
-    positions = mt5.positions_get()
-    for pos in positions:
-        if pos.ticket not in active_positions:
-            continue
+    if positions is None:
+        positions = mt5.positions_get() or []
+    # Tiers are in the pips of each position's symbol
+    moves, closes = plan_trailing([pos for pos in positions if pos.ticket in active_positions], SESSION_TIERS,
+                                  get_close_price, get_pip=symbol_registry.pip)
+
+    for pos, current_price in closes:
+        negative_order_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
+        close_position(pos.symbol, pos.ticket, pos.volume, current_price, negative_order_type)
+        stop_manager.forget(pos.ticket)
 
-        symbol = pos.symbol
-        ticket = pos.ticket
-        order_type = pos.type
-        open_price = pos.price_open
-        volume = pos.volume
-
-        current_price = mt5.symbol_info_tick(symbol).bid if order_type == mt5.ORDER_TYPE_BUY else mt5.symbol_info_tick(symbol).ask
-        profit = (current_price - open_price) if order_type == mt5.ORDER_TYPE_BUY else (open_price - current_price)
-        profit_pips = profit * 10000  # Convert profit to pips
-        negative_order_type = mt5.ORDER_TYPE_SELL if order_type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-
-        current_sl = pos.sl
-        current_tp = pos.tp
-
-        if profit_pips >= 60:
-            close_position(symbol, ticket, volume, current_price, negative_order_type)
-        elif profit_pips >= 30:
-            sl_price = open_price + 0.0029 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.0029
-            if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                place_modified_sl(symbol, ticket, sl_price, current_tp)
-        elif profit_pips >= 20:
-            sl_price = open_price + 0.001 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.001
-            if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                place_modified_sl(symbol, ticket, sl_price, current_tp)
-        elif profit_pips >= 10:
-            sl_price = open_price + 0.00005 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.00005
-            if (order_type == mt5.ORDER_TYPE_BUY and sl_price > current_sl) or (order_type == mt5.ORDER_TYPE_SELL and sl_price < current_sl):
-                place_modified_sl(symbol, ticket, sl_price, current_tp)
+    for pos, sl_price in moves:
+        move_sl(pos, sl_price)
 
 # Function to delete pending orders scheduled for 1 AM
 def delete_pending_orders_at_1am():
@@ -290,18 +277,14 @@ def delete_pending_orders_at_1am():
     if not positions:
         active_positions.clear()
 
-    orders = mt5.orders_get()
-    for order in orders:
-        close_request = {
-            "action": mt5.TRADE_ACTION_REMOVE,
-            "order": order.ticket,
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        result = mt5.order_send(close_request)
+    # Leave the other strategies' orders alone
+    orders = select_orders(mt5.orders_get(), prefix="M1")
+    cancel_orders(orders, partial(journal.send, mt5.order_send), "M1 pending orders at 1 AM")
     missing_symbols_pdhl.clear()
     missing_symbols_ashl.clear()
     active_positions.clear()
+    journal.state("reset")
+    journal.compact(snapshot_records)
     
 # Function to schedule tasks
 def schedule_tasks():
@@ -314,70 +297,145 @@ def schedule_tasks():
     # Schedule delete_pending_orders_at_1am at the specified time
     schedule.every().day.at(delete_orders_time).do(delete_pending_orders_at_1am)
 
+    # Report the SL requests sent and held back
+    schedule.every(10).minutes.do(stop_manager.log_stats, "M1")
+
 # Function to run get_previous_day_high_low and place trades
 def run_get_previous_day_high_low(pre_day_currency_pairs):
+    session = day_session(session_calendar.today())
     for pair in pre_day_currency_pairs:
+        dedupe_index.expire("M1", pair, session)
         symbol_info = mt5.symbol_info_tick(pair)
         if symbol_info is not None:
             current_price = symbol_info.bid
             day_high, day_low = get_previous_day_high_low(pair)
             if day_high is not None and day_low is not None:
                 if current_price < day_high:
-                    place_sell_limit(pair, day_high, lot_size)
-                    place_buy_stop(pair, day_high, lot_size)
+                    place_sell_limit(pair, day_high, lot_size, PREVIOUS_DAY_HIGH, session)
+                    place_buy_stop(pair, day_high, lot_size, PREVIOUS_DAY_HIGH, session)
                 else:
-                    print(f"Current price ({current_price}) is outside previous day's high for {pair}. No orders placed.")
+                    logger.info(f"Current price ({current_price}) is outside previous day's high for {pair}. No orders placed.")
                     
                 if  current_price > day_low:
-                    place_buy_limit(pair, day_low, lot_size)
-                    place_sell_stop(pair, day_low, lot_size)
+                    place_buy_limit(pair, day_low, lot_size, PREVIOUS_DAY_LOW, session)
+                    place_sell_stop(pair, day_low, lot_size, PREVIOUS_DAY_LOW, session)
                 else:
-                    print(f"Current price ({current_price}) is outside previous day's low for {pair}. No orders placed.")
+                    logger.info(f"Current price ({current_price}) is outside previous day's low for {pair}. No orders placed.")
             else:
-                print(f"Failed to retrieve previous day's high and low for {pair}.")
+                logger.error(f"Failed to retrieve previous day's high and low for {pair}.")
         else:
-            print(f"Failed to retrieve symbol info for PDHL - {pair}")
+            logger.error(f"Failed to retrieve symbol info for PDHL - {pair}")
+    journal.state("missing", pdhl=missing_symbols_pdhl, ashl=missing_symbols_ashl)
 
 # Function to run get_previous_asia_session_high_low and place trades
 def run_get_previous_asia_session_high_low(asia_currency_pairs):
+    session = day_session(session_calendar.today())
     for pair in asia_currency_pairs:
+        dedupe_index.expire("M1", pair, session)
         symbol_info = mt5.symbol_info_tick(pair)
         if symbol_info is not None:
             current_price = symbol_info.bid
             asia_high, asia_low = get_previous_asia_session_high_low(pair)
             if asia_high is not None and asia_low is not None:
                 if current_price < asia_high:
-                    place_sell_limit(pair, asia_high, lot_size)
-                    place_buy_stop(pair, asia_high, lot_size)
+                    place_sell_limit(pair, asia_high, lot_size, ASIA_HIGH, session)
+                    place_buy_stop(pair, asia_high, lot_size, ASIA_HIGH, session)
                 else:
-                    print(f"Current price ({current_price}) is outside Asia session's high for {pair}. No orders placed.")
+                    logger.info(f"Current price ({current_price}) is outside Asia session's high for {pair}. No orders placed.")
                 if current_price > asia_low:
-                    place_buy_limit(pair, asia_low, lot_size)
-                    place_sell_stop(pair, asia_low, lot_size)
+                    place_buy_limit(pair, asia_low, lot_size, ASIA_LOW, session)
+                    place_sell_stop(pair, asia_low, lot_size, ASIA_LOW, session)
                 else:
-                    print(f"Current price ({current_price}) is outside Asia session's low for {pair}. No orders placed.")
+                    logger.info(f"Current price ({current_price}) is outside Asia session's low for {pair}. No orders placed.")
             else:
-                print(f"Failed to retrieve previous Asia session's high and low for {pair}.")
+                logger.error(f"Failed to retrieve previous Asia session's high and low for {pair}.")
         else:
-            print(f"Failed to retrieve symbol info for AHL - {pair}")
+            logger.error(f"Failed to retrieve symbol info for AHL - {pair}")
+    journal.state("missing", pdhl=missing_symbols_pdhl, ashl=missing_symbols_ashl)
 
-# Get user inputs
-get_user_inputs()
-
-# Initial schedule tasks
-schedule_tasks()
-
-# Run the scheduler in a loop
-while True:
+# Function to retry the session orders for symbols that were missing market data
+def retry_missing_symbols():
     if missing_symbols_pdhl:
         pre_day_currency_pairs = missing_symbols_pdhl
         run_get_previous_day_high_low(pre_day_currency_pairs)
     if missing_symbols_ashl:
         asia_currency_pairs = missing_symbols_ashl
         run_get_previous_asia_session_high_low(asia_currency_pairs)
-    adjust_sl_tp()
-    schedule.run_pending()
-    time.sleep(1)
 
-# Shutdown MetaTrader5 connection (Note: This part won't be reached in the loop above)
-mt5.shutdown()
+# Function to list the state a compacted journal starts from: the managed tickets and the symbols still missing data
+def snapshot_records():
+    records = [(STATE, {"name": "active", "ticket": ticket}) for ticket in active_positions]
+    records.append((STATE, {"name": "missing", "pdhl": missing_symbols_pdhl, "ashl": missing_symbols_ashl}))
+    return records
+
+# Function to pick up where the last run stopped: replay the journal, then keep managing only the orders and
+# positions the terminal still has
+def restore_state():
+    started = time.perf_counter()
+    records = journal.open()
+    tickets = []
+    today = datetime.now().date()
+    for record in records:
+        if record.kind != STATE:
+            continue
+        name = record.data["name"]
+        if name == "active":
+            tickets.append(record.data["ticket"])
+        elif name == "missing" and datetime.fromtimestamp(record.time).date() == today:
+            # Yesterday's missing symbols were due for the 1 AM reset already
+            missing_symbols_pdhl[:] = record.data["pdhl"]
+            missing_symbols_ashl[:] = record.data["ashl"]
+        elif name == "reset":
+            tickets.clear()
+            missing_symbols_pdhl.clear()
+            missing_symbols_ashl.clear()
+
+    items = [item for item in list(mt5.orders_get() or []) + list(mt5.positions_get() or []) if item.comment.startswith("M1")]
+    live = {item.ticket for item in items}
+    # Brackets still live were placed by the last run and are not placed again
+    dedupe_index.rebuild("M1", (magic,), items)
+    active_positions[:] = [ticket for ticket in tickets if ticket in live]
+    for request in unresolved_intents(records):
+        logger.warning(f"Order request {request} was in flight when the last run stopped; using what the terminal has")
+
+    journal.compact(snapshot_records)
+    logger.info(f"Restored {len(active_positions)} managed tickets in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+def main():
+    # Initialize the MetaTrader5 package
+    if not mt5.initialize():
+        logger.error("initialize() failed")
+        mt5.shutdown()
+
+    # Time every terminal call from here on
+    start_metrics(metrics_port, metrics_file)
+
+    # Get user inputs
+    get_user_inputs()
+    symbol_registry.load(currency_pairs)
+
+    # Pick up the orders and positions of the last run
+    restore_state()
+
+    # Initial schedule tasks
+    schedule_tasks()
+
+    # Run the scheduler in a loop, re-evaluating positions only when a quote changes
+    delay = MIN_POLL_INTERVAL
+    last_retry = 0.0
+    while True:
+        reset_tick_snapshot()
+        started = time.perf_counter()
+        if time.monotonic() - last_retry >= 1:
+            last_retry = time.monotonic()
+            retry_missing_symbols()
+        changed_symbols = poll_changed_symbols(currency_pairs)
+        if changed_symbols:
+            adjust_sl_tp()
+        delay = next_poll_delay(delay, bool(changed_symbols))
+        schedule.run_pending()
+        metrics.observe_loop("m1", time.perf_counter() - started)
+        time.sleep(delay)
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,72 @@
 import MetaTrader5 as mt5
-from datetime import datetime
+import threading
 import time
-
-# Initialize the MT5 terminal
-if not mt5.initialize():
-    print("initialize() failed, error code =", mt5.last_error())
-    quit()
-
-pending_orders_dict = {}
+from functools import partial
+from typing import Dict, Set
+from functions.ticks import get_close_price, get_tick, log_tick_stats, poll_changed_symbols, MIN_POLL_INTERVAL
+from functions.account import AccountSnapshot
+from functions.oco import OcoBook, HIGH, LOW
+from functions.dedupe import dedupe_index, order_comment, candle_session, CANDLE_HIGH, CANDLE_LOW
+from functions.cancel import cancel_orders, select_orders
+from functions.journal import Journal, STATE, COMPACT_BYTES, unresolved_intents
+from functions.metrics import start_metrics
+from functions.logger import get_logger, event, log_order, log_queue_stats
+from functions.workers import CandleLatency, RateLimiter, throttle_terminal, run_symbol_workers
+from functions.trailing import plan_trailing, M2_TIERS
+from functions.stops import StopManager
+from functions.symbols import symbol_registry
+from functions.session_calendar import session_calendar
+
+logger = get_logger()
+
+oco_book = OcoBook()
+account = AccountSnapshot()
+candle_latency = CandleLatency()
+stop_manager = StopManager(M2_TIERS)
 latest_candles_dict = {}
+candle_periods = {}
 pending_orders_list = []
-active_positions = []
+# Tickets of this strategy's positions per symbol, whose stops are trailed; each symbol's worker touches its own
+active_positions: Dict[str, Set[int]] = {}
+active_positions_lock = threading.Lock()
 
 symbols = ["EURUSD", "AUDUSD", "GBPUSD"]
 volume = 20.0
+sl_pips = 5  # Initial SL and TP distances from the order price, in pips of the order's symbol
+tp_pips = 50
 timeframe = mt5.TIMEFRAME_M15
+candle_seconds = 15 * 60
+max_terminal_calls_per_second = 50
+metrics_port = None  # Serve Prometheus metrics on this local port when set
+metrics_file = None  # Append metrics snapshots to this rotating file when set
+session_timezone = None  # Time zone of the candle hours below, e.g. "Asia/Colombo"; local time when not set
+server_timezone = None  # The broker's server time zone, e.g. "Europe/Athens"; taken to read as session_timezone when not set
+journal_path = "data/journal/m2.wal"
+
+# Orders and positions of this strategy carry this magic number and comments starting with "M2"
+magic = 234002
+symbol_registry.register_offsets("M2", sl_pips, tp_pips)
+
+session_calendar.register("m2_rollover", "01:00", "02:00")
+ROLLOVER = session_calendar.mask("m2_rollover")
+
+# The orders of a candle's bracket, as (level kind, order type)
+BRACKET = [(CANDLE_HIGH, mt5.ORDER_TYPE_SELL_LIMIT), (CANDLE_HIGH, mt5.ORDER_TYPE_BUY_STOP),
+           (CANDLE_LOW, mt5.ORDER_TYPE_BUY_LIMIT), (CANDLE_LOW, mt5.ORDER_TYPE_SELL_STOP)]
+
+# Order intents, results, handled candles and OCO groups, replayed by restore_state() after a restart
+journal = Journal(journal_path)
 
 def get_previous_candle(symbol, timeframe):
     rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, 2)
     if rates is None or len(rates) < 2:
-        print(f"No candle data available for {symbol}")
+        logger.warning(f"No candle data available for {symbol}", extra=event("no_candle_data", symbol))
         return None, None, None
     
     previous_candle = rates[-2]
 
-    candle_time = datetime.fromtimestamp(previous_candle['time'])
-    candle_hour = candle_time.hour
-
-    if candle_hour == 1:
+    # No brackets around the candles of the rollover hour
+    if session_calendar.in_session(previous_candle['time'], ROLLOVER):
         return None, None, None
 
     return previous_candle['high'], previous_candle['low'], previous_candle['time']
@@ -38,55 +77,31 @@ def check_is_new_candle(symbol, previous_time):
     if symbol in latest_candles_dict:
         if latest_candles_dict[symbol] < previous_time:
             latest_candles_dict[symbol] = previous_time
-
+            journal.state("candle", symbol=symbol, time=int(previous_time))
             return True
         else:
             return False
     else:
         latest_candles_dict[symbol] = previous_time
+        journal.state("candle", symbol=symbol, time=int(previous_time))
         return True
 
-def delete_pending_orders(symbol, tickets=None, order_type1=None, order_type2=None):
-    orders = mt5.orders_get(symbol=symbol)
+# Function to cancel the given pending orders of a symbol, with the removals sent at once
+def delete_pending_orders(symbol, tickets=None):
+    orders = account.orders(symbol)
     if not orders:
-        print(f"No pending orders to delete for {symbol}")
+        logger.info(f"No pending orders to delete for {symbol}", extra=event("no_pending_orders", symbol))
         return
 
-    if tickets:
-        for order in orders:
-            if order.ticket in tickets:
-                if order_type1 and order_type2:
-                    if order.comment == order_type1 or order.comment == order_type2:
-                        run_delete_order(order.ticket, symbol)
-                else:
-                     run_delete_order(order.ticket, symbol)    
-    return
-
-def remove_item_and_clean(symbol, item_to_remove):
-    global pending_orders_dict
-
-    if symbol not in pending_orders_dict:
+    if not tickets:
         return
-
-    # Clean up the pending orders dictionary
-    new_pending_orders_dict = []
-
-    for trade_group in pending_orders_dict[symbol]:
-        new_trade_group = []
-
-        for trade_list in trade_group:
-            # Remove specific items and also filter out lists that contain only None
-            new_trade_list = [item for item in trade_list if item != item_to_remove]
-            if new_trade_list and any(val is not None for val in new_trade_list):
-                new_trade_group.append(new_trade_list)
-
-        if new_trade_group:
-            new_pending_orders_dict.append(new_trade_group)
-
-    if new_pending_orders_dict:
-        pending_orders_dict[symbol] = new_pending_orders_dict
-    else:
-        del pending_orders_dict[symbol]
+    orders = select_orders(orders, tickets=tickets)
+    report = cancel_orders(orders, partial(journal.send, account.send), f"M2 orders on {symbol}")
+    for ticket in report.removed:
+        oco_book.discard(ticket)
+        if ticket in pending_orders_list:
+            pending_orders_list.remove(ticket)
+    return
 
 def run_delete_order(ticket, symbol):
     close_request = {
@@ -96,24 +111,19 @@ def run_delete_order(ticket, symbol):
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    result = mt5.order_send(close_request)
-    if result.retcode != mt5.TRADE_RETCODE_DONE:
-        print(f"Failed to delete order {ticket} for {symbol}: {result.retcode}")
-    else:
-        remove_item_and_clean(symbol, ticket)
+    result = journal.send(account.send, close_request)
+    log_order("delete", close_request, result, symbol=symbol)
+    if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+        oco_book.discard(ticket)
+        dedupe_index.discard(ticket)
         pending_orders_list.remove(ticket)
-        print(f"Successfully deleted order {ticket} for {symbol}")
     return
 
-def place_pending_order(symbol, price, volume, order_type):
-    if order_type == mt5.ORDER_TYPE_BUY_STOP:
-        comment = "M2 Buy Stop"
-    elif order_type == mt5.ORDER_TYPE_BUY_LIMIT:
-        comment = "M2 Buy Limit"
-    elif order_type == mt5.ORDER_TYPE_SELL_LIMIT:
-        comment = "M2 Sell Limit"
-    else:
-        comment = "M2 Sell Stop"
+# Function to place one order of a candle's bracket; None when it failed or is already placed for the candle
+def place_pending_order(symbol, price, volume, order_type, level, session):
+    comment = order_comment("M2", order_type, level, session)
+    offsets = symbol_registry.offsets(symbol, "M2")
+    direction = 1 if order_type in [mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_BUY_LIMIT] else -1
 
     request = {
         "action": mt5.TRADE_ACTION_PENDING,
@@ -121,63 +131,43 @@ def place_pending_order(symbol, price, volume, order_type):
         "volume": volume,
         "type": order_type,
         "price": price,
-        "sl": price - 0.0005 if order_type in [mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_BUY_LIMIT] else price + 0.0005,
-        "tp": price + 0.005 if order_type in [mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_BUY_LIMIT] else price - 0.005,
+        "sl": round(price - direction * offsets.sl, offsets.digits),
+        "tp": round(price + direction * offsets.tp, offsets.digits),
         "deviation": 10,
-        "magic": 234000,
+        "magic": magic,
         "comment": comment,
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_RETURN,
     }
-    result = mt5.order_send(request)
-    if result.retcode != mt5.TRADE_RETCODE_DONE:
-        print(f"Failed to place {order_type} order at {price} for {symbol}: {result.retcode}")
+    if not dedupe_index.claim(request):
+        return None
+    result = journal.send(account.send, request)
+    log_order("place", request, result)
+    dedupe_index.settle(request, result)
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
         return None
     else:
         pending_orders_list.append(result.order)
-        print(f"Placed {order_type} order at {price} for {symbol}")
         return result.order
 
-def remove_opposite_trades(symbol, ticket, order_type1, order_type2):
-    global pending_orders_dict
-
-    if symbol not in pending_orders_dict:
-        return
-
-    deletable_oposit_tickets = []
-    condition = False
-
-    for trade_group in pending_orders_dict[symbol]:
-        for trade_list in trade_group:
-            if ticket in trade_list:
-                condition = True
-                remove_item_and_clean(symbol, ticket)
-                target_trade_group = trade_group
-                break
-        if condition:
-            break
-
-    if condition:
-        target_tickets = []
-        for new_trade_list in target_trade_group:
-            for target_ticket in new_trade_list:
-                target_tickets.append(target_ticket)
-
-        delete_pending_orders(symbol, target_tickets, order_type1, order_type2)            
+def remove_opposite_trades(symbol, ticket):
+    # Only the other level is cancelled; the order sharing the filled one's level stays live
+    if ticket not in oco_book:
         return
+    siblings = oco_book.fill(ticket, other_level_only=True)
+    journal.state("fill", ticket=ticket)
+    if siblings:
+        delete_pending_orders(symbol, [order.ticket for order in siblings])
 
 def remove_orders_for_positions(symbol):
-    global active_positions
-    positions = mt5.positions_get(symbol=symbol)
+    positions = account.positions(symbol)
     if positions:
         active_trades = {pos.ticket: pos.comment for pos in positions}
         for ticket, trade_type in active_trades.items():
-            if trade_type in ["M2 Sell Limit", "M2 Buy Stop"]:
-                active_positions.append(ticket)
-                remove_opposite_trades(symbol, ticket, "M2 Buy Limit", "M2 Sell Stop")
-            elif trade_type in ["M2 Buy Limit", "M2 Sell Stop"]:
-                active_positions.append(ticket)
-                remove_opposite_trades(symbol, ticket, "M2 Sell Limit", "M2 Buy Stop")
+            if trade_type.startswith("M2"):
+                with active_positions_lock:
+                    active_positions.setdefault(symbol, set()).add(ticket)
+                remove_opposite_trades(symbol, ticket)
 
 def update_sl(position, new_sl):
     request = {
@@ -186,103 +176,178 @@ def update_sl(position, new_sl):
         "sl": new_sl,
         "tp": position.tp,
     }
-    result = mt5.order_send(request)
-    if result.retcode != mt5.TRADE_RETCODE_DONE:
-        if result.retcode != 10025:
-            print(f"Failed to modify SL for position {position.ticket}: {result.retcode}")
-    else:
-        print(f"SL for position {position.ticket} modified to {new_sl}")
-
-def manage_trailing_stop(position):
-    symbol = position.symbol
-    ticket = position.ticket
-    order_type = position.type
-    open_price = position.price_open
-    volume = position.volume
-
-    sl = position.sl
-    tp = position.tp
+    result = journal.send(account.send, request)
+    log_order("modify_sl", request, result, symbol=position.symbol)
+    return result
 
-    current_price = mt5.symbol_info_tick(symbol).bid if order_type == mt5.ORDER_TYPE_BUY else mt5.symbol_info_tick(symbol).ask
-    profit = (current_price - open_price) if order_type == mt5.ORDER_TYPE_BUY else (open_price - current_price)
-    profit_pips = profit * 10000
-
-    negative_order_type = mt5.ORDER_TYPE_SELL if order_type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-
-    if profit_pips >= 25:
-        new_sl = open_price + 0.0024 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.0024
-        if (order_type == mt5.ORDER_TYPE_BUY and new_sl > sl) or (order_type == mt5.ORDER_TYPE_SELL and new_sl < sl):
-            update_sl(position, new_sl)
-    
-    elif profit_pips >= 20:
-        new_sl = open_price + 0.0005 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.0005
-        if (order_type == mt5.ORDER_TYPE_BUY and new_sl > sl) or (order_type == mt5.ORDER_TYPE_SELL and new_sl < sl):
-            update_sl(position, new_sl)
-    
-    elif profit_pips >= 5:
-        new_sl = open_price + 0.00005 if order_type == mt5.ORDER_TYPE_BUY else open_price - 0.00005
-        if (order_type == mt5.ORDER_TYPE_BUY and new_sl > sl) or (order_type == mt5.ORDER_TYPE_SELL and new_sl < sl):
-            update_sl(position, new_sl)
+def manage_trailing_stops(positions):
+    moves, _ = plan_trailing(positions, M2_TIERS, get_close_price, get_pip=symbol_registry.pip)
+    for position, new_sl in moves:
+        # Sent only on a new tier and within the account's rate limit, not on every pass
+        stop_manager.update(position, new_sl, lambda sl, position=position: update_sl(position, sl))
 
 def monitor_triggered_orders(symbol):
-    global active_positions
-    positions = mt5.positions_get(symbol=symbol)
-    if positions:
-        for pos in positions:
-            if pos.ticket in active_positions:
-                manage_trailing_stop(pos)
-    else:
-        active_positions.clear()
+    positions = account.positions(symbol)
+    with active_positions_lock:
+        if not positions:
+            active_positions.pop(symbol, None)
+            return
+        # Positions closed since the last pass drop out of the symbol's set
+        tickets = active_positions[symbol] = active_positions.get(symbol, set()) & {pos.ticket for pos in positions}
+    manage_trailing_stops([pos for pos in positions if pos.ticket in tickets])
     
     return
 
-while True:
-    for symbol in symbols:
-        pre_high, pre_low, pre_time = get_previous_candle(symbol, timeframe)
+# Function to place the orders for a new candle, unless the previous candle was already handled
+def place_candle_orders(symbol, period):
+    pre_high, pre_low, pre_time = get_previous_candle(symbol, timeframe)
 
-        if pre_high is None or pre_low is None or pre_time is None:
-            continue
+    if pre_high is None or pre_low is None or pre_time is None:
+        return
 
-        new_candle = check_is_new_candle(symbol, pre_time)
-        if new_candle:
-            delete_pending_orders(symbol, pending_orders_list)
-
-            high_trades = []
-            low_trades = []
-
-            sell_limit = place_pending_order(symbol, pre_high, volume, mt5.ORDER_TYPE_SELL_LIMIT)
-            if sell_limit is None:
-                continue
-            high_trades.append(sell_limit)
-
-            buy_stop = place_pending_order(symbol, pre_high, volume, mt5.ORDER_TYPE_BUY_STOP)
-            if buy_stop is None:
-                run_delete_order(sell_limit, symbol)
-                continue
-            high_trades.append(buy_stop)
-
-            buy_limit = place_pending_order(symbol, pre_low, volume, mt5.ORDER_TYPE_BUY_LIMIT)
-            if buy_limit is None:
-                run_delete_order(sell_limit, symbol)
-                run_delete_order(buy_stop, symbol)
-                continue
-            low_trades.append(buy_limit)
-
-            sell_stop = place_pending_order(symbol, pre_low, volume, mt5.ORDER_TYPE_SELL_STOP)
-            if sell_stop is None:
-                run_delete_order(sell_limit, symbol)
-                run_delete_order(buy_stop, symbol)
-                run_delete_order(buy_limit, symbol)
-                continue
-            low_trades.append(sell_stop)
-                
-            trade_group = [high_trades, low_trades]
-
-            if symbol in pending_orders_dict:
-                pending_orders_dict[symbol].append(trade_group)
-            else:
-                pending_orders_dict[symbol] = [trade_group]
-
-        remove_orders_for_positions(symbol)
-        monitor_triggered_orders(symbol)
-        time.sleep(1)
\ No newline at end of file
+    first_candle = symbol not in candle_periods
+    new_candle = check_is_new_candle(symbol, pre_time)
+    candle_periods[symbol] = period
+    if new_candle:
+        session = candle_session(pre_time)
+        dedupe_index.expire("M2", symbol, session)
+        # A bracket already placed (or being placed) for this candle is left as it is, not topped up or torn down
+        if any(("M2", symbol, session, level, order_type) in dedupe_index for level, order_type in BRACKET):
+            logger.info(f"Bracket for the {session} candle on {symbol} is already placed", extra=event("bracket_placed", symbol))
+            return
+        delete_pending_orders(symbol, pending_orders_list)
+
+        high_trades = []
+        low_trades = []
+
+        sell_limit = place_pending_order(symbol, pre_high, volume, mt5.ORDER_TYPE_SELL_LIMIT, CANDLE_HIGH, session)
+        if sell_limit is None:
+            return
+        high_trades.append(sell_limit)
+
+        buy_stop = place_pending_order(symbol, pre_high, volume, mt5.ORDER_TYPE_BUY_STOP, CANDLE_HIGH, session)
+        if buy_stop is None:
+            run_delete_order(sell_limit, symbol)
+            return
+        high_trades.append(buy_stop)
+
+        buy_limit = place_pending_order(symbol, pre_low, volume, mt5.ORDER_TYPE_BUY_LIMIT, CANDLE_LOW, session)
+        if buy_limit is None:
+            run_delete_order(sell_limit, symbol)
+            run_delete_order(buy_stop, symbol)
+            return
+        low_trades.append(buy_limit)
+
+        sell_stop = place_pending_order(symbol, pre_low, volume, mt5.ORDER_TYPE_SELL_STOP, CANDLE_LOW, session)
+        if sell_stop is None:
+            run_delete_order(sell_limit, symbol)
+            run_delete_order(buy_stop, symbol)
+            run_delete_order(buy_limit, symbol)
+            return
+        low_trades.append(sell_stop)
+
+        levels = {
+            HIGH: list(zip(high_trades, [mt5.ORDER_TYPE_SELL_LIMIT, mt5.ORDER_TYPE_BUY_STOP])),
+            LOW: list(zip(low_trades, [mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_SELL_STOP])),
+        }
+        oco_book.add_group(symbol, levels)
+        journal.state("group", symbol=symbol, levels=levels)
+        # The first candle handled since startup closed before the worker started, so it says nothing about latency
+        if not first_candle:
+            candle_latency.record(symbol, float(pre_time) + candle_seconds)
+
+# Function to run one pass for a symbol: orders for a new candle, OCO cleanup and trailing stops.
+# Returns whether the symbol's quote changed.
+def process_symbol(symbol):
+    # Only a changed quote can bring a new candle or a trailing stop to move
+    if not poll_changed_symbols([symbol]):
+        return False
+    # Workers share the account snapshot and refresh it at most once per poll interval between them
+    account.invalidate(max_age=MIN_POLL_INTERVAL)
+    handle_quote(symbol)
+    return True
+
+# Function to react to a new quote for a symbol
+def handle_quote(symbol):
+    tick = get_tick(symbol)
+    candle_latency.observe(tick)
+
+    # The previous candle can only change once the quote moves into a new candle period
+    period = tick.time // candle_seconds
+    if candle_periods.get(symbol) != period:
+        place_candle_orders(symbol, period)
+
+    remove_orders_for_positions(symbol)
+    monitor_triggered_orders(symbol)
+
+def log_stats():
+    log_tick_stats()
+    candle_latency.log_stats()
+    log_queue_stats()
+    stop_manager.log_stats("M2")
+    compact_journal()
+
+# Function to compact the journal once it has grown past COMPACT_BYTES
+def compact_journal():
+    if journal.size() > COMPACT_BYTES:
+        journal.compact(snapshot_records)
+
+# Function to list the state a compacted journal starts from: the last candle per symbol and the open OCO groups
+def snapshot_records():
+    records = [(STATE, {"name": "candle", "symbol": symbol, "time": int(candle_time)}) for symbol, candle_time in latest_candles_dict.items()]
+    records += [(STATE, {"name": "group", "symbol": symbol, "levels": levels}) for symbol, levels in oco_book.export()]
+    return records
+
+# Function to pick up where the last run stopped: replay the journal, then keep only the orders and positions
+# the terminal still has. Filled orders cancel their siblings on the first quote, as they would have before.
+def restore_state():
+    started = time.perf_counter()
+    records = journal.open()
+    account.refresh()
+    items = [item for item in account.orders() + account.positions() if item.comment.startswith("M2")]
+    live_orders = {order.ticket for order in account.orders() if order.comment.startswith("M2")}
+    live = {item.ticket for item in items}
+    # Brackets still live were placed by the last run and are not placed again
+    dedupe_index.rebuild("M2", (magic,), items)
+
+    # Fills already handled have had their siblings cancelled and are not tracked any more
+    filled = {record.data["ticket"] for record in records if record.kind == STATE and record.data["name"] == "fill"}
+    live -= filled
+
+    for record in records:
+        if record.kind != STATE:
+            continue
+        if record.data["name"] == "candle":
+            latest_candles_dict[record.data["symbol"]] = record.data["time"]
+        elif record.data["name"] == "group":
+            oco_book.add_group(record.data["symbol"], {
+                level: [(ticket, order_type) for ticket, order_type in orders if ticket in live and ticket not in oco_book]
+                for level, orders in record.data["levels"].items()
+            })
+    # Pending orders left from before the restart are cancelled with the next candle's, like any others
+    pending_orders_list[:] = sorted(live_orders)
+    for request in unresolved_intents(records):
+        logger.warning(f"Order request {request} was in flight when the last run stopped; using what the terminal has")
+
+    journal.compact(snapshot_records)
+    logger.info(f"Restored {len(latest_candles_dict)} candles and {len(oco_book.groups)} OCO groups "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+def main():
+    # Initialize the MT5 terminal
+    if not mt5.initialize():
+        logger.error(f"initialize() failed, error code = {mt5.last_error()}")
+        quit()
+
+    # Time terminal calls before throttling them, so the rate limiter's waits stay out of the latencies
+    start_metrics(metrics_port, metrics_file)
+    # One worker per symbol, so every pair sees a new candle at once; all of them share one terminal rate limit
+    throttle_terminal(RateLimiter(max_terminal_calls_per_second))
+    symbol_registry.load(symbols)
+    session_calendar.configure(session_timezone, server_timezone)
+    restore_state()
+    run_symbol_workers(symbols, process_symbol, on_interval=log_stats, name="m2")
+    journal.close()
+
+if __name__ == "__main__":
+    main()
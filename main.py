@@ -1,6 +1,13 @@
 import MetaTrader5 as mt5
 from functions.scheduler import schedule_tasks, run_scheduler
+from functions.trading import restore_brackets
+from functions.symbols import symbol_registry
+from functions.session_calendar import session_calendar
 from functions.utils import get_user_inputs
+from functions.configs import read_config_file
+from functions.runtime import run_async, LATENCY_BUDGET, JOB_TIMEOUT
+from functions.metrics import start_metrics, METRICS_INTERVAL
+from functions.ticks import MIN_POLL_INTERVAL, MAX_IDLE_DELAY
 from functions.logger import get_logger
 
 logger = get_logger()
@@ -12,17 +19,34 @@ def main():
         mt5.shutdown()
         return  # Exit the function if initialization fails
 
-    previouse_day_missing_symbols = []
-    asia_session_missing_symbols = []
-
     # Get user inputs
     currency_pairs, day_high_low_time, asia_high_low_time, delete_orders_time, lot_size = get_user_inputs()
+    # Point, digits and stops level of every pair, and the SL/TP offsets worked out from them
+    symbol_registry.load(currency_pairs)
+
+    # Brackets the last run already placed are not placed again
+    restore_brackets()
 
     # Initial schedule tasks
     schedule_tasks(currency_pairs, day_high_low_time, asia_high_low_time, delete_orders_time, lot_size)
     
-    # Run the scheduler
-    run_scheduler(currency_pairs, lot_size)
+    config = read_config_file('config/config.json')
+    # Session hours are in session_timezone (local time if not set) and bars in the broker's server_timezone
+    session_calendar.configure(config.get('session_timezone'), config.get('server_timezone'))
+    start_metrics(config.get('metrics_port'), config.get('metrics_file'), config.get('metrics_interval', METRICS_INTERVAL))
+    options = dict(event_driven=config.get('event_driven', True),
+                   min_poll_interval=config.get('min_poll_interval', MIN_POLL_INTERVAL),
+                   max_idle_delay=config.get('max_idle_delay', MAX_IDLE_DELAY))
+
+    if config.get('runtime', 'asyncio') == 'asyncio':
+        # Trailing stops and session jobs run as separate tasks, with terminal calls on their own threads
+        run_async(currency_pairs, lot_size,
+                  latency_budget=config.get('latency_budget', LATENCY_BUDGET),
+                  job_timeout=config.get('job_timeout', JOB_TIMEOUT),
+                  **options)
+    else:
+        # Run the scheduler, re-evaluating positions only when their quotes change unless disabled
+        run_scheduler(currency_pairs, lot_size, **options)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,21 @@
+import argparse
+from functions.configs import read_config_file
+from functions.supervisor import Supervisor
+
+# Example config/config.json entry, one object per terminal (any mt5.initialize argument):
+#     "terminals": [
+#         {"path": "C:/MT5/terminal-1/terminal64.exe", "login": 1234567, "password": "...", "server": "Broker-Live"},
+#         {"path": "C:/MT5/terminal-2/terminal64.exe", "login": 7654321, "password": "...", "server": "Broker-Live"}
+#     ]
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as one worker process per MT5 terminal, each on a share of the symbols.")
+    parser.add_argument("--config", default="config/config.json", help="Configuration file with currency_pairs and terminals")
+    args = parser.parse_args()
+
+    config = read_config_file(args.config)
+    terminals = config.get("terminals") or [{}]
+    supervisor = Supervisor(terminals, config["currency_pairs"], config)
+    supervisor.run()
+
+if __name__ == "__main__":
+    main()
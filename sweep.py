@@ -0,0 +1,44 @@
+import argparse
+from functions.backtest import load_bars, load_ticks, TICK_DIR
+from functions.bars import BAR_DIR
+from functions.configs import read_config_file
+from functions.sweep import grid, random_sample, run_sweep
+from functions.trailing import SESSION_TIERS, M2_TIERS, M3_TIERS
+
+# Default search space: the SL/TP offsets and trailing tiers used by main.py, m2.py and m3.py,
+# plus nearby placement times
+SEARCH_SPACE = {
+    "sl_pips": [3, 5, 10, 15],
+    "tp_pips": [30, 50, 60, 80],
+    "tiers": [SESSION_TIERS, M2_TIERS, M3_TIERS],
+    "day_high_low_time": ["03:00", "04:00"],
+    "asia_high_low_time": ["10:30", "11:30", "13:00"],
+}
+
+def main():
+    config = read_config_file('config/config.json')
+
+    parser = argparse.ArgumentParser(description="Sweep SL/TP, trailing tiers and session times over the backtest.")
+    parser.add_argument("--symbols", default=",".join(config.get("currency_pairs", [])), help="Comma-separated symbols")
+    parser.add_argument("--timeframe", help="Timeframe to replay (default: H1 from the bar store, M1 from ticks)")
+    parser.add_argument("--directory", default=BAR_DIR, help="Directory holding the bar store files")
+    parser.add_argument("--ticks", metavar="DIRECTORY", help=f"Build the bars from the tick files in this directory (e.g. {TICK_DIR}) instead")
+    parser.add_argument("--samples", type=int, help="Run this many random combinations instead of the full grid")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--output", help="Write the ranked table to this CSV file")
+    args = parser.parse_args()
+
+    symbols = [symbol for symbol in args.symbols.split(",") if symbol]
+    if args.ticks:
+        bars = {symbol: load_ticks(symbol, args.timeframe or "M1", args.ticks) for symbol in symbols}
+    else:
+        bars = {symbol: load_bars(symbol, args.timeframe or "H1", args.directory) for symbol in symbols}
+    combinations = random_sample(SEARCH_SPACE, args.samples) if args.samples else grid(SEARCH_SPACE)
+    table = run_sweep(bars, combinations, workers=args.workers)
+
+    print(table.head(20).to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from functions import mt5sim
+
+# Every bot module does "import MetaTrader5 as mt5", so the simulator goes in before any test imports one
+terminal = mt5sim.SimTerminal({"EURUSD": mt5sim.make_random_ticks(20000, seed=1)})
+terminal.advance(600)
+mt5sim.install(terminal)
+
+@pytest.fixture
+def sim():
+    terminal.failure_rates.clear()
+    return terminal
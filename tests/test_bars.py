@@ -0,0 +1,46 @@
+import numpy as np
+from functions.bars import BarStore, RATE_DTYPE, to_epoch
+
+HOUR = 3600
+START = 1_790_000_000 // HOUR * HOUR
+
+def hourly_bars(first, count):
+    bars = np.zeros(count, dtype=RATE_DTYPE)
+    bars["time"] = first + np.arange(count) * HOUR
+    bars["high"] = bars["low"] = 1.1
+    return bars
+
+# Terminal history that only starts at START, like a symbol the broker has not long offered
+class Terminal:
+    def __init__(self):
+        self.history = hourly_bars(START, 48)
+        self.calls = []
+
+    def copy_rates_range(self, start, end):
+        start, end = to_epoch(start), to_epoch(end)
+        self.calls.append((start, end))
+        return self.history[(self.history["time"] >= start) & (self.history["time"] <= end)]
+
+def test_window_is_stored_and_served_from_disk(tmp_path):
+    store, terminal = BarStore("EURUSD", "H1", str(tmp_path)), Terminal()
+    now = START + 48 * HOUR
+
+    first = store.rates_range(START, START + 23 * HOUR, terminal.copy_rates_range, now)
+    again = store.rates_range(START, START + 23 * HOUR, terminal.copy_rates_range, now)
+
+    assert len(first) == len(again) == 24
+    assert len(terminal.calls) == 1
+
+def test_gap_before_the_history_is_asked_for_once(tmp_path):
+    store, terminal = BarStore("EURUSD", "H1", str(tmp_path)), Terminal()
+    now = START + 48 * HOUR
+    store.rates_range(START, START + 23 * HOUR, terminal.copy_rates_range, now)
+
+    for _ in range(3):
+        window = store.rates_range(START - 24 * HOUR, START + 23 * HOUR, terminal.copy_rates_range, now)
+        assert len(window) == 24
+    assert len(terminal.calls) == 2
+
+    # Reaching further back only asks for the part not asked for yet
+    store.rates_range(START - 48 * HOUR, START + 23 * HOUR, terminal.copy_rates_range, now)
+    assert terminal.calls[-1] == (START - 48 * HOUR, START - 24 * HOUR - 1)
@@ -0,0 +1,109 @@
+from collections import namedtuple
+import MetaTrader5 as mt5
+from functions.dedupe import DedupeIndex, dedupe_index, order_comment, comment_key, CANDLE_HIGH, PREVIOUS_DAY_LOW
+from functions.dispatcher import dispatch_orders
+
+Result = namedtuple("Result", "retcode order")
+Item = namedtuple("Item", "ticket symbol comment magic")
+
+def bracket_request(symbol="EURUSD", order_type=mt5.ORDER_TYPE_SELL_LIMIT, level=CANDLE_HIGH, session="181415", prefix="M2"):
+    return {"symbol": symbol, "comment": order_comment(prefix, order_type, level, session)}
+
+def test_comment_key_round_trips_through_order_comment():
+    comment = order_comment("CXC", mt5.ORDER_TYPE_BUY_STOP, PREVIOUS_DAY_LOW, "1018")
+
+    assert comment == "CXC Buy Stop PDL1018"
+    assert comment_key("GBPUSD", comment) == ("CXC", "GBPUSD", "1018", PREVIOUS_DAY_LOW, mt5.ORDER_TYPE_BUY_STOP)
+    assert comment_key("GBPUSD", order_comment("CXC", mt5.ORDER_TYPE_BUY_STOP)) is None
+
+def test_claim_is_refused_while_the_first_request_is_in_flight():
+    index = DedupeIndex()
+    request = bracket_request()
+
+    assert index.claim(request)
+    assert not index.claim(request)
+    assert index.last_refused()
+    assert index.skipped == 1
+    assert index.ticket(comment_key("EURUSD", request["comment"])) is None
+
+    index.settle(request, Result(mt5.TRADE_RETCODE_DONE, 7))
+    assert not index.claim(request)
+    assert index.ticket(comment_key("EURUSD", request["comment"])) == 7
+
+def test_untagged_requests_are_always_let_through():
+    index = DedupeIndex()
+    request = {"symbol": "EURUSD", "comment": order_comment("M1", mt5.ORDER_TYPE_BUY_LIMIT)}
+
+    assert index.claim(request)
+    assert index.claim(request)
+    assert not index.last_refused()
+    assert len(index) == 0
+
+def test_failed_settle_releases_the_claim():
+    index = DedupeIndex()
+    request = bracket_request()
+
+    assert index.claim(request)
+    index.settle(request, Result(mt5.TRADE_RETCODE_REJECT, 0))
+    assert index.claim(request)
+    index.settle(request, None)
+    assert index.claim(request)
+
+def test_discarded_ticket_can_be_placed_again():
+    index = DedupeIndex()
+    request = bracket_request()
+    index.claim(request)
+    index.settle(request, Result(mt5.TRADE_RETCODE_DONE, 7))
+
+    index.discard(7)
+    assert index.claim(request)
+
+def test_expire_keeps_only_the_current_session():
+    index = DedupeIndex()
+    old, current = bracket_request(session="181400"), bracket_request(session="181415")
+    other_symbol, other_strategy = bracket_request(symbol="GBPUSD", session="181400"), bracket_request(prefix="M3", session="181400")
+    for request in (old, current, other_symbol, other_strategy):
+        index.claim(request)
+
+    index.expire("M2", "EURUSD", "181415")
+
+    assert comment_key("EURUSD", old["comment"]) not in index
+    assert comment_key("EURUSD", current["comment"]) in index
+    assert comment_key("GBPUSD", other_symbol["comment"]) in index
+    assert comment_key("EURUSD", other_strategy["comment"]) in index
+
+def test_rebuild_from_live_orders_and_positions():
+    index = DedupeIndex()
+    stale, kept = bracket_request(session="181400"), bracket_request(prefix="M3")
+    index.claim(stale)
+    index.claim(kept)
+    items = [
+        Item(11, "EURUSD", order_comment("M2", mt5.ORDER_TYPE_BUY_STOP, CANDLE_HIGH, "181415"), 234002),
+        Item(12, "EURUSD", order_comment("M2", mt5.ORDER_TYPE_SELL_LIMIT, CANDLE_HIGH, "181415"), 234002),  # A position
+        Item(13, "EURUSD", order_comment("M2", mt5.ORDER_TYPE_BUY_LIMIT, CANDLE_HIGH, "181415"), 1),  # Another magic
+        Item(14, "EURUSD", order_comment("M2", mt5.ORDER_TYPE_SELL_STOP), 234002),  # Untagged
+    ]
+
+    assert index.rebuild("M2", (234002,), items) == 2
+    assert index.ticket(("M2", "EURUSD", "181415", CANDLE_HIGH, mt5.ORDER_TYPE_BUY_STOP)) == 11
+    assert index.ticket(("M2", "EURUSD", "181415", CANDLE_HIGH, mt5.ORDER_TYPE_SELL_LIMIT)) == 12
+    assert comment_key("EURUSD", stale["comment"]) not in index
+    assert comment_key("EURUSD", kept["comment"]) in index
+    assert len(index) == 3
+
+def place_bracket_order(request):
+    if not dedupe_index.claim(request):
+        return None
+    result = Result(mt5.TRADE_RETCODE_DONE, 21) if request["symbol"] == "EURUSD" else Result(mt5.TRADE_RETCODE_REJECT, 0)
+    dedupe_index.settle(request, result)
+    return result
+
+def test_dispatcher_reports_a_repeat_as_skipped_not_failed():
+    placed, rejected = bracket_request(session="181430"), bracket_request(symbol="GBPUSD", session="181430")
+    place_bracket_order(placed)
+
+    batch = dispatch_orders([(place_bracket_order, (placed,)), (place_bracket_order, (rejected,))])
+
+    assert [outcome.skipped for outcome in batch.outcomes] == [True, False]
+    assert [outcome.args[0] for outcome in batch.failed] == [rejected]
+    assert "1 already placed" in batch.summary()
@@ -0,0 +1,72 @@
+import os
+from collections import namedtuple
+from functions.journal import Journal, INTENT, RESULT, STATE, read_journal, unresolved_intents
+
+Result = namedtuple("Result", "retcode order deal")
+
+def write_journal(path):
+    journal = Journal(path)
+    journal.open()
+    journal.state("candle", symbol="EURUSD", time=1000)
+    journal.send(lambda request: Result(10009, 11, 0), {"symbol": "EURUSD", "type": 2})
+    journal.close()
+
+def test_replay_returns_every_record(tmp_path):
+    path = str(tmp_path / "m2.wal")
+    write_journal(path)
+
+    records, length = read_journal(path)
+    assert [record.kind for record in records] == [STATE, INTENT, RESULT]
+    assert records[0].data == {"name": "candle", "symbol": "EURUSD", "time": 1000}
+    assert records[2].data["order"] == 11
+    assert length == os.path.getsize(path)
+    assert unresolved_intents(records) == []
+
+def test_torn_tail_is_cut_off_and_appends_continue(tmp_path):
+    path = str(tmp_path / "m2.wal")
+    write_journal(path)
+    intact = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(b"\x40\x00\x00\x00\x01\x02")  # A frame header the crash never finished
+
+    journal = Journal(path)
+    records = journal.open()
+    assert len(records) == 3
+    assert os.path.getsize(path) == intact
+    journal.state("fill", ticket=11)
+    journal.close()
+
+    records, _ = read_journal(path)
+    assert records[-1].data == {"name": "fill", "ticket": 11}
+
+def test_corrupt_record_ends_the_replay(tmp_path):
+    path = str(tmp_path / "m2.wal")
+    write_journal(path)
+    with open(path, "r+b") as file:
+        data = bytearray(file.read())
+        data[-3] ^= 0xFF  # Flip a byte in the last record's body, so its crc no longer matches
+        file.seek(0)
+        file.write(data)
+
+    records, _ = read_journal(path)
+    assert [record.kind for record in records] == [STATE, INTENT]
+    # The intent's result was lost with the corrupt record, so it was in flight
+    assert unresolved_intents(records) == [{"symbol": "EURUSD", "type": 2}]
+
+def test_compact_replaces_the_journal_with_the_snapshot(tmp_path):
+    path = str(tmp_path / "m2.wal")
+    journal = Journal(path)
+    journal.open()
+    for candle in range(100):
+        journal.state("candle", symbol="EURUSD", time=candle)
+    before = journal.size()
+
+    journal.compact(lambda: [(STATE, {"name": "candle", "symbol": "EURUSD", "time": 99})])
+    journal.state("fill", ticket=5)
+    assert journal.size() < before
+    journal.close()
+
+    records, _ = read_journal(path)
+    assert [record.data for record in records] == [{"name": "candle", "symbol": "EURUSD", "time": 99},
+                                                   {"name": "fill", "ticket": 5}]
+    assert not os.path.exists(path + ".tmp")
@@ -0,0 +1,45 @@
+import MetaTrader5 as mt5
+import m2
+from functions.oco import OcoBook, HIGH, LOW
+
+def test_fill_returns_only_the_other_level():
+    book = OcoBook()
+    book.add_group("EURUSD", {HIGH: [(1, mt5.ORDER_TYPE_SELL_LIMIT), (2, mt5.ORDER_TYPE_BUY_STOP)],
+                              LOW: [(3, mt5.ORDER_TYPE_BUY_LIMIT), (4, mt5.ORDER_TYPE_SELL_STOP)]})
+
+    assert sorted(order.ticket for order in book.fill(2, other_level_only=True)) == [3, 4]
+    assert 2 not in book
+    assert sorted(book.tickets("EURUSD")) == [1, 3, 4]
+
+def test_ticket_added_again_leaves_its_old_group():
+    book = OcoBook()
+    old = book.add_group("EURUSD", {HIGH: [(1, mt5.ORDER_TYPE_SELL_LIMIT)], LOW: [(2, mt5.ORDER_TYPE_BUY_LIMIT)]})
+    new = book.add_group("EURUSD", {HIGH: [(1, mt5.ORDER_TYPE_SELL_LIMIT)], LOW: [(3, mt5.ORDER_TYPE_BUY_LIMIT)]})
+
+    assert book.get(1).group == new
+    assert list(book.groups[old]) == [2]
+    assert [order.ticket for order in book.fill(1)] == [3]
+
+def test_fill_cancels_the_other_level_in_the_terminal(sim):
+    tick = sim.current_tick("EURUSD")
+    high, low = round(tick.ask + 0.002, 5), round(tick.bid - 0.002, 5)
+    session = "oco-test"
+    tickets = {
+        order_type: m2.place_pending_order("EURUSD", price, 0.1, order_type, level, session)
+        for order_type, price, level in [(mt5.ORDER_TYPE_SELL_LIMIT, high, "H"), (mt5.ORDER_TYPE_BUY_STOP, high, "H"),
+                                         (mt5.ORDER_TYPE_BUY_LIMIT, low, "L"), (mt5.ORDER_TYPE_SELL_STOP, low, "L")]
+    }
+    assert all(tickets.values())
+    m2.oco_book.add_group("EURUSD", {
+        HIGH: [(tickets[mt5.ORDER_TYPE_SELL_LIMIT], mt5.ORDER_TYPE_SELL_LIMIT), (tickets[mt5.ORDER_TYPE_BUY_STOP], mt5.ORDER_TYPE_BUY_STOP)],
+        LOW: [(tickets[mt5.ORDER_TYPE_BUY_LIMIT], mt5.ORDER_TYPE_BUY_LIMIT), (tickets[mt5.ORDER_TYPE_SELL_STOP], mt5.ORDER_TYPE_SELL_STOP)],
+    })
+
+    # The buy stop at the high fills: the low's orders go, the sell limit sharing its level stays
+    m2.remove_opposite_trades("EURUSD", tickets[mt5.ORDER_TYPE_BUY_STOP])
+
+    live = {order.ticket for order in mt5.orders_get(symbol="EURUSD")}
+    assert tickets[mt5.ORDER_TYPE_SELL_LIMIT] in live
+    assert tickets[mt5.ORDER_TYPE_BUY_LIMIT] not in live
+    assert tickets[mt5.ORDER_TYPE_SELL_STOP] not in live
+    assert tickets[mt5.ORDER_TYPE_BUY_STOP] not in m2.oco_book
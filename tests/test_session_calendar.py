@@ -0,0 +1,69 @@
+import calendar
+from datetime import date, time
+from functions.session_calendar import SessionCalendar
+
+def server_time(*moment):
+    return calendar.timegm(moment + (0,) * (6 - len(moment)))
+
+def broker_calendar():
+    # Colombo has no DST; the broker's Athens clock leaves EEST (UTC+3) for EET (UTC+2) on 25 October 2026
+    session_calendar = SessionCalendar("Asia/Colombo", "Europe/Athens")
+    session_calendar.register("asia", "05:00", "13:00")
+    session_calendar.register("previous_day", "05:00", "05:00", span=1)
+    return session_calendar
+
+def test_to_server_follows_the_brokers_dst_change():
+    session_calendar = broker_calendar()
+
+    assert session_calendar.to_server(date(2026, 10, 23), time(5)) == server_time(2026, 10, 23, 2, 30)
+    assert session_calendar.to_server(date(2026, 10, 26), time(5)) == server_time(2026, 10, 26, 1, 30)
+
+def test_windows_move_with_dst():
+    session_calendar = broker_calendar()
+
+    before = session_calendar.window("asia", date(2026, 10, 23))
+    after = session_calendar.window("asia", date(2026, 10, 26))
+    assert (before.start, before.end) == (server_time(2026, 10, 23, 2, 30), server_time(2026, 10, 23, 10, 30))
+    assert (after.start, after.end) == (server_time(2026, 10, 26, 1, 30), server_time(2026, 10, 26, 9, 30))
+
+def test_weekend_window_is_fridays():
+    session_calendar = broker_calendar()
+
+    assert session_calendar.window("asia", date(2026, 10, 24)) == session_calendar.window("asia", date(2026, 10, 23))
+    assert session_calendar.window("asia", date(2026, 10, 25)) == session_calendar.window("asia", date(2026, 10, 23))
+
+def test_monday_previous_day_opens_on_friday():
+    session_calendar = broker_calendar()
+
+    window = session_calendar.window("previous_day", date(2026, 10, 26))
+    assert window.start == server_time(2026, 10, 23, 2, 30)
+    assert window.end == server_time(2026, 10, 26, 1, 30)
+
+def test_in_session_at_window_edges():
+    session_calendar = SessionCalendar()
+    session_calendar.register("afternoon", "13:45", "16:00")
+    mask = session_calendar.mask("afternoon")
+
+    assert not session_calendar.in_session(server_time(2026, 10, 20, 13, 44, 59), mask)
+    assert session_calendar.in_session(server_time(2026, 10, 20, 13, 45), mask)
+    assert session_calendar.in_session(server_time(2026, 10, 20, 15, 59, 59), mask)
+    assert not session_calendar.in_session(server_time(2026, 10, 20, 16, 0), mask)
+
+def test_in_session_matches_windows_across_time_zones():
+    session_calendar = broker_calendar()
+    mask = session_calendar.mask("asia")
+    window = session_calendar.window("asia", date(2026, 10, 26))
+
+    assert not session_calendar.in_session(window.start - 1, mask)
+    assert session_calendar.in_session(window.start, mask)
+    assert session_calendar.in_session(window.end - 1, mask)
+    assert not session_calendar.in_session(window.end, mask)
+
+def test_weekend_minutes_are_in_no_session():
+    session_calendar = SessionCalendar()
+    session_calendar.register("afternoon", "13:45", "16:00")
+    mask = session_calendar.mask("afternoon")
+
+    assert session_calendar.in_session(server_time(2026, 10, 23, 14, 0), mask)
+    assert not session_calendar.in_session(server_time(2026, 10, 24, 14, 0), mask)
+    assert not session_calendar.in_session(server_time(2026, 10, 25, 14, 0), mask)
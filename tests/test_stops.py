@@ -0,0 +1,84 @@
+from collections import namedtuple
+from functions.stops import StopManager, REJECT_BACKOFF
+from functions.trailing import SESSION_TIERS, BUY
+from functions.workers import RateLimiter
+
+Position = namedtuple("Position", "ticket symbol type price_open sl tp")
+Result = namedtuple("Result", "retcode")
+
+DONE = Result(10009)
+REJECTED = Result(10016)  # TRADE_RETCODE_INVALID_STOPS
+
+def make_manager(rate=1000):
+    return StopManager(SESSION_TIERS, limiter=RateLimiter(rate), get_pip=lambda symbol: 0.0001)
+
+def position(sl=1.0990):
+    return Position(1, "EURUSD", BUY, 1.1000, sl, 1.1060)
+
+def test_confirmed_stop_is_not_sent_again():
+    manager = make_manager()
+    sent = []
+
+    assert manager.update(position(), 1.10005, lambda sl: sent.append(sl) or DONE) is DONE
+    # The position snapshot is stale and still shows the old SL
+    assert manager.update(position(), 1.10005, lambda sl: sent.append(sl) or DONE) is None
+    assert sent == [1.10005]
+    assert manager.states[1].tier == 0
+    assert manager.stats["reached"] == 1
+
+def test_rejection_backs_off_then_sends_the_latest_stop():
+    manager = make_manager()
+    sent = []
+
+    manager.update(position(), 1.10005, lambda sl: sent.append(sl) or REJECTED)
+    state = manager.states[1]
+    assert state.rejections == 1 and state.confirmed_sl == 1.0990
+    assert state.retry_at > 0
+
+    # Held back while backing off; the newer target replaces the older one
+    assert manager.update(position(), 1.1010, lambda sl: sent.append(sl) or DONE) is None
+    assert state.pending_sl == 1.1010
+    assert manager.stats["backing_off"] == 1
+
+    state.retry_at = 0.0
+    manager.update(position(), 1.1010, lambda sl: sent.append(sl) or DONE)
+    assert sent == [1.10005, 1.1010]
+    assert state.confirmed_sl == 1.1010 and state.rejections == 0 and state.tier == 1
+
+def test_lost_answers_count_as_rejections_and_double_the_backoff():
+    manager = make_manager()
+    manager.update(position(), 1.10005, lambda sl: None)
+    state = manager.states[1]
+    first_wait = state.retry_at
+
+    state.retry_at = 0.0
+    manager.update(position(), 1.10005, lambda sl: None)
+    assert state.rejections == 2
+    assert manager.stats["rejected"] == 2
+    assert state.retry_at - first_wait >= REJECT_BACKOFF * 0.9
+
+def test_better_stop_waits_for_the_request_in_flight():
+    manager = make_manager()
+    assert manager.begin(position(), 1.10005) == 1.10005
+    # A second target arrives while the first request is still out
+    assert manager.begin(position(), 1.1010) is None
+    assert manager.states[1].pending_sl == 1.1010
+    assert manager.stats["coalesced"] == 1
+
+    manager.finish(1, 1.10005, DONE)
+    assert manager.begin(position(1.10005), 1.1010) == 1.1010
+
+def test_rate_limit_holds_back_other_tickets():
+    manager = make_manager(rate=1)
+    other = Position(2, "EURUSD", BUY, 1.2000, 1.1990, 1.2060)
+
+    assert manager.begin(position(), 1.10005) == 1.10005
+    assert manager.begin(other, 1.20005) is None
+    assert manager.stats["throttled"] == 1
+    assert manager.states[2].pending_sl == 1.20005
+
+def test_forget_drops_the_ticket():
+    manager = make_manager()
+    manager.update(position(), 1.10005, lambda sl: DONE)
+    manager.forget(1)
+    assert 1 not in manager.states